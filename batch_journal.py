@@ -0,0 +1,145 @@
+"""批量发布的预写日志（WAL）：记录每个订单走到了哪一步，中途失败后 --resume 从最后一个落盘的步骤继续。
+
+每个批次一个 JSONL 文件（.cache/journals/<batch_id>.jsonl）：
+  第一行是批次头 {"batch", "ids", "created"}；
+  之后每完成一步追加一行 {"id", "stage", "ts", ...数据}，写入后 fsync 才算完成。
+
+阶段（STAGES，按顺序）：
+  resolved   解析出 app / company / email
+  rendered   隐私文本已生成（文本放在 .cache/journals/<batch_id>/<id>.txt）
+  committed  页面已写入并提交到本地仓库（带页面 URL）
+  pushed     已推送到远端
+
+进程在任意位置被杀掉，最多丢失正在写的那一行：load() 把写了一半的最后一行截掉，之后的追加
+从完整的行尾开始，对应步骤下次重做。
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional
+
+JOURNAL_DIR = Path(__file__).resolve().parent / ".cache" / "journals"
+STAGES = ("resolved", "rendered", "committed", "pushed")
+
+
+def batch_id_for(ids: Iterable[str]) -> str:
+    """同一组订单号（与顺序无关）得到同一个批次 ID。"""
+    key = ",".join(sorted({i.strip().upper() for i in ids if i and i.strip()}))
+    return hashlib.sha1(key.encode("utf-8")).hexdigest()[:12]
+
+
+class BatchJournal:
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.batch_id = self.path.stem
+        self.ids: List[str] = []
+        self.created = 0.0
+        # id -> {"stage": 最后完成的阶段, 以及各阶段记录的数据}
+        self.entries: Dict[str, Dict[str, Any]] = {}
+
+    @property
+    def work_dir(self) -> Path:
+        """本批次的中间文件（渲染好的文本等）。"""
+        return self.path.with_suffix("")
+
+    @classmethod
+    def create(cls, ids: List[str], journal_dir: Optional[Path] = None) -> "BatchJournal":
+        """新建（覆盖同一组订单号的旧日志）。"""
+        d = journal_dir or JOURNAL_DIR
+        d.mkdir(parents=True, exist_ok=True)
+        journal = cls(d / f"{batch_id_for(ids)}.jsonl")
+        journal.ids = list(dict.fromkeys(ids))
+        journal.created = time.time()
+        tmp = journal.path.with_suffix(".jsonl.tmp")
+        with tmp.open("w", encoding="utf-8") as f:
+            f.write(json.dumps({"batch": journal.batch_id, "ids": journal.ids, "created": journal.created}) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, journal.path)
+        journal.work_dir.mkdir(parents=True, exist_ok=True)
+        return journal
+
+    @classmethod
+    def load(cls, path: Path) -> "BatchJournal":
+        journal = cls(path)
+        data = journal.path.read_bytes()
+        complete = data.rfind(b"\n") + 1
+        if complete < len(data):
+            # 崩溃时写了一半的最后一行：截掉，否则下一次 record() 会接在它后面，连新记录一起损坏
+            with journal.path.open("r+b") as f:
+                f.truncate(complete)
+                f.flush()
+                os.fsync(f.fileno())
+        for n, line in enumerate(data[:complete].decode("utf-8", "replace").splitlines()):
+            try:
+                rec = json.loads(line)
+            except ValueError:
+                continue
+            if n == 0:
+                journal.ids = list(rec.get("ids") or [])
+                journal.created = float(rec.get("created") or 0)
+                continue
+            oid, stage = rec.get("id"), rec.get("stage")
+            if oid not in journal.ids or stage not in STAGES:
+                continue
+            entry = journal.entries.setdefault(oid, {})
+            entry.update({k: v for k, v in rec.items() if k not in ("id", "stage", "ts")})
+            entry["stage"] = stage
+        if not journal.ids:
+            raise ValueError(f"{path}: 缺少批次头")
+        return journal
+
+    @classmethod
+    def find(cls, ids: Optional[List[str]] = None, journal_dir: Optional[Path] = None) -> Optional["BatchJournal"]:
+        """ids 给定时找同一组订单号的日志；否则找最近一个还没全部推送的日志。"""
+        d = journal_dir or JOURNAL_DIR
+        if ids:
+            p = d / f"{batch_id_for(ids)}.jsonl"
+            return cls.load(p) if p.exists() else None
+        candidates = sorted(d.glob("*.jsonl"), key=lambda p: p.stat().st_mtime, reverse=True) if d.exists() else []
+        for p in candidates:
+            try:
+                journal = cls.load(p)
+            except (OSError, ValueError):
+                continue
+            if not journal.is_complete():
+                return journal
+        return None
+
+    def record(self, order_id: str, stage: str, **data: Any) -> None:
+        """追加一行并 fsync；返回即表示该步骤已持久化。"""
+        if stage not in STAGES:
+            raise ValueError(f"unknown stage: {stage!r}")
+        line = json.dumps({"id": order_id, "stage": stage, "ts": time.time(), **data}, ensure_ascii=False)
+        with self.path.open("a", encoding="utf-8") as f:
+            f.write(line + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        entry = self.entries.setdefault(order_id, {})
+        entry.update(data)
+        entry["stage"] = stage
+
+    def stage_of(self, order_id: str) -> Optional[str]:
+        return (self.entries.get(order_id) or {}).get("stage")
+
+    def reached(self, order_id: str, stage: str) -> bool:
+        current = self.stage_of(order_id)
+        return current is not None and STAGES.index(current) >= STAGES.index(stage)
+
+    def pending(self, stage: str) -> List[str]:
+        """还没走到 stage 的订单号（按批次顺序）。"""
+        return [i for i in self.ids if not self.reached(i, stage)]
+
+    def is_complete(self) -> bool:
+        return not self.pending("pushed")
+
+    def summary(self) -> Dict[str, int]:
+        counts = {s: 0 for s in ("pending",) + STAGES}
+        for i in self.ids:
+            counts[self.stage_of(i) or "pending"] += 1
+        return counts
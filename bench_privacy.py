@@ -0,0 +1,658 @@
+"""离线基准测试：伪造 Lark 服务 + 合成表格 + 本地 bare git 远端。
+
+不需要登录 Lark、不需要浏览器、不访问 GitHub：
+  - 按 1k/10k/100k 行生成合成的 `data.records`（gzip + base64）响应，
+    并由本地 HTTP 服务（FakeLarkServer）提供 records 接口和 doc 页面；
+  - 发布步骤推送到临时目录里的 bare git 仓库。
+
+用法：
+  python bench_privacy.py                        # 默认 1000,10000,100000 行
+  python bench_privacy.py --sizes 1000 --repeat 3 --out bench.json
+  python bench_privacy.py --compare old.json     # 与之前某次提交的结果对比
+
+结果以 JSON 输出（stdout 或 --out），便于在不同提交之间比较。
+"""
+
+from __future__ import annotations
+
+import argparse
+import base64
+import contextlib
+import gzip
+import io
+import json
+import platform
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+from urllib.parse import parse_qs, urlparse
+
+import requests
+
+import googleSites
+import lark_bitable
+import lark_http
+import privacy_merge
+from memprof import MemoryReport
+from records_index import RecordsIndex
+
+REPO_ROOT = Path(__file__).resolve().parent
+DEFAULT_SIZES = (1000, 10000, 100000)
+
+# 与真实表格一致的字段 ID（privacy_merge 只读取这三个）
+FIELD_ORDER_ID = "fldxQWjXD7"
+FIELD_APP_NAME = "fldaShB3Gb"
+FIELD_DOC_MENTION = "fldnLglcRi"
+
+# 开放平台接口按字段名读写；合成表的字段 ID -> 字段名
+BITABLE_FIELD_NAMES = {
+    FIELD_ORDER_ID: "订单号",
+    FIELD_APP_NAME: "App 名称",
+    FIELD_DOC_MENTION: "隐私文档",
+    "fldStatus01": "状态",
+    "fldCreated1": "创建时间",
+    "fldRemark01": "备注",
+}
+BITABLE_TOKEN = "t-fake-tenant-token"
+
+
+#
+# 合成数据
+#
+
+
+def order_id_for_row(i: int) -> str:
+    return f"IGT{1000 + i}"
+
+
+def make_records_tree(rows: int, doc_base_url: str = "http://127.0.0.1/docx/", seed: int = 1128) -> Dict[str, Any]:
+    """生成与 Lark records 解压后结构相近的合成数据（每行额外带几个无关字段，模拟真实体积）。"""
+    rnd = random.Random(seed)
+    record_map: Dict[str, Any] = {}
+    for i in range(rows):
+        oid = order_id_for_row(i)
+        company = f"Company{i % 977}"
+        record_map[f"rec{i:08d}"] = {
+            "fields": {
+                FIELD_ORDER_ID: {"type": 1, "value": [{"type": "text", "text": oid}]},
+                FIELD_APP_NAME: {"type": 1, "value": [{"type": "text", "text": f"Synthetic App {i}"}]},
+                FIELD_DOC_MENTION: {
+                    "type": 1,
+                    "value": [
+                        {
+                            "type": "mention",
+                            "mentionType": "Docx",
+                            "text": f"{oid}-{company}",
+                            "link": f"{doc_base_url}{i}",
+                        }
+                    ],
+                },
+                "fldStatus01": {"type": 3, "value": [rnd.choice(["optAAA", "optBBB", "optCCC"])]},
+                "fldCreated1": {"type": 1001, "value": 1700000000000 + rnd.randrange(10**9)},
+                "fldRemark01": {"type": 1, "value": [{"type": "text", "text": "".join(rnd.choices("abcdefghij ", k=48))}]},
+            },
+            "recordId": f"rec{i:08d}",
+        }
+    return {"recordMap": record_map, "total": rows, "hasMore": False}
+
+
+def encode_records_response(tree: Dict[str, Any]) -> str:
+    """records 树 -> 接口原始响应体（data.records 为 gzip 后的 base64）。"""
+    raw = json.dumps(tree, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    blob = base64.b64encode(gzip.compress(raw, compresslevel=6)).decode("ascii")
+    return json.dumps({"code": 0, "msg": "Success", "data": {"records": blob}})
+
+
+def make_doc_page(i: int) -> str:
+    """模拟 doc 页面：大量无关 HTML + 一个 @gmail.com 邮箱。"""
+    filler = "<p>" + ("Lorem ipsum dolor sit amet. " * 40) + "</p>\n"
+    return (
+        "<html><head><title>doc</title></head><body>\n"
+        + filler * 20
+        + f"<div>Contact: dev{i}@gmail.com</div>\n"
+        + filler * 20
+        + "</body></html>"
+    )
+
+
+#
+# 本地伪造 Lark 服务
+#
+
+
+class FakeLarkServer:
+    """本地 HTTP 服务，路由：
+
+      GET /records?rows=N   -> 合成 records 响应（按行数缓存）
+      GET /docx/<i>         -> 合成 doc 页面（带 ETag，If-None-Match 命中时回 304）
+
+    以及开放平台 Bitable 接口的最小实现（表的行数为 bitable_rows）：
+      POST /open-apis/auth/v3/tenant_access_token/internal
+      GET  /open-apis/bitable/v1/apps/<app>/tables/<table>/fields
+      POST /open-apis/bitable/v1/apps/<app>/tables/<table>/records/search
+           （field_names 投影、filter 的 is 条件（and/or）、page_size/page_token 分页）
+
+    throttle_rate > 0 时模拟服务端限流：超过该速率（请求/秒）的请求返回 429 + Retry-After。
+    """
+
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        throttle_rate: float = 0.0,
+        retry_after: str = "1",
+        bitable_rows: int = 1000,
+    ):
+        self._payloads: Dict[int, str] = {}
+        self._bitable_items: Dict[int, List[Dict[str, Any]]] = {}
+        self.bitable_rows = bitable_rows
+        self._lock = threading.Lock()
+        self.request_count = 0
+        self.throttled_count = 0
+        self.not_modified_count = 0
+        self.throttle_rate = throttle_rate
+        self.retry_after = retry_after
+        self._bucket = throttle_rate
+        self._bucket_ts = time.monotonic()
+        server = self
+
+        class _Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):  # 静默
+                pass
+
+            def _send(self, code: int, body: str, content_type: str, extra: Optional[Dict[str, str]] = None) -> None:
+                data = body.encode("utf-8")
+                self.send_response(code)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(data)))
+                for k, v in (extra or {}).items():
+                    self.send_header(k, v)
+                self.end_headers()
+                self.wfile.write(data)
+
+            def _throttled(self) -> bool:
+                with server._lock:
+                    server.request_count += 1
+                if not server.should_throttle():
+                    return False
+                data = b"rate limited"
+                self.send_response(429)
+                self.send_header("Retry-After", server.retry_after)
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+                return True
+
+            def _send_json(self, obj: Any) -> None:
+                self._send(200, json.dumps(obj, ensure_ascii=False), "application/json; charset=utf-8")
+
+            def do_POST(self):
+                if self._throttled():
+                    return
+                parsed = urlparse(self.path)
+                length = int(self.headers.get("Content-Length") or 0)
+                try:
+                    body = json.loads(self.rfile.read(length) or b"{}")
+                except ValueError:
+                    body = {}
+                if parsed.path == "/open-apis/auth/v3/tenant_access_token/internal":
+                    if body.get("app_id") and body.get("app_secret"):
+                        self._send_json({"code": 0, "msg": "ok", "tenant_access_token": BITABLE_TOKEN, "expire": 7200})
+                    else:
+                        self._send_json({"code": 10003, "msg": "invalid param"})
+                    return
+                if parsed.path.startswith("/open-apis/bitable/") and parsed.path.endswith("/records/search"):
+                    if self.headers.get("Authorization") != f"Bearer {BITABLE_TOKEN}":
+                        self._send_json({"code": 99991663, "msg": "invalid access token"})
+                        return
+                    self._send_json(server.bitable_search(body, parse_qs(parsed.query)))
+                    return
+                self._send(404, "not found", "text/plain")
+
+            def do_GET(self):
+                if self._throttled():
+                    return
+                parsed = urlparse(self.path)
+                if parsed.path.startswith("/open-apis/bitable/") and parsed.path.endswith("/fields"):
+                    items = [{"field_id": fid, "field_name": name, "type": 1} for fid, name in BITABLE_FIELD_NAMES.items()]
+                    self._send_json({"code": 0, "msg": "success", "data": {"items": items, "has_more": False, "total": len(items)}})
+                    return
+                if parsed.path.endswith("/records"):
+                    rows = int((parse_qs(parsed.query).get("rows") or ["1000"])[0])
+                    self._send(200, server.records_payload(rows), "application/json")
+                    return
+                if parsed.path.startswith("/docx/"):
+                    try:
+                        i = int(parsed.path.rsplit("/", 1)[1])
+                    except ValueError:
+                        self._send(404, "not found", "text/plain")
+                        return
+                    etag = f'"doc-{i}-v1"'
+                    if self.headers.get("If-None-Match") == etag:
+                        with server._lock:
+                            server.not_modified_count += 1
+                        self.send_response(304)
+                        self.send_header("ETag", etag)
+                        self.end_headers()
+                        return
+                    self._send(200, make_doc_page(i), "text/html; charset=utf-8", {"ETag": etag})
+                    return
+                self._send(404, "not found", "text/plain")
+
+        self._httpd = ThreadingHTTPServer((host, port), _Handler)
+        self._httpd.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    def should_throttle(self) -> bool:
+        if self.throttle_rate <= 0:
+            return False
+        with self._lock:
+            now = time.monotonic()
+            self._bucket = min(self.throttle_rate, self._bucket + (now - self._bucket_ts) * self.throttle_rate)
+            self._bucket_ts = now
+            if self._bucket >= 1.0:
+                self._bucket -= 1.0
+                return False
+            self.throttled_count += 1
+            return True
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def records_payload(self, rows: int) -> str:
+        with self._lock:
+            payload = self._payloads.get(rows)
+        if payload is None:
+            payload = encode_records_response(make_records_tree(rows, doc_base_url=self.base_url + "/docx/"))
+            with self._lock:
+                self._payloads[rows] = payload
+        return payload
+
+    def _bitable_table(self) -> List[Dict[str, Any]]:
+        rows = self.bitable_rows
+        with self._lock:
+            items = self._bitable_items.get(rows)
+        if items is None:
+            tree = make_records_tree(rows, doc_base_url=self.base_url + "/docx/")
+            items = [
+                {
+                    "record_id": rid,
+                    "fields": {BITABLE_FIELD_NAMES[fid]: f["value"] for fid, f in rec["fields"].items()},
+                }
+                for rid, rec in tree["recordMap"].items()
+            ]
+            with self._lock:
+                self._bitable_items[rows] = items
+        return items
+
+    def bitable_search(self, body: Dict[str, Any], query: Dict[str, List[str]]) -> Dict[str, Any]:
+        items = self._bitable_table()
+        flt = body.get("filter") or {}
+        conditions = flt.get("conditions") or []
+        if conditions:
+            def _text(v: Any) -> str:
+                if isinstance(v, list):
+                    return "".join(e.get("text", "") if isinstance(e, dict) else str(e) for e in v)
+                return str(v)
+
+            def _match(item: Dict[str, Any], c: Dict[str, Any]) -> bool:
+                return c.get("operator") == "is" and _text(item["fields"].get(c.get("field_name"))) in (c.get("value") or [])
+
+            combine = all if flt.get("conjunction") == "and" else any
+            items = [it for it in items if combine(_match(it, c) for c in conditions)]
+
+        names = body.get("field_names")
+        if names:
+            wanted = set(names)
+            items = [{"record_id": it["record_id"], "fields": {k: v for k, v in it["fields"].items() if k in wanted}} for it in items]
+
+        page_size = int((query.get("page_size") or ["20"])[0])
+        start = int((query.get("page_token") or ["0"])[0] or 0)
+        page = items[start : start + page_size]
+        has_more = start + page_size < len(items)
+        data: Dict[str, Any] = {"items": page, "has_more": has_more, "total": len(items)}
+        if has_more:
+            data["page_token"] = str(start + page_size)
+        return {"code": 0, "msg": "success", "data": data}
+
+    def start(self) -> "FakeLarkServer":
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self) -> "FakeLarkServer":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+
+#
+# 本地 bare git 远端
+#
+
+
+class LocalGitRemote:
+    """临时 bare 仓库 + 工作区克隆；googleSites 的 REPO_ROOT/PAGES_DIR 临时指向工作区。"""
+
+    def __init__(self):
+        self.tmp = Path(tempfile.mkdtemp(prefix="privacy-bench-"))
+        self.remote = self.tmp / "remote.git"
+        self.work = self.tmp / "work"
+        self._saved: Dict[str, Any] = {}
+
+    def _git(self, *args: str, cwd: Optional[Path] = None) -> None:
+        subprocess.run(["git", *args], cwd=str(cwd or self.work), check=True, capture_output=True)
+
+    def __enter__(self) -> "LocalGitRemote":
+        subprocess.run(["git", "init", "--bare", "-b", "main", str(self.remote)], check=True, capture_output=True)
+        subprocess.run(["git", "clone", str(self.remote), str(self.work)], check=True, capture_output=True)
+        self._git("checkout", "-B", "main")
+        self._git("config", "user.name", "privacy-bench")
+        self._git("config", "user.email", "privacy-bench@example.invalid")
+        for name in ("googleSites.py", "privacy_merge.py"):
+            shutil.copy2(REPO_ROOT / name, self.work / name)
+        (self.work / "pages").mkdir()
+        self._git("add", "--", "googleSites.py", "privacy_merge.py")
+        self._git("commit", "-m", "bench baseline")
+        self._git("push", "-u", "origin", "main")
+
+        self._saved = {"REPO_ROOT": googleSites.REPO_ROOT, "PAGES_DIR": googleSites.PAGES_DIR}
+        googleSites.REPO_ROOT = self.work
+        googleSites.PAGES_DIR = self.work / "pages"
+        return self
+
+    def __exit__(self, *exc) -> None:
+        for k, v in self._saved.items():
+            setattr(googleSites, k, v)
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+
+#
+# 计时
+#
+
+
+def _summarize(samples: List[float]) -> Dict[str, float]:
+    ordered = sorted(samples)
+    p95_idx = max(0, min(len(ordered) - 1, int(round(0.95 * len(ordered) + 0.5)) - 1))
+    return {
+        "n": len(ordered),
+        "min_s": ordered[0],
+        "median_s": statistics.median(ordered),
+        "mean_s": statistics.fmean(ordered),
+        "p95_s": ordered[p95_idx],
+        "stdev_s": statistics.stdev(ordered) if len(ordered) > 1 else 0.0,
+    }
+
+
+def measure(fn: Callable[[int], Any], repeat: int, warmup: int = 1) -> Dict[str, float]:
+    """调用 fn(iteration) repeat 次（先热身 warmup 次），只统计 fn 本身耗时；函数内的 print 全部吞掉。"""
+    samples: List[float] = []
+    sink = io.StringIO()
+    with contextlib.redirect_stdout(sink):
+        for i in range(warmup):
+            fn(-1 - i)
+        for i in range(repeat):
+            t0 = time.perf_counter()
+            fn(i)
+            samples.append(time.perf_counter() - t0)
+            sink.seek(0)
+            sink.truncate()
+    return _summarize(samples)
+
+
+def _fresh_context() -> privacy_merge.RunContext:
+    return privacy_merge.RunContext(publish_id="")
+
+
+def bench_size(server: FakeLarkServer, rows: int, repeat: int) -> List[Dict[str, Any]]:
+    results: List[Dict[str, Any]] = []
+
+    def add(name: str, stats: Dict[str, float], **extra: Any) -> None:
+        entry = {"name": name, "rows": rows, **extra, **stats}
+        results.append(entry)
+        print(f"  {name:<40} rows={rows:<7} median={stats['median_s'] * 1000:9.2f} ms", file=sys.stderr)
+
+    url = f"{server.base_url}/records?rows={rows}"
+    body = server.records_payload(rows)
+
+    add("get_gzip_json_from_api.fetch_decode", measure(
+        lambda _i: privacy_merge.decode_records_response(requests.get(url, timeout=60).text), repeat
+    ), payload_bytes=len(body))
+    # 开放平台 Bitable 数据源：只取三个字段；单个订单走服务端过滤
+    server.bitable_rows = rows
+    target = order_id_for_row(rows - 1)
+
+    def _bitable(order_ids: Optional[List[str]]) -> lark_bitable.BitableClient:
+        client = lark_bitable.BitableClient(
+            "appFakeToken", "tblFake", base_url=server.base_url, app_id="cli_fake", app_secret="secret"
+        )
+        client.fetch_records_tree(order_ids)
+        return client
+
+    for name, ids in (("bitable.fetch_all", None), ("bitable.fetch_one", [target])):
+        stats = measure(lambda _i, ids=ids: _bitable(ids), repeat)
+        probe = _bitable(ids)
+        add(name, stats, payload_bytes=probe.stats["response_bytes"], requests=probe.stats["requests"])
+
+    # 解码阶段的 Python 分配峰值：随表格增大应近似线性、不应出现多份整树/整串同时存活
+    mem = MemoryReport(enabled=True, top_n=0)
+    with mem.stage("decode"):
+        records = privacy_merge.decode_records_response(body)
+    mem.stop()
+    peak = mem.stages[0]["peak_bytes"]
+    del records
+
+    add("get_gzip_json_from_api.decode", measure(
+        lambda _i: privacy_merge.decode_records_response(body), repeat
+    ), payload_bytes=len(body), peak_alloc_bytes=peak)
+
+    records = privacy_merge.decode_records_response(body)
+    # 目标放在表尾（target），测最坏情况的整树遍历
+
+    def _find(_i: int) -> Any:
+        return privacy_merge.find_and_collect_by_target_value(records, target_value=target, ctx=_fresh_context())
+
+    add("find_and_collect_by_target_value", measure(_find, repeat))
+
+    add("RecordsIndex.from_records", measure(lambda _i: RecordsIndex.from_records(records), repeat))
+    index = RecordsIndex.from_records(records)
+    add("RecordsIndex.find", measure(lambda _i: index.find(target), repeat))
+    add("RecordsIndex.find.prefix", measure(lambda _i: index.find("synthetic app 99", by="app", prefix=True), repeat))
+    del index
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        doc_data = privacy_merge.find_and_collect_by_target_value(records, target_value=target)
+
+    def _scrape(_i: int) -> Any:
+        return privacy_merge.extract_vps_array_from_doc22(doc_data, "", _fresh_context())
+
+    def _scrape_cold(i: int) -> Any:
+        lark_http.doc_cache().purge()
+        return _scrape(i)
+
+    add("extract_vps_array_from_doc22", measure(_scrape_cold, repeat))
+    add("extract_vps_array_from_doc22.cached", measure(_scrape, repeat))
+    del records
+    return results
+
+
+def bench_render(repeat: int) -> List[Dict[str, Any]]:
+    results: List[Dict[str, Any]] = []
+
+    def add(name: str, stats: Dict[str, float]) -> None:
+        results.append({"name": name, **stats})
+        print(f"  {name:<40} median={stats['median_s'] * 1000:9.2f} ms", file=sys.stderr)
+
+    args = ("Synthetic App", "Company1", "dev1@gmail.com")
+    add("build_privacy_html_from_template", measure(lambda _i: privacy_merge.build_privacy_html_from_template(*args), repeat))
+
+    html_doc = privacy_merge.build_privacy_html_from_template(*args)
+    add("html_to_formatted_text", measure(lambda _i: privacy_merge.html_to_formatted_text(html_doc), repeat))
+
+    text = privacy_merge.privacy_html_to_plain_text(html_doc)
+    page = googleSites.PageData(title="Synthetic App", content=text)
+    add("render_html", measure(lambda _i: googleSites.render_html(page, css_href="../../assets/privacy.css"), repeat))
+    add("render_html.legacy", measure(lambda _i: googleSites.render_html(page, lean=False), repeat))
+    return results
+
+
+def bench_throttled(requests_total: int = 200, server_rate: float = 40.0, workers: int = 8) -> List[Dict[str, Any]]:
+    """对一个限流的本地服务并发抓 doc 页面：共享 AdaptiveLimiter vs 不限流直接打。"""
+    from concurrent.futures import ThreadPoolExecutor
+
+    results: List[Dict[str, Any]] = []
+    for mode in ("adaptive", "naive"):
+        with FakeLarkServer(throttle_rate=server_rate, retry_after="0.5") as server:
+            limiter = lark_http.AdaptiveLimiter(rate=server_rate * 2, max_rate=server_rate * 4, max_concurrency=workers)
+            urls = [f"{server.base_url}/docx/{i}" for i in range(requests_total)]
+
+            def _fetch(u: str) -> int:
+                if mode == "adaptive":
+                    with contextlib.redirect_stdout(io.StringIO()):
+                        return lark_http.lark_get(u, timeout=10, max_retries=8, limiter=limiter).status_code
+                return requests.get(u, timeout=10).status_code
+
+            t0 = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                codes = list(pool.map(_fetch, urls))
+            elapsed = time.perf_counter() - t0
+            ok = sum(1 for c in codes if c == 200)
+            entry = {
+                "name": f"lark_get.throttled.{mode}",
+                "requests": requests_total,
+                "server_rate": server_rate,
+                "ok": ok,
+                "failed": requests_total - ok,
+                "server_429": server.throttled_count,
+                "elapsed_s": elapsed,
+                "ok_per_s": ok / elapsed if elapsed else 0.0,
+                # 与其他条目一致，便于 --compare
+                "median_s": elapsed,
+            }
+            results.append(entry)
+            print(
+                f"  {entry['name']:<40} ok={ok}/{requests_total} 429s={server.throttled_count} "
+                f"{entry['ok_per_s']:.1f} ok/s",
+                file=sys.stderr,
+            )
+    return results
+
+
+def bench_git_publish(repeat: int) -> List[Dict[str, Any]]:
+    page = googleSites.PageData(title="Synthetic App", content="Privacy Policy\n\nbench body\n")
+    with LocalGitRemote():
+        def _publish(i: int) -> None:
+            slug = f"{googleSites.encode_id_to_base64_letters(f'IGT{5000 + i}')}-bench-{i}"
+            googleSites.write_privacy_page(page, slug)
+            googleSites.git_commit_push(f"Bench publish {i}")
+
+        stats = measure(_publish, repeat)
+    print(f"  {'git_commit_push':<40} median={stats['median_s'] * 1000:9.2f} ms", file=sys.stderr)
+    return [{"name": "git_commit_push", **stats}]
+
+
+def _git_head() -> str:
+    try:
+        p = subprocess.run(["git", "rev-parse", "HEAD"], cwd=str(REPO_ROOT), capture_output=True)
+        return p.stdout.decode("utf-8", errors="replace").strip()
+    except Exception:
+        return ""
+
+
+def compare_reports(baseline: Dict[str, Any], current: Dict[str, Any], threshold: float = 1.10) -> int:
+    """按 (name, rows) 对比 median；变慢超过 threshold 倍的记为回归。返回回归数量。"""
+    def _key(r: Dict[str, Any]):
+        return (r.get("name"), r.get("rows"))
+
+    base = {_key(r): r for r in baseline.get("results", [])}
+    regressions = 0
+    for r in current.get("results", []):
+        b = base.get(_key(r))
+        if not b or not b.get("median_s"):
+            continue
+        ratio = r["median_s"] / b["median_s"]
+        flag = "  ⚠️ 回归" if ratio > threshold else ""
+        if flag:
+            regressions += 1
+        rows = f" rows={r['rows']}" if r.get("rows") is not None else ""
+        print(f"{r['name']}{rows}: {b['median_s'] * 1000:.2f} ms -> {r['median_s'] * 1000:.2f} ms (x{ratio:.2f}){flag}", file=sys.stderr)
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Offline benchmark for privacy_merge / googleSites.")
+    parser.add_argument("--sizes", default=",".join(str(s) for s in DEFAULT_SIZES), help="Comma separated row counts")
+    parser.add_argument("--repeat", type=int, default=5, help="Timed iterations per case")
+    parser.add_argument("--git-repeat", type=int, default=5, help="Timed git_commit_push iterations")
+    parser.add_argument("--skip-git", action="store_true", help="Skip the git_commit_push benchmark")
+    parser.add_argument("--out", help="Write JSON report to this file (default: stdout)")
+    parser.add_argument("--compare", help="Baseline JSON report to compare medians against")
+    args = parser.parse_args()
+
+    sizes = [int(s) for s in args.sizes.split(",") if s.strip()]
+    report: Dict[str, Any] = {
+        "meta": {
+            "commit": _git_head(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "repeat": args.repeat,
+            "sizes": sizes,
+        },
+        "results": [],
+    }
+
+    # 非限流场景只测本地处理耗时，不让客户端限流器参与计时
+    lark_http.LIMITER = lark_http.AdaptiveLimiter(rate=1e6, max_rate=1e6, max_concurrency=64)
+    # doc 缓存放临时目录，不碰仓库里的 .cache/
+    cache_tmp = tempfile.mkdtemp(prefix="privacy-bench-cache-")
+    lark_http._doc_cache = lark_http.DocCache(Path(cache_tmp))
+
+    with FakeLarkServer() as server:
+        for rows in sizes:
+            print(f"📊 rows={rows}", file=sys.stderr)
+            report["results"].extend(bench_size(server, rows, args.repeat))
+
+    print("📊 throttled server", file=sys.stderr)
+    report["results"].extend(bench_throttled())
+
+    print("📊 render", file=sys.stderr)
+    report["results"].extend(bench_render(args.repeat))
+
+    if not args.skip_git:
+        print("📊 git", file=sys.stderr)
+        report["results"].extend(bench_git_publish(args.git_repeat))
+
+    shutil.rmtree(cache_tmp, ignore_errors=True)
+
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.out:
+        Path(args.out).write_text(text + "\n", encoding="utf-8")
+        print(f"✅ 已写入 {args.out}", file=sys.stderr)
+    else:
+        print(text)
+
+    if args.compare:
+        baseline = json.loads(Path(args.compare).read_text(encoding="utf-8"))
+        if compare_reports(baseline, report):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
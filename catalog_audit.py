@@ -0,0 +1,436 @@
+"""离线目录审计：pages_manifest.json vs pages/ 文件 vs git 提交 vs 按当前模板重新渲染的结果。
+
+不访问网络，也不改任何文件。逐页检查：
+  missing_file     manifest 里有，磁盘上没有 index.html
+  not_in_ref       磁盘上有，git 引用（默认 HEAD；部署分支模式下是 origin/<分支>）里没有
+  uncommitted      磁盘内容与 git 引用里的不一致
+  render_drift     磁盘内容与“manifest 里记录的 app/company/email + 当前 muban.html + 当前页面模板”
+                   重新渲染的结果不一致（content_same=true 表示可见文本一样、只是标记/样式变了）
+  no_source        manifest 和页面里都没记录 app/company/email（老页面），无法重新渲染核对
+  orphan           pages/ 下有页面，manifest 里没有（也不是迁移留下的跳转页）
+  legacy_unindexed 同上，但页面没有内嵌信息：manifest 出现之前发布的老页面，只提示；
+                   用 --rebuild-manifest pages_manifest.json 把它们收录进 manifest
+  duplicate_id     同一个订单号发布在多个 slug 下（slug 含 slugify(title)，改过 App 名就会出现）
+
+哈希和重新渲染在进程池里分块并行；git 只调用一次 ls-tree 取整棵树的 blob 哈希，和磁盘文件的
+git blob 哈希直接比较。几千个页面几秒内完成。
+
+页面自带输入（<head> 里的 privacy-page-meta，见 googleSites.build_page_meta）：manifest 没记录 source
+时用页面里的；--rebuild-manifest 只读页面就能重建 pages_manifest.json（同样并行、不访问网络）。
+
+用法：
+  python catalog_audit.py                       # 打印摘要；有问题时退出码 1
+  python catalog_audit.py --report drift.json   # 同时写机器可读报告
+  python catalog_audit.py --workers 8 --ref origin/gh-pages --no-render
+  python catalog_audit.py --rebuild-manifest rebuilt.json   # 从页面内嵌信息重建 manifest
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import os
+import re
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import deadlines
+import googleSites
+from googleSites import REPO_ROOT, template_fingerprint
+
+FINDING_KINDS = (
+    "missing_file",
+    "not_in_ref",
+    "uncommitted",
+    "render_drift",
+    "no_source",
+    "orphan",
+    "legacy_unindexed",
+    "duplicate_id",
+)
+# 这些只是提示，不算漂移（不影响退出码）
+INFO_KINDS = ("no_source", "legacy_unindexed")
+CHUNK_SIZE = 64
+
+
+def git_blob_sha1(data: bytes) -> str:
+    return hashlib.sha1(b"blob %d\0" % len(data) + data).hexdigest()
+
+
+def git_tree_blobs(root: Path, ref: str) -> Optional[Dict[str, str]]:
+    """ref 里 pages/ 下每个文件的 blob 哈希（相对路径 -> sha1）；ref 不存在或不是 git 仓库返回 None。"""
+    p = deadlines.run_process(["git", "ls-tree", "-r", "-z", "--full-tree", ref, "--", "pages"], "git", cwd=str(root))
+    if p.returncode != 0:
+        return None
+    blobs: Dict[str, str] = {}
+    for rec in p.stdout.split(b"\0"):
+        if not rec:
+            continue
+        meta, _, path = rec.partition(b"\t")
+        parts = meta.split()
+        if len(parts) == 3 and parts[1] == b"blob":
+            blobs[path.decode("utf-8", "surrogateescape")] = parts[2].decode("ascii")
+    return blobs
+
+
+def default_ref() -> str:
+    branch = googleSites.DEPLOY_BRANCH
+    return f"origin/{branch}" if branch else "HEAD"
+
+
+# --- 进程池里跑的部分（只接收/返回可 pickle 的简单数据） ---
+
+# 模板只按三个字段做字面替换，所以每个进程只真正渲染一次（用占位值），之后每页做字符串替换。
+# 含 HTML 特殊字符 / 反斜杠 / 多余空白的值可能被解析改写，这些走完整渲染。
+_SENTINELS = {"app": "AUDITAPPSENTINEL", "company": "AUDITCOMPANYSENTINEL", "email": "audit.sentinel@example.invalid"}
+_PLAIN_VALUE_RE = re.compile(r"^[^<>&\\\s]+(?: [^<>&\\\s]+)*$")
+_text_template: Optional[str] = None
+_fast_path_checked = False
+
+
+def _render_text(source: Dict[str, str]) -> str:
+    global _text_template, _fast_path_checked
+    import privacy_merge
+
+    values = {k: (source.get(k) or "").strip() for k in _SENTINELS}
+    if _text_template is None:
+        _text_template = privacy_merge.render_privacy_text(_SENTINELS["app"], _SENTINELS["company"], _SENTINELS["email"])
+    if not _text_template or not all(_PLAIN_VALUE_RE.match(v) for v in values.values()):
+        return privacy_merge.render_privacy_text(values["app"], values["company"], values["email"])
+    text = _text_template
+    for k, sentinel in _SENTINELS.items():
+        text = text.replace(sentinel, values[k])
+    if not _fast_path_checked:
+        # 第一页用完整渲染核对一次；不一致（模板改了替换方式）就整个进程都走完整渲染
+        _fast_path_checked = True
+        full = privacy_merge.render_privacy_text(values["app"], values["company"], values["email"])
+        if full != text:
+            _text_template = ""
+            return full
+    return text
+
+
+def _expected_html(rel_dir: str, source: Dict[str, str], raw_id: str = "") -> str:
+    text = _render_text(source)
+    css_href = googleSites.stylesheet_href_for(rel_dir) if googleSites.LEAN_OUTPUT else None
+    page = googleSites.PageData(title=source["app"], content=text)
+    meta = googleSites.build_page_meta(page, raw_id=raw_id, source=source)
+    return googleSites.render_html(page, css_href=css_href, meta=meta)
+
+
+def _source_from_meta(meta: Optional[Dict[str, Any]]) -> Optional[Dict[str, str]]:
+    if meta and all(meta.get(k) for k in ("app", "company", "email")):
+        return {k: meta[k] for k in ("app", "company", "email")}
+    return None
+
+
+def _audit_chunk(tasks: List[Dict[str, Any]], render: bool) -> List[Dict[str, Any]]:
+    findings: List[Dict[str, Any]] = []
+    for t in tasks:
+        base = {"slug": t["slug"], "id": t["id"], "path": t["rel_path"]}
+        if t.get("target"):
+            base["target"] = t["target"]
+        try:
+            data = Path(t["abs_path"]).read_bytes()
+        except OSError:
+            findings.append({"kind": "missing_file", **base})
+            continue
+
+        sha = git_blob_sha1(data)
+        if t["ref_checked"]:
+            ref_blob = t.get("ref_blob")
+            if ref_blob is None:
+                findings.append({"kind": "not_in_ref", "blob": sha, **base})
+            elif ref_blob != sha:
+                findings.append({"kind": "uncommitted", "blob": sha, "ref_blob": ref_blob, **base})
+
+        if not render:
+            continue
+        source = t.get("source") or _source_from_meta(googleSites.read_page_meta(data.decode("utf-8", "replace")))
+        if not source:
+            findings.append({"kind": "no_source", **base})
+            continue
+        try:
+            expected = _expected_html(t["rel_dir"], source, t["id"]).encode("utf-8")
+        except Exception as e:
+            findings.append({"kind": "render_drift", "error": str(e), **base})
+            continue
+        if expected != data:
+            on_disk = data.decode("utf-8", "replace")
+            content_same = googleSites.visible_text(on_disk) == googleSites.visible_text(expected.decode("utf-8"))
+            findings.append(
+                {
+                    "kind": "render_drift",
+                    "content_same": content_same,
+                    "blob": sha,
+                    "expected_blob": git_blob_sha1(expected),
+                    **base,
+                }
+            )
+    return findings
+
+
+def _quiet_worker() -> None:
+    # 模板替换未命中等警告每页都会打印一次；报告里已经有结果，这里静音
+    sys.stdout = open(os.devnull, "w")
+
+
+# --- 主流程 ---
+
+
+def _page_root(entry: Dict[str, Any]) -> Tuple[Path, str]:
+    target = entry.get("target") or ""
+    if target:
+        return googleSites.TARGETS_WORK_DIR / target, target
+    return REPO_ROOT, ""
+
+
+def collect_tasks(manifest: Dict[str, Any], ref: str) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+    """manifest -> 每页一个任务；顺带算出 git 引用信息（每个仓库一次 ls-tree）。"""
+    trees: Dict[str, Optional[Dict[str, str]]] = {}
+    tasks: List[Dict[str, Any]] = []
+    for slug, entry in sorted(manifest["pages"].items()):
+        root, target = _page_root(entry)
+        key = str(root)
+        if key not in trees:
+            trees[key] = git_tree_blobs(root, ref if not target else "HEAD")
+        tree = trees[key]
+        rel_dir = (entry.get("path") or googleSites.page_rel_dir(slug)).rstrip("/")
+        rel_path = f"{rel_dir}/index.html"
+        tasks.append(
+            {
+                "slug": slug,
+                "id": entry.get("id") or "",
+                "target": target,
+                "rel_dir": rel_dir,
+                "rel_path": rel_path,
+                "abs_path": str(root / rel_path),
+                "source": entry.get("source"),
+                "ref_checked": tree is not None,
+                "ref_blob": tree.get(rel_path) if tree is not None else None,
+            }
+        )
+    refs = {k: (v is not None) for k, v in trees.items()}
+    return tasks, refs
+
+
+def find_orphans(manifest: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """manifest 没引用的页面。带内嵌信息的是 orphan（发布后 manifest 丢了条目）；没有内嵌信息的
+    是 manifest 之前的老页面（legacy_unindexed），只提示，--rebuild-manifest 可以把它们收录进来。"""
+    referenced = set()
+    roots = {REPO_ROOT}
+    for entry in manifest["pages"].values():
+        root, _ = _page_root(entry)
+        roots.add(root)
+        for key in ("path", "redirect_from"):
+            if entry.get(key):
+                referenced.add(root / entry[key].rstrip("/") / "index.html")
+    orphans = []
+    for root in sorted(roots):
+        pages_dir = root / "pages"
+        if not pages_dir.exists():
+            continue
+        for index_path in sorted(pages_dir.rglob("index.html")):
+            if index_path in referenced or googleSites._is_redirect_stub(index_path):
+                continue
+            slug = index_path.parent.name
+            try:
+                meta = googleSites.read_page_meta(index_path.read_text(encoding="utf-8", errors="replace"))
+            except OSError:
+                meta = None
+            orphan = {
+                "kind": "orphan" if meta else "legacy_unindexed",
+                "slug": slug,
+                "id": googleSites.decode_id_from_slug(slug),
+                "path": str(index_path.parent.relative_to(root)) + "/index.html",
+            }
+            if root != REPO_ROOT:
+                orphan["target"] = root.name
+            orphans.append(orphan)
+    return orphans
+
+
+def find_duplicate_ids(manifest: Dict[str, Any]) -> List[Dict[str, Any]]:
+    by_id: Dict[str, List[str]] = {}
+    for slug, entry in manifest["pages"].items():
+        oid = (entry.get("id") or "").strip().upper()
+        if oid:
+            by_id.setdefault(oid, []).append(slug)
+    return [
+        {"kind": "duplicate_id", "id": oid, "slugs": sorted(slugs)}
+        for oid, slugs in sorted(by_id.items())
+        if len(slugs) > 1
+    ]
+
+
+def _scan_chunk(tasks: List[Tuple[str, str, str]]) -> List[Dict[str, Any]]:
+    """(仓库根, 页面相对目录, target) -> 页面内嵌信息；跳转页跳过。"""
+    out: List[Dict[str, Any]] = []
+    for root, rel_dir, target in tasks:
+        index_path = Path(root) / rel_dir / "index.html"
+        try:
+            doc = index_path.read_text(encoding="utf-8", errors="replace")
+            mtime = index_path.stat().st_mtime
+        except OSError:
+            continue
+        if googleSites.REDIRECT_STUB_MARKER in doc:
+            continue
+        out.append(
+            {
+                "rel_dir": rel_dir,
+                "target": target,
+                "meta": googleSites.read_page_meta(doc),
+                "updated": time.strftime("%Y-%m-%dT%H:%M:%S%z", time.localtime(mtime)),
+            }
+        )
+    return out
+
+
+def rebuild_manifest(workers: Optional[int] = None) -> Tuple[Dict[str, Any], Dict[str, int]]:
+    """只读 pages/ 下的页面（主仓库 + 已检出的目标仓库），重建 manifest；不访问网络。
+
+    id / 标题 / app / company / email 来自页面内嵌信息；没有内嵌信息的老页面从 slug 解出订单号、
+    不带 source。redirect_from 只存在于 manifest 里，沿用现有 manifest 的记录。
+    """
+    current = googleSites.load_manifest()
+    roots: List[Tuple[Path, str]] = [(REPO_ROOT, "")]
+    if googleSites.TARGETS_WORK_DIR.exists():
+        roots += [(d, d.name) for d in sorted(googleSites.TARGETS_WORK_DIR.iterdir()) if (d / "pages").is_dir()]
+    tasks = [
+        (str(root), str(p.parent.relative_to(root)), target)
+        for root, target in roots
+        if (root / "pages").is_dir()
+        for p in sorted((root / "pages").rglob("index.html"))
+    ]
+    chunks = [tasks[i : i + CHUNK_SIZE] for i in range(0, len(tasks), CHUNK_SIZE)]
+    scanned: List[Dict[str, Any]] = []
+    if len(chunks) <= 1:
+        for chunk in chunks:
+            scanned.extend(_scan_chunk(chunk))
+    else:
+        with ProcessPoolExecutor(max_workers=workers or os.cpu_count()) as pool:
+            for part in pool.map(_scan_chunk, chunks):
+                scanned.extend(part)
+
+    manifest: Dict[str, Any] = {k: v for k, v in current.items() if k != "pages"}
+    manifest["pages"] = {}
+    stats = {"pages": 0, "with_meta": 0, "with_source": 0}
+    for row in scanned:
+        slug = row["rel_dir"].rstrip("/").rsplit("/", 1)[-1]
+        meta = row["meta"] or {}
+        source = _source_from_meta(meta)
+        old = current["pages"].get(slug) or {}
+        entry: Dict[str, Any] = {
+            "id": meta.get("id") or old.get("id") or googleSites.decode_id_from_slug(slug),
+            "title": meta.get("app") or old.get("title") or "",
+            "path": row["rel_dir"].rstrip("/") + "/",
+            "updated": old.get("updated") or row["updated"],
+        }
+        if source:
+            entry["source"] = source
+        elif old.get("source"):
+            entry["source"] = old["source"]
+        if old.get("redirect_from"):
+            entry["redirect_from"] = old["redirect_from"]
+        if row["target"]:
+            entry["target"] = row["target"]
+        manifest["pages"][slug] = entry
+        stats["pages"] += 1
+        stats["with_meta"] += bool(row["meta"])
+        stats["with_source"] += "source" in entry
+    return manifest, stats
+
+
+def run_audit(ref: Optional[str] = None, workers: Optional[int] = None, render: bool = True) -> Dict[str, Any]:
+    started = time.monotonic()
+    manifest = googleSites.load_manifest()
+    ref = ref or default_ref()
+    tasks, refs = collect_tasks(manifest, ref)
+
+    findings: List[Dict[str, Any]] = []
+    chunks = [tasks[i : i + CHUNK_SIZE] for i in range(0, len(tasks), CHUNK_SIZE)]
+    if len(chunks) <= 1:
+        for chunk in chunks:
+            findings.extend(_audit_chunk(chunk, render))
+    else:
+        with ProcessPoolExecutor(max_workers=workers or os.cpu_count(), initializer=_quiet_worker) as pool:
+            for part in pool.map(_audit_chunk, chunks, [render] * len(chunks)):
+                findings.extend(part)
+    findings.extend(find_orphans(manifest))
+    findings.extend(find_duplicate_ids(manifest))
+
+    counts = {k: 0 for k in FINDING_KINDS}
+    for f in findings:
+        counts[f["kind"]] += 1
+    return {
+        "version": 1,
+        "generated": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "ref": ref,
+        "ref_available": refs,
+        "template": template_fingerprint() if render else "",
+        "pages": len(tasks),
+        "counts": counts,
+        "drift": sum(n for k, n in counts.items() if k not in INFO_KINDS),
+        "elapsed_seconds": round(time.monotonic() - started, 3),
+        "findings": findings,
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Offline audit: manifest vs pages/ vs git vs expected render.")
+    parser.add_argument("--report", help="Write the machine-readable drift report (JSON) to this path ('-' for stdout)")
+    parser.add_argument("--ref", help="git ref to compare against (default: HEAD, or origin/<deploy branch>)")
+    parser.add_argument("--workers", type=int, default=None, help="Process pool size (default: CPU count)")
+    parser.add_argument("--no-render", action="store_true", help="Skip re-rendering (only manifest/files/git checks)")
+    parser.add_argument(
+        "--rebuild-manifest",
+        metavar="PATH",
+        help="Rebuild the manifest from the metadata embedded in pages/ and write it to PATH ('-' for stdout); no audit",
+    )
+    args = parser.parse_args()
+
+    if args.rebuild_manifest:
+        started = time.monotonic()
+        manifest, stats = rebuild_manifest(workers=args.workers)
+        text = json.dumps(manifest, ensure_ascii=False, indent=2, sort_keys=True) + "\n"
+        if args.rebuild_manifest == "-":
+            sys.stdout.write(text)
+            return 0
+        out = Path(args.rebuild_manifest)
+        tmp = out.with_name(out.name + ".tmp")
+        tmp.write_text(text, encoding="utf-8")
+        os.replace(tmp, out)
+        print(
+            f"🧱 从 {stats['pages']} 个页面重建 manifest（{stats['with_meta']} 个带内嵌信息，"
+            f"{stats['with_source']} 个可重新渲染），耗时 {round(time.monotonic() - started, 3)}s -> {out}"
+        )
+        return 0
+
+    report = run_audit(ref=args.ref, workers=args.workers, render=not args.no_render)
+    if args.report == "-":
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+    else:
+        if args.report:
+            out = Path(args.report)
+            tmp = out.with_name(out.name + ".tmp")
+            tmp.write_text(json.dumps(report, ensure_ascii=False, indent=2) + "\n", encoding="utf-8")
+            os.replace(tmp, out)
+        print(f"🔎 审计 {report['pages']} 个页面（{report['ref']}，模板 {report['template'] or '-'}），耗时 {report['elapsed_seconds']}s")
+        for kind, n in report["counts"].items():
+            if n:
+                print(f"  {'ℹ️' if kind in INFO_KINDS else '⚠️'} {kind}: {n}")
+        if report["counts"].get("legacy_unindexed"):
+            print("  💡 老页面还没进 manifest：python catalog_audit.py --rebuild-manifest pages_manifest.json")
+        if not report["drift"]:
+            print("✅ 没有发现漂移")
+        elif args.report:
+            print(f"📄 报告已写入 {args.report}")
+    return 1 if report["drift"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,308 @@
+"""超时与截止时间：一次运行一个总预算，按阶段切成具体超时，传给 git / ssh / HTTP / 浏览器等待 / input()。
+
+每个会阻塞的调用都先问 timeout_for(阶段)：拿到 min(阶段上限, 剩余预算)；预算已用完直接抛
+DeadlineExceeded，不再发起新的网络请求或子进程。子进程用 run_process() 启动：单独的进程组、
+stdin 接 /dev/null（ssh 的 host key / passphrase 提示直接失败而不是卡住），超时后整组杀掉。
+
+privacy_merge.py 拉起的 googleSites.py 通过环境变量 PRIVACY_DEADLINE 继承父进程的截止时间，
+父进程等子进程时再多给一点余量（KILL_GRACE_SECONDS），让子进程先自己报告超时。
+--watch / --prefetch 每一轮单独一个预算（scope），一轮超时只影响这一轮。
+
+环境变量：
+  PRIVACY_RUN_BUDGET          一次运行（或 watch / prefetch 的一轮）的总预算，秒（默认 1800；0 表示不限）
+  PRIVACY_TIMEOUT_<阶段>       覆盖某个阶段的上限，例如 PRIVACY_TIMEOUT_GIT_NETWORK=60、PRIVACY_TIMEOUT_INPUT=120
+  PRIVACY_DEADLINE            （内部）父进程的截止时间（epoch 秒），子进程继承
+"""
+
+from __future__ import annotations
+
+import contextlib
+import os
+import select
+import signal
+import subprocess
+import sys
+import threading
+import time
+from typing import Dict, Iterator, List, Optional
+
+from run_metrics import METRICS
+from run_trace import TRACER
+
+DEADLINE_ENV = "PRIVACY_DEADLINE"
+DEFAULT_RUN_BUDGET = 1800.0
+# 与 coreutils timeout 一致：超时退出码 124
+TIMEOUT_EXIT_CODE = 124
+# 父进程等子进程时多给的余量；杀进程组时 SIGTERM 到 SIGKILL 之间的等待
+KILL_GRACE_SECONDS = 5.0
+
+# 各阶段的上限（秒）；实际超时 = min(上限, 调用方给的值, 剩余预算)
+STAGE_TIMEOUTS: Dict[str, float] = {
+    "git": 60,  # 本地 git：add / commit / config / rev-parse / ls-tree …
+    "git_network": 180,  # pull / push / fetch / ls-remote
+    "git_lock": 600,  # 等待其他发布进程释放 git 锁
+    "ssh_agent": 10,  # ssh-add -L
+    "http": 60,  # 单个 HTTP 请求（Lark records / doc / Bitable）
+    "browser_wait": 90,  # 打开表格页
+    "login": 300,  # 等待扫码登录 + 第一个 records 请求
+    "input": 300,  # 终端交互（输入编号）
+    "publish": 900,  # 子进程 googleSites.py
+    "verify": 180,  # 等页面可访问
+    "rsync": 300,
+    "cmd": 30,  # 其他小命令（pbcopy / osascript）
+}
+
+GIT_NETWORK_COMMANDS = ("push", "pull", "fetch", "ls-remote", "clone")
+
+
+class DeadlineExceeded(TimeoutError):
+    """阶段超时或运行预算用完。"""
+
+    def __init__(self, stage: str, seconds: float, detail: str = ""):
+        self.stage = stage
+        self.seconds = seconds
+        msg = detail or f"{stage} 超时（{seconds:.0f}s）"
+        super().__init__(msg)
+
+
+class CommandTimeout(DeadlineExceeded):
+    """run_process 里的子进程超时（进程组已杀掉）；stdout / stderr 是已经读到的部分。"""
+
+    def __init__(self, cmd: List[str], stage: str, seconds: float, stdout: bytes = b"", stderr: bytes = b""):
+        self.cmd = cmd
+        self.stdout = stdout or b""
+        self.stderr = stderr or b""
+        super().__init__(stage, seconds, f"{' '.join(map(str, cmd[:3]))} 超时（{seconds:.0f}s），已终止")
+
+
+def _env_float(name: str, default: Optional[float]) -> Optional[float]:
+    raw = (os.environ.get(name) or "").strip()
+    if not raw:
+        return default
+    try:
+        return float(raw)
+    except ValueError:
+        return default
+
+
+def stage_limit(stage: str) -> float:
+    return _env_float(f"PRIVACY_TIMEOUT_{stage.upper()}", STAGE_TIMEOUTS.get(stage, STAGE_TIMEOUTS["cmd"]))
+
+
+def run_budget() -> Optional[float]:
+    """PRIVACY_RUN_BUDGET；0 / 负数表示不限。"""
+    v = _env_float("PRIVACY_RUN_BUDGET", DEFAULT_RUN_BUDGET)
+    return v if v and v > 0 else None
+
+
+class Deadline:
+    """一个截止时间（epoch 秒，None 表示不限）。用 wall clock 是为了能通过环境变量传给子进程。"""
+
+    def __init__(self, at: Optional[float] = None):
+        self.at = at
+
+    @classmethod
+    def after(cls, seconds: Optional[float]) -> "Deadline":
+        return cls(time.time() + seconds if seconds else None)
+
+    @classmethod
+    def from_env(cls) -> "Deadline":
+        return cls(_env_float(DEADLINE_ENV, None))
+
+    def tighter(self, other: "Deadline") -> "Deadline":
+        ats = [a for a in (self.at, other.at) if a is not None]
+        return Deadline(min(ats) if ats else None)
+
+    def remaining(self) -> float:
+        return float("inf") if self.at is None else self.at - time.time()
+
+
+_current = Deadline.from_env()
+
+
+def current() -> Deadline:
+    return _current
+
+
+def remaining() -> float:
+    """剩余预算（秒）；不限时为 inf。"""
+    return _current.remaining()
+
+
+def start_run(budget: Optional[float] = None) -> Deadline:
+    """进程入口调用一次：截止时间 = min(继承的 PRIVACY_DEADLINE, 现在 + 预算)。"""
+    global _current
+    _current = _current.tighter(Deadline.after(budget if budget is not None else run_budget()))
+    return _current
+
+
+@contextlib.contextmanager
+def scope(budget: Optional[float] = None) -> Iterator[Deadline]:
+    """在当前截止时间内再收紧一层（watch / prefetch 每轮一个），退出时恢复。"""
+    global _current
+    saved = _current
+    _current = saved.tighter(Deadline.after(budget if budget is not None else run_budget()))
+    try:
+        yield _current
+    finally:
+        _current = saved
+
+
+def timeout_for(stage: str, cap: Optional[float] = None) -> float:
+    """本次调用可用的超时：min(阶段上限, cap, 剩余预算)；预算已用完抛 DeadlineExceeded。"""
+    rem = _current.remaining()
+    if rem <= 0:
+        METRICS.count("timeouts")
+        raise DeadlineExceeded(stage, 0, f"运行预算已用完，放弃 {stage}")
+    limit = stage_limit(stage)
+    if cap is not None:
+        limit = min(limit, cap)
+    return max(0.1, min(limit, rem))
+
+
+def child_env(env: Optional[Dict[str, str]] = None) -> Dict[str, str]:
+    """给子进程的环境变量：带上本进程的截止时间。"""
+    out = dict(os.environ if env is None else env)
+    if _current.at is not None:
+        out[DEADLINE_ENV] = f"{_current.at:.3f}"
+    return out
+
+
+def git_stage(cmd: List[str]) -> str:
+    if cmd and cmd[0] == "git":
+        args = [c for c in cmd[1:] if not c.startswith("-")]
+        return "git_network" if args and args[0] in GIT_NETWORK_COMMANDS else "git"
+    return "cmd"
+
+
+def _kill_tree(p: subprocess.Popen) -> None:
+    """杀掉子进程及其派生的进程（git -> ssh）；先 TERM，等一会儿再 KILL。"""
+    if os.name == "posix":
+        for sig in (signal.SIGTERM, signal.SIGKILL):
+            try:
+                os.killpg(p.pid, sig)
+            except (ProcessLookupError, PermissionError):
+                return
+            try:
+                p.wait(timeout=KILL_GRACE_SECONDS)
+                return
+            except subprocess.TimeoutExpired:
+                continue
+    else:
+        subprocess.run(["taskkill", "/T", "/F", "/PID", str(p.pid)], capture_output=True)
+        p.kill()
+
+
+def run_process(
+    cmd: List[str],
+    stage: str,
+    *,
+    cwd: Optional[str] = None,
+    env: Optional[Dict[str, str]] = None,
+    input: Optional[bytes] = None,
+    cap: Optional[float] = None,
+) -> subprocess.CompletedProcess:
+    """subprocess.run 的替代（二进制输出）：有超时，超时后整个进程组被杀掉并抛 CommandTimeout。"""
+    limit = timeout_for(stage, cap)
+    if os.name == "posix":
+        group = {"start_new_session": True}
+    else:
+        group = {"creationflags": getattr(subprocess, "CREATE_NEW_PROCESS_GROUP", 0)}
+    p = subprocess.Popen(
+        cmd,
+        cwd=cwd,
+        env=env,
+        stdin=subprocess.PIPE if input is not None else subprocess.DEVNULL,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        **group,
+    )
+    label = " ".join(os.path.basename(str(c)) for c in cmd[:2])
+    with TRACER.span(label, "subprocess", stage=stage, cmd=" ".join(map(str, cmd[:6]))) as span:
+        try:
+            out, err = p.communicate(input, timeout=limit)
+        except subprocess.TimeoutExpired:
+            _kill_tree(p)
+            try:
+                out, err = p.communicate(timeout=KILL_GRACE_SECONDS)
+            except (subprocess.TimeoutExpired, ValueError):
+                out, err = b"", b""
+            METRICS.count("timeouts")
+            span["timed_out"] = True
+            raise CommandTimeout(cmd, stage, limit, out, err)
+        except BaseException:
+            _kill_tree(p)
+            raise
+        span["returncode"] = p.returncode
+    return subprocess.CompletedProcess(cmd, p.returncode, out, err)
+
+
+def _stdin_fd() -> Optional[int]:
+    if os.name != "posix" or sys.stdin is None:
+        return None
+    try:
+        return sys.stdin.fileno()
+    except (AttributeError, ValueError, OSError):
+        return None
+
+
+def timed_input(prompt: str, stage: str = "input", cap: Optional[float] = None) -> str:
+    """带超时的 input()；超时抛 DeadlineExceeded，stdin 关闭抛 EOFError（与 input() 一致）。
+
+    POSIX 上用 select 等 stdin 可读；其他平台退回到后台线程读取。
+    """
+    limit = timeout_for(stage, cap)
+    fd = _stdin_fd()
+    if fd is not None:
+        sys.stdout.write(prompt)
+        sys.stdout.flush()
+        ready, _, _ = select.select([fd], [], [], limit)
+        if not ready:
+            print()
+            METRICS.count("timeouts")
+            raise DeadlineExceeded(stage, limit, f"{limit:.0f}s 内没有输入")
+        line = sys.stdin.readline()
+        if not line:
+            raise EOFError
+        return line.rstrip("\r\n")
+
+    box: Dict[str, object] = {}
+
+    def _read() -> None:
+        try:
+            box["value"] = input(prompt)
+        except BaseException as e:  # EOFError 等交给调用方
+            box["error"] = e
+
+    t = threading.Thread(target=_read, name="timed-input", daemon=True)
+    t.start()
+    t.join(limit)
+    if t.is_alive():
+        print()
+        METRICS.count("timeouts")
+        raise DeadlineExceeded(stage, limit, f"{limit:.0f}s 内没有输入")
+    if "error" in box:
+        raise box["error"]  # type: ignore[misc]
+    return str(box.get("value", ""))
+
+
+def _raise_on_sigterm(signum, _frame) -> None:
+    # 子进程在单独的进程组里，收不到发给我们的 SIGTERM；转成 SystemExit，run_process 会先杀掉它们
+    raise SystemExit(128 + signum)
+
+
+@contextlib.contextmanager
+def exit_on_timeout() -> Iterator[None]:
+    """包住脚本入口：超时 / 预算用完时打印原因，退出码 124（不打印 traceback）。
+
+    同时把 SIGTERM 转成 SystemExit，被 kill / 外层 timeout 终止时也会清理正在运行的子进程组。
+    """
+    if hasattr(signal, "SIGTERM") and threading.current_thread() is threading.main_thread():
+        signal.signal(signal.SIGTERM, _raise_on_sigterm)
+    try:
+        yield
+    except DeadlineExceeded as e:
+        print(f"⏱️ {e}")
+        METRICS.outcome("timeout", e.stage)
+        sys.stdout.flush()
+        sys.exit(TIMEOUT_EXIT_CODE)
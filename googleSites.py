@@ -1,14 +1,38 @@
 import argparse
+import contextlib
+import hashlib
 import html
+import json
 import re
+import shutil
 import subprocess
+import tempfile
 import base64
 import os
+import threading
 import time
 import urllib.request
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
+from html.parser import HTMLParser
 from pathlib import Path
-from typing import Optional
+from typing import Iterator, Optional
+
+import deadlines
+import preflight
+from deadlines import CommandTimeout, exit_on_timeout
+from run_metrics import METRICS, record_run
+from run_trace import TRACER
+from publish_backends import BACKENDS, PublishBackend, PublishError, backend_from_env, selected_backend_name
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+try:
+    import msvcrt
+except ImportError:
+    msvcrt = None
 
 
 REPO_ROOT = Path(__file__).resolve().parent
@@ -16,11 +40,52 @@ PAGES_DIR = REPO_ROOT / "pages"
 INDEX_HTML_PATH = REPO_ROOT / "index.html"
 DEFAULT_COMMIT_MESSAGE = "Update privacy page"
 
+# 已发布页面清单（slug -> id/title/路径），放在仓库根目录（不在 pages/ 下，不随 Pages 发布）
+MANIFEST_NAME = "pages_manifest.json"
+
+# pages/ 目录布局：
+#   flat    -> pages/<slug>/index.html（历史布局）
+#   sharded -> pages/<2 位 hex>/<slug>/index.html，目录数量不随 App 数线性增长
+PAGE_LAYOUTS = ("flat", "sharded")
+
+# 可选：把 pages/（及 assets/、根目录 404 页）部署到单独的 Pages 分支，每次发布是一个
+# 无父提交的快照（force-with-lease 更新）；工具分支只保留脚本和 pages_manifest.json，
+# clone / pull 的体积只跟当前页面数量有关，不随发布历史增长。为空则沿用原来的单分支发布。
+DEPLOY_BRANCH = (os.environ.get("PRIVACY_PAGES_DEPLOY_BRANCH") or "").strip()
+DEPLOY_PATHS = ("pages", "assets", "index.html", "robots.txt")
+
 # 固定页面模板：H1 永远为 "Privacy Policy"（居中、黑体、H1 大小）
 # 注意：页面标签 <title> 也固定为 Privacy Policy（App 名称不放在标题，以免被要求统一标题）。
 FALLBACK_TEMPLATE = """<html lang=\"zh-CN\">\n<head>\n  <meta charset=\"utf-8\">\n  <meta name=\"viewport\" content=\"width=device-width,initial-scale=1\">\n  <title>Privacy Policy</title>\n  <style>\n    body{{font-family:system-ui,-apple-system,Segoe UI,Roboto,\"Helvetica Neue\",Arial;background:#f7f7fb;margin:0;padding:24px}}\n    .container{{max-width:860px;margin:28px auto;background:#fff;border-radius:10px;padding:28px;box-shadow:0 6px 22px rgba(20,20,30,0.06)}}\n    h1{{margin:0 0 18px;font-size:2rem;font-weight:700;text-align:center}}\n    .content{{line-height:1.7;color:#222;white-space:normal}}\n  </style>\n</head>\n<body>\n  <main class=\"container\">\n    <h1>Privacy Policy</h1>\n    <div class=\"content\">\n{content}\n    </div>\n  </main>\n</body>\n</html>\n"""
 
 
+# 精简输出（默认开启；PRIVACY_PAGES_LEAN=0 回退到旧的内联 CSS + <br> 版本）：
+#   - 样式放到共享的 assets/privacy.<hash>.css（内容哈希做文件名，可长期缓存；改样式只动一个文件）
+#   - 正文用 <p>/<ul>/<ol> 语义标签代替 <br> 链，去掉多余空白
+LEAN_OUTPUT = (os.environ.get("PRIVACY_PAGES_LEAN") or "1").strip() != "0"
+ASSETS_DIR_NAME = "assets"
+
+SHARED_CSS = (
+    "body{font-family:system-ui,-apple-system,Segoe UI,Roboto,\"Helvetica Neue\",Arial;background:#f7f7fb;margin:0;padding:24px}"
+    ".container{max-width:860px;margin:28px auto;background:#fff;border-radius:10px;padding:28px;box-shadow:0 6px 22px rgba(20,20,30,0.06)}"
+    "h1{margin:0 0 18px;font-size:2rem;font-weight:700;text-align:center}"
+    ".content{line-height:1.7;color:#222;white-space:normal;overflow-wrap:anywhere}"
+    ".content p{margin:0 0 1em}"
+    ".content ul,.content ol{margin:0 0 1em;padding-left:1.5em}"
+    ".content li{margin:0 0 .5em}"
+)
+
+LEAN_TEMPLATE = (
+    "<!doctype html>\n"
+    "<html lang=\"zh-CN\"><head><meta charset=\"utf-8\">"
+    "<meta name=\"viewport\" content=\"width=device-width,initial-scale=1\">"
+    "<title>Privacy Policy</title>{style}</head>\n"
+    "<body><main class=\"container\"><h1>Privacy Policy</h1><div class=\"content\">\n"
+    "{content}\n"
+    "</div></main></body></html>\n"
+)
+
+
 @dataclass
 class PageData:
     title: str
@@ -55,17 +120,23 @@ def run(
 
     Windows 上 git 输出可能包含非本地代码页字符，text=True 可能在后台线程里触发
     UnicodeDecodeError（gbk 解码失败）。这里改为二进制捕获，再手动用 UTF-8 安全解码。
+
+    有超时（见 deadlines.py：本地 git / 网络 git 不同上限，且不超过剩余运行预算）；超时的命令
+    整组被杀掉，按失败处理（returncode 124），和其他 git 失败走同一条路径。
     """
     merged_env = os.environ.copy()
     if env:
         merged_env.update(env)
+    if cmd and cmd[0] == "git":
+        METRICS.count("git_subprocesses")
+        # 需要凭证时直接失败，不在没有终端的情况下等用户名/密码
+        merged_env.setdefault("GIT_TERMINAL_PROMPT", "0")
 
-    p = subprocess.run(
-        cmd,
-        cwd=str(cwd) if cwd else None,
-        capture_output=True,
-        env=merged_env,
-    )
+    try:
+        p = deadlines.run_process(cmd, deadlines.git_stage(cmd), cwd=str(cwd) if cwd else None, env=merged_env)
+    except CommandTimeout as e:
+        print(f"⏱️ {e}")
+        p = subprocess.CompletedProcess(cmd, deadlines.TIMEOUT_EXIT_CODE, e.stdout, e.stderr)
 
     # attach decoded text versions for our own printing/logic
     p.stdout = _decode_bytes(p.stdout)  # type: ignore[attr-defined]
@@ -85,27 +156,13 @@ def run(
 
 def _resolve_pages_ssh_key() -> Optional[Path]:
     """Resolve which SSH key to use for git push."""
-    return DEFAULT_PAGES_SSH_KEY if DEFAULT_PAGES_SSH_KEY.exists() else None
+    return DEFAULT_PAGES_SSH_KEY if preflight.check(key_path=DEFAULT_PAGES_SSH_KEY).key_exists else None
 
 
 def _key_loaded_in_agent(key_path: Path) -> bool:
+    # ssh-add -L 的结果来自 preflight（缓存，和 remote / config 探测并行）
     try:
-        pub_path = Path(str(key_path) + ".pub")
-        if not pub_path.exists():
-            return False
-        pub = pub_path.read_text(encoding="utf-8").strip()
-        if not pub:
-            return False
-
-        p = subprocess.run(["ssh-add", "-L"], capture_output=True)
-        if p.returncode != 0:
-            return False
-
-        out = _decode_bytes(p.stdout)
-
-        # compare pub key body part
-        parts = pub.split()
-        return len(parts) >= 2 and parts[1] in (out or "")
+        return preflight.check(key_path=key_path).key_loaded
     except Exception:
         return False
 
@@ -178,6 +235,8 @@ def _rewrite_remote_to_preferred_host(remote_url: str) -> str:
 
 
 def get_git_remote_url(remote: str = "origin") -> str:
+    if remote == "origin":
+        return preflight.check(key_path=DEFAULT_PAGES_SSH_KEY).origin_url
     try:
         p = run(["git", "remote", "get-url", remote], cwd=REPO_ROOT)
         return (p.stdout or "").strip()
@@ -300,6 +359,18 @@ def encode_id_to_base64_letters(raw_id: str) -> str:
     return base64.urlsafe_b64encode(b).decode("ascii").rstrip("=")
 
 
+def decode_id_from_slug(page_slug: str) -> str:
+    """Inverse of encode_id_to_base64_letters for the slug's id prefix; '' if it doesn't decode cleanly."""
+    head = (page_slug or "").split("-", 1)[0]
+    if not head:
+        return ""
+    try:
+        raw = base64.urlsafe_b64decode(head + "=" * (-len(head) % 4)).decode("utf-8")
+    except Exception:
+        return ""
+    return raw if raw.isprintable() and encode_id_to_base64_letters(raw) == head else ""
+
+
 def strip_leading_privacy_policy(text: str) -> str:
     """去掉正文最前面的 'Privacy Policy' + 空行，避免页面出现重复标题。"""
     if not text:
@@ -310,24 +381,572 @@ def strip_leading_privacy_policy(text: str) -> str:
     return t
 
 
-def render_html(page: PageData) -> str:
+_UL_ITEM_RE = re.compile(r"^\s*[-*•]\s+(.*)$")
+_OL_ITEM_RE = re.compile(r"^\s*(\d+)[.)]\s+(.*)$")
+
+
+def _indent_width(line: str) -> int:
+    expanded = line.expandtabs(4)
+    return len(expanded) - len(expanded.lstrip())
+
+
+def text_to_semantic_html(text: str) -> str:
+    """Plain text -> <p>/<ul>/<ol> blocks (one block per line of output).
+
+    Blank lines separate paragraphs; runs of '- ' / '1. ' lines become lists (a blank line between
+    items does not end the list, which matches what html_to_formatted_text produces). Lines inside
+    one paragraph are joined with <br>.
+
+    What the reader saw in the <br> version is kept: a deeper-indented item opens a nested list inside
+    the previous item, and numbered items keep their source numbers (<ol start=N> / <li value=N>
+    wherever the text does not count 1, 2, 3 ...).
+    """
+    lines = (text or "").replace("\r\n", "\n").replace("\r", "\n").split("\n")
+    blocks: list[str] = []
+    para: list[str] = []
+    # open lists, outermost first: {"indent", "tag", "open", "items": [[<li ...>, body, nested]], "next"}
+    stack: list[dict] = []
+
+    def flush_para() -> None:
+        if para:
+            blocks.append("<p>" + "<br>".join(html.escape(" ".join(ln.split())) for ln in para) + "</p>")
+            para.clear()
+
+    def close_list() -> None:
+        lst = stack.pop()
+        out = lst["open"] + "".join(f"{li}{body}{nested}</li>" for li, body, nested in lst["items"]) + f"</{lst['tag']}>"
+        if stack:
+            stack[-1]["items"][-1][2] += out
+        else:
+            blocks.append(out)
+
+    def flush_lists() -> None:
+        while stack:
+            close_list()
+
+    for line in lines:
+        if not line.strip():
+            flush_para()
+            continue
+        m_ul = _UL_ITEM_RE.match(line)
+        m_ol = None if m_ul else _OL_ITEM_RE.match(line)
+        if not (m_ul or m_ol):
+            flush_lists()
+            para.append(line)
+            continue
+        flush_para()
+        tag = "ul" if m_ul else "ol"
+        indent = _indent_width(line)
+        while stack and indent < stack[-1]["indent"]:
+            close_list()
+        if stack and indent == stack[-1]["indent"] and stack[-1]["tag"] != tag:
+            close_list()
+        if not stack or indent > stack[-1]["indent"] or stack[-1]["tag"] != tag:
+            number = int(m_ol.group(1)) if m_ol else 1
+            opening = f'<ol start="{number}">' if m_ol and number != 1 else f"<{tag}>"
+            stack.append({"indent": indent, "tag": tag, "open": opening, "items": [], "next": number})
+        lst = stack[-1]
+        li = "<li>"
+        if m_ol:
+            number = int(m_ol.group(1))
+            if number != lst["next"]:
+                li = f'<li value="{number}">'
+            lst["next"] = number + 1
+        body = m_ul.group(1) if m_ul else m_ol.group(2)
+        lst["items"].append([li, html.escape(" ".join(body.split())), ""])
+
+    flush_para()
+    flush_lists()
+    return "\n".join(blocks)
+
+
+def shared_stylesheet_name() -> str:
+    digest = hashlib.sha256(SHARED_CSS.encode("utf-8")).hexdigest()[:10]
+    return f"privacy.{digest}.css"
+
+
+def ensure_shared_stylesheet(root: Optional[Path] = None) -> str:
+    """Write assets/privacy.<hash>.css under root (default REPO_ROOT) if missing; return its relative path."""
+    rel = f"{ASSETS_DIR_NAME}/{shared_stylesheet_name()}"
+    out = (root or REPO_ROOT) / rel
+    if not out.exists():
+        out.parent.mkdir(parents=True, exist_ok=True)
+        # 并行运行可能同时写这个文件：先写临时文件再原子替换，读者永远看不到半个文件
+        tmp = out.with_name(f"{out.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        tmp.write_text(SHARED_CSS + "\n", encoding="utf-8")
+        os.replace(tmp, out)
+    return rel
+
+
+def stylesheet_href_for(rel_dir: str) -> str:
+    """Relative href from pages/.../<slug>/ to the shared stylesheet (works under any Pages base path)."""
+    depth = len([p for p in rel_dir.strip("/").split("/") if p])
+    return "../" * depth + f"{ASSETS_DIR_NAME}/{shared_stylesheet_name()}"
+
+
+_STYLESHEET_LINK_RE = re.compile(r'(<link rel="stylesheet" href=")((?:\.\./)*)(' + re.escape(ASSETS_DIR_NAME) + r'/[^"]+")')
+
+
+def rebase_stylesheet_href(html_doc: str, rel_dir: str) -> str:
+    """Fix the relative stylesheet href of a page moved to rel_dir (keeps the stylesheet file it links)."""
+    depth = len([p for p in rel_dir.strip("/").split("/") if p])
+    return _STYLESHEET_LINK_RE.sub(lambda m: m.group(1) + "../" * depth + m.group(3), html_doc, count=1)
+
+
+# 页面自带的机器可读信息（<head> 里的 JSON script，不显示）：订单号、App、公司、邮箱、模板指纹、正文哈希。
+# 重建目录 / 审计 / 迁移时直接从仓库里的页面读输入，不再回 Lark 查表和抓 doc。
+PAGE_META_ID = "privacy-page-meta"
+PAGE_META_VERSION = 1
+_PAGE_META_RE = re.compile(
+    r'<script type="application/json" id="' + PAGE_META_ID + r'">(.*?)</script>', re.S
+)
+
+
+_fingerprint_cache: dict = {}
+
+
+def template_fingerprint() -> str:
+    """当前渲染所依赖的全部模板（muban.html + 页面模板 + 共享样式 + 精简开关）的指纹。
+
+    批量发布 / 审计每页都要用：按 muban.html 的 mtime 缓存，不每页重读。
+    """
+    muban = REPO_ROOT / "muban.html"
+    try:
+        key = muban.stat().st_mtime_ns
+    except OSError:
+        key = None
+    cached = _fingerprint_cache.get(key)
+    if cached:
+        return cached
+    h = hashlib.sha256()
+    if key is not None:
+        h.update(muban.read_bytes())
+    for part in (LEAN_TEMPLATE, FALLBACK_TEMPLATE, SHARED_CSS, str(LEAN_OUTPUT)):
+        h.update(part.encode("utf-8"))
+    _fingerprint_cache.clear()
+    _fingerprint_cache[key] = h.hexdigest()[:16]
+    return _fingerprint_cache[key]
+
+
+def content_hash(content: str) -> str:
+    return hashlib.sha256((content or "").encode("utf-8")).hexdigest()
+
+
+def build_page_meta(page: PageData, raw_id: str = "", source: Optional[dict] = None) -> dict:
+    """页面内嵌的信息；source（app/company/email）不全时只记订单号、标题和哈希。"""
+    meta = {"v": PAGE_META_VERSION, "id": raw_id or "", "app": page.title or ""}
+    if source and all(source.get(k) for k in ("app", "company", "email")):
+        meta.update(app=source["app"], company=source["company"], email=source["email"])
+    meta["template"] = template_fingerprint()
+    meta["content_sha256"] = content_hash(page.content)
+    return meta
+
+
+def render_page_meta(meta: dict) -> str:
+    # </script> 和 HTML 注释不能出现在 script 里：<、>、& 转成 \u 转义（JSON 解析结果不变）
+    raw = json.dumps(meta, ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+    raw = raw.replace("<", "\\u003c").replace(">", "\\u003e").replace("&", "\\u0026")
+    return f'<script type="application/json" id="{PAGE_META_ID}">{raw}</script>'
+
+
+def read_page_meta(html_doc: str) -> Optional[dict]:
+    """页面里内嵌的信息；老页面没有（或内容损坏）返回 None。"""
+    m = _PAGE_META_RE.search(html_doc or "")
+    if not m:
+        return None
+    try:
+        meta = json.loads(m.group(1))
+    except ValueError:
+        return None
+    return meta if isinstance(meta, dict) else None
+
+
+def render_html(
+    page: PageData, css_href: Optional[str] = None, lean: Optional[bool] = None, meta: Optional[dict] = None
+) -> str:
+    """Render a full page.
+
+    lean (default LEAN_OUTPUT): semantic markup; links css_href if given, otherwise inlines the
+    shared CSS so the page is still standalone. lean=False keeps the original template output.
+    meta (see build_page_meta) is embedded in <head> as a hidden JSON script.
+    """
+    meta_html = render_page_meta(meta) if meta else ""
+    lean = LEAN_OUTPUT if lean is None else lean
     content_source = page.content
     if not page.content_is_html:
         content_source = strip_leading_privacy_policy(content_source)
 
-    content_html = content_source if page.content_is_html else escape_and_preserve_newlines_as_html(content_source)
-    return FALLBACK_TEMPLATE.format(content=content_html)
+    if not lean:
+        content_html = content_source if page.content_is_html else escape_and_preserve_newlines_as_html(content_source)
+        out = FALLBACK_TEMPLATE.format(content=content_html)
+        return out.replace("</head>", f"  {meta_html}\n</head>", 1) if meta_html else out
+
+    content_html = content_source.strip() if page.content_is_html else text_to_semantic_html(content_source)
+    if css_href:
+        style = f'<link rel="stylesheet" href="{html.escape(css_href, quote=True)}">'
+    else:
+        style = f"<style>{SHARED_CSS}</style>"
+    return LEAN_TEMPLATE.format(style=style + meta_html, content=content_html)
+
+
+class _VisibleTextParser(HTMLParser):
+    """Collect what a reader sees: text outside <head>/<script>/<style>, list bullets included.
+
+    Numbers follow browser rules (<ol start>, <li value>); nested list items are indented two spaces per level.
+    """
+
+    _BLOCK_TAGS = {"p", "div", "br", "li", "ul", "ol", "h1", "h2", "h3", "h4", "h5", "h6", "main", "section"}
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.parts: list[str] = []
+        self._skip = 0
+        self._lists: list[list] = []
+
+    def handle_starttag(self, tag, attrs):
+        if tag in ("head", "script", "style"):
+            self._skip += 1
+            return
+        attrs = dict(attrs)
+        if tag in ("ul", "ol"):
+            start = _int_attr(attrs.get("start"), 1) if tag == "ol" else 1
+            self._lists.append([tag, start - 1])
+        if tag in self._BLOCK_TAGS:
+            self.parts.append("\n")
+        if tag == "li" and self._lists:
+            kind = self._lists[-1]
+            kind[1] = _int_attr(attrs.get("value"), kind[1] + 1)
+            indent = "  " * (len(self._lists) - 1)
+            self.parts.append(indent + ("- " if kind[0] == "ul" else f"{kind[1]}. "))
+
+    def handle_endtag(self, tag):
+        if tag in ("head", "script", "style"):
+            self._skip = max(0, self._skip - 1)
+            return
+        if tag in ("ul", "ol") and self._lists:
+            self._lists.pop()
+        if tag in self._BLOCK_TAGS:
+            self.parts.append("\n")
+
+    def handle_data(self, data):
+        if not self._skip:
+            self.parts.append(data)
+
+
+def _int_attr(value: Optional[str], default: int) -> int:
+    try:
+        return int(value) if value is not None else default
+    except ValueError:
+        return default
+
+
+_VISIBLE_ITEM_RE = re.compile(r"^([-*•]|\d+[.)])\s+")
+
+
+def visible_text(html_doc: str, structure: bool = False) -> str:
+    """Whitespace-normalized visible text of a rendered page (used to prove renders are equivalent).
+
+    structure=True also keeps list nesting: list lines are prefixed with their level ('>' per level),
+    derived from indentation the same way for <br> pages (leading spaces) and semantic ones (nested lists).
+    """
+    parser = _VisibleTextParser()
+    parser.feed(html_doc or "")
+    parser.close()
+    out: list[str] = []
+    widths: list[int] = []  # indentation widths of the enclosing list levels
+    for raw in "".join(parser.parts).replace("\xa0", " ").split("\n"):
+        line = " ".join(raw.split())
+        if not line:
+            continue
+        if structure:
+            if _VISIBLE_ITEM_RE.match(line):
+                width = _indent_width(raw)
+                while widths and width < widths[-1]:
+                    widths.pop()
+                if not widths or width > widths[-1]:
+                    widths.append(width)
+                line = ">" * (len(widths) - 1) + _VISIBLE_ITEM_RE.sub(lambda m: ("-" if not m.group(1)[0].isdigit() else m.group(1)[:-1] + ".") + " ", line)
+            else:
+                widths.clear()
+        out.append(line)
+    return "\n".join(out)
+
+
+def legacy_page_source_text(html_doc: str) -> Optional[str]:
+    """Recover the exact source text of a page rendered by the original (non-lean) template; None if not one."""
+    m = re.search(r'<div class="content">\n(.*)\n    </div>\n  </main>', html_doc or "", re.S)
+    if not m:
+        return None
+    body = m.group(1).replace("<br>\n", "\n").replace("&nbsp;", " ")
+    return html.unescape(body)
+
+
+def verify_render_golden(pages_dir: Optional[Path] = None) -> list[str]:
+    """Golden check: the lean render of every legacy page must show exactly the same text.
+
+    The committed legacy pages are the goldens: their source text is recovered losslessly and
+    re-rendered lean; visible text (list numbers and nesting included) must match. Returns mismatching paths.
+    """
+    root = pages_dir or PAGES_DIR
+    mismatches: list[str] = []
+    for index_path in sorted(root.rglob("index.html")):
+        golden = index_path.read_text(encoding="utf-8")
+        source = legacy_page_source_text(golden)
+        if source is None:
+            continue  # redirect stub or already-lean page
+        lean = render_html(PageData(title="", content=source), css_href="x.css", lean=True)
+        if visible_text(lean, structure=True) != visible_text(golden, structure=True):
+            mismatches.append(str(index_path.relative_to(REPO_ROOT)))
+    return mismatches
+
+
+def shard_for_slug(page_slug: str) -> str:
+    """Stable 2-hex-char shard for a slug.
+
+    The shard is derived from the base64url id part of the slug (text before the first '-').
+    We hash it instead of taking its first 2 characters: every `IGTxxxx` id encodes to
+    `SUdU...`, so a literal prefix would put the whole catalog in one shard.
+    """
+    key = (page_slug or "").split("-", 1)[0] or page_slug
+    return hashlib.sha1(key.encode("utf-8")).hexdigest()[:2]
+
+
+def _is_shard_dir(path: Path) -> bool:
+    """pages/<shard>/：2 位十六进制名、自身不是页面、下面是页面目录。
+
+    只看名字不够：slugify 后恰好是 2 位十六进制的扁平 slug（如 pages/ab/）也是合法页面。
+    """
+    if not re.fullmatch(r"[0-9a-f]{2}", path.name or "") or (path / "index.html").exists():
+        return False
+    return any(child.is_dir() for child in path.iterdir())
+
+
+def page_rel_dir(page_slug: str, layout: str = "flat") -> str:
+    """Repo-relative directory of a page, e.g. 'pages/<slug>' or 'pages/<shard>/<slug>'."""
+    if layout == "sharded":
+        return f"pages/{shard_for_slug(page_slug)}/{page_slug}"
+    return f"pages/{page_slug}"
+
+
+def _manifest_path() -> Path:
+    return REPO_ROOT / MANIFEST_NAME
 
 
-def write_privacy_page(page: PageData, page_slug: str) -> Path:
-    """Write to pages/<slug>/index.html and return the written path."""
-    page_dir = PAGES_DIR / page_slug
+def load_manifest() -> dict:
+    p = _manifest_path()
+    if p.exists():
+        try:
+            data = json.loads(p.read_text(encoding="utf-8"))
+            if isinstance(data, dict):
+                data.setdefault("pages", {})
+                return data
+        except ValueError:
+            print(f"⚠️ {MANIFEST_NAME} 不是合法 JSON，将重新生成")
+    return {"version": 1, "layout": "flat", "pages": {}}
+
+
+def save_manifest(manifest: dict) -> None:
+    p = _manifest_path()
+    tmp = p.with_suffix(".json.tmp")
+    tmp.write_text(json.dumps(manifest, ensure_ascii=False, indent=2, sort_keys=True) + "\n", encoding="utf-8")
+    os.replace(tmp, p)
+
+
+def merge_into_manifest(manifest: dict, page_slugs: list[str]) -> None:
+    """Re-read the manifest from disk and write back only this run's entries (call under repo_lock()).
+
+    Parallel runs each stage pages against their own in-memory copy; merging by slug keeps the
+    entries other runs saved in the meantime.
+    """
+    merged = load_manifest()
+    for page_slug in page_slugs:
+        if page_slug in manifest["pages"]:
+            merged["pages"][page_slug] = manifest["pages"][page_slug]
+    save_manifest(merged)
+
+
+GIT_LOCK_DIR = REPO_ROOT / ".cache" / "locks"
+
+
+@contextlib.contextmanager
+def repo_lock(name: str = "origin", timeout_seconds: float = 600) -> Iterator[None]:
+    """Inter-process lock around the git critical section (manifest merge, add/commit, push).
+
+    Page files are written outside the lock (each run writes its own pages/<slug>/); only the
+    shared index/manifest/push is serialized. One lock per repo: "origin" or a target name.
+    The wait is also bounded by the run budget (deadlines.py).
+    """
+    timeout_seconds = deadlines.timeout_for("git_lock", timeout_seconds)
+    GIT_LOCK_DIR.mkdir(parents=True, exist_ok=True)
+    with (GIT_LOCK_DIR / f"{name}.lock").open("a+b") as f:
+        deadline = time.monotonic() + timeout_seconds
+        waited = False
+        while True:
+            try:
+                if fcntl is not None:
+                    fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+                elif msvcrt is not None:
+                    f.seek(0)
+                    msvcrt.locking(f.fileno(), msvcrt.LK_NBLCK, 1)
+                break
+            except OSError:
+                if time.monotonic() > deadline:
+                    raise deadlines.DeadlineExceeded("git_lock", timeout_seconds, f"等待 git 锁超时（{timeout_seconds:.0f}s）: {f.name}")
+                if not waited:
+                    print(f"⏳ 另一个发布进程正在提交/推送，等待 git 锁: {name}")
+                    waited = True
+                time.sleep(0.2)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+            elif msvcrt is not None:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def current_layout(manifest: Optional[dict] = None) -> str:
+    """Layout for new pages: env PRIVACY_PAGES_LAYOUT wins, otherwise whatever the manifest says."""
+    env_layout = (os.environ.get("PRIVACY_PAGES_LAYOUT") or "").strip().lower()
+    if env_layout in PAGE_LAYOUTS:
+        return env_layout
+    layout = (manifest or load_manifest()).get("layout") or "flat"
+    return layout if layout in PAGE_LAYOUTS else "flat"
+
+
+def record_page_in_manifest(
+    manifest: dict,
+    page_slug: str,
+    rel_dir: str,
+    raw_id: str = "",
+    title: str = "",
+    source: Optional[dict] = None,
+    page_sha256: Optional[str] = None,
+) -> None:
+    """source: the app/company/email the page text was rendered from (lets catalog_audit.py re-render it).
+
+    page_sha256: hash of the written index.html. `updated` only moves when it changes, so republishing an
+    unchanged page leaves the manifest byte-identical (no churn, no merge conflicts between parallel runs).
+    None (page not rewritten, e.g. layout migration) keeps the previous hash and timestamp.
+    """
+    old = manifest["pages"].get(page_slug) or {}
+    if page_sha256 is None:
+        page_sha256 = old.get("sha256")
+    unchanged = bool(old.get("updated")) and old.get("sha256") == page_sha256
+    entry = {
+        "id": raw_id or "",
+        "title": title or "",
+        "path": rel_dir.rstrip("/") + "/",
+        "updated": old["updated"] if unchanged else time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+    }
+    if page_sha256:
+        entry["sha256"] = page_sha256
+    if old.get("redirect_from"):
+        entry["redirect_from"] = old["redirect_from"]
+    if source and all(source.get(k) for k in ("app", "company", "email")):
+        entry["source"] = {k: source[k] for k in ("app", "company", "email")}
+    manifest["pages"][page_slug] = entry
+
+
+def write_privacy_page(
+    page: PageData, page_slug: str, layout: str = "flat", root: Optional[Path] = None, meta: Optional[dict] = None
+) -> Path:
+    """Write to pages/<slug>/index.html (or pages/<shard>/<slug>/ when sharded) and return the written path.
+
+    root defaults to REPO_ROOT; multi-repo publishing passes the target repo's checkout instead.
+    meta: embedded page metadata (build_page_meta).
+    """
+    rel_dir = page_rel_dir(page_slug, layout)
+    page_dir = (root or REPO_ROOT) / rel_dir
     page_dir.mkdir(parents=True, exist_ok=True)
+    css_href = None
+    if LEAN_OUTPUT:
+        ensure_shared_stylesheet(root)
+        css_href = stylesheet_href_for(rel_dir)
     out_path = page_dir / "index.html"
-    out_path.write_text(render_html(page), encoding="utf-8")
+    # 原子替换：并行的其他运行（或部署快照）不会读到写了一半的页面
+    tmp = out_path.with_name(f".index.html.{os.getpid()}.tmp")
+    tmp.write_text(render_html(page, css_href=css_href, meta=meta), encoding="utf-8")
+    os.replace(tmp, out_path)
     return out_path
 
 
+REDIRECT_STUB_MARKER = "<!-- privacy-pages:redirect -->"
+REDIRECT_STUB_TEMPLATE = """<!doctype html>\n<!-- privacy-pages:redirect -->\n<html lang=\"en\">\n<head>\n  <meta charset=\"utf-8\">\n  <title>Privacy Policy</title>\n  <meta name=\"robots\" content=\"noindex\">\n  <link rel=\"canonical\" href=\"{target}\">\n  <meta http-equiv=\"refresh\" content=\"0; url={target}\">\n  <script>location.replace({target_js});</script>\n</head>\n<body>\n  <p>This page has moved: <a href=\"{target}\">{target}</a></p>\n</body>\n</html>\n"""
+
+
+def render_redirect_stub(target_rel_url: str) -> str:
+    return REDIRECT_STUB_TEMPLATE.format(
+        target=html.escape(target_rel_url, quote=True),
+        target_js=json.dumps(target_rel_url),
+    )
+
+
+def _is_redirect_stub(path: Path) -> bool:
+    try:
+        with path.open("r", encoding="utf-8") as f:
+            return REDIRECT_STUB_MARKER in f.read(256)
+    except OSError:
+        return False
+
+
+def migrate_pages_layout(target_layout: str = "sharded") -> list[str]:
+    """Move flat pages/<slug>/ into pages/<shard>/<slug>/ and leave a redirect stub at the old URL.
+
+    Old URLs (already submitted to app stores) keep working through the stub.
+    Returns the list of migrated slugs. Idempotent: stubs and shard dirs are skipped.
+    Rewrites the whole manifest: call under repo_lock(), like merge_into_manifest().
+    """
+    if target_layout != "sharded":
+        raise ValueError("only flat -> sharded migration is supported (stubs keep old URLs alive)")
+
+    manifest = load_manifest()
+    migrated: list[str] = []
+    if not PAGES_DIR.exists():
+        return migrated
+
+    for old_dir in sorted(p for p in PAGES_DIR.iterdir() if p.is_dir()):
+        if _is_shard_dir(old_dir):
+            continue
+        old_index = old_dir / "index.html"
+        if not old_index.exists() or _is_redirect_stub(old_index):
+            continue
+
+        page_slug = old_dir.name
+        new_rel = page_rel_dir(page_slug, "sharded")
+        new_dir = REPO_ROOT / new_rel
+        new_dir.mkdir(parents=True, exist_ok=True)
+        for child in old_dir.iterdir():
+            shutil.move(str(child), str(new_dir / child.name))
+        # 页面深了一层：相对的样式表路径要跟着改，否则 lean 页面丢样式
+        new_index = new_dir / "index.html"
+        doc = new_index.read_text(encoding="utf-8")
+        rebased = rebase_stylesheet_href(doc, new_rel)
+        if rebased != doc:
+            new_index.write_text(rebased, encoding="utf-8")
+
+        # old: pages/<slug>/  -> new: pages/<shard>/<slug>/  (relative, works under any Pages base path)
+        old_index.write_text(render_redirect_stub(f"../{shard_for_slug(page_slug)}/{page_slug}/"), encoding="utf-8")
+
+        entry = manifest["pages"].get(page_slug) or {}
+        record_page_in_manifest(
+            manifest,
+            page_slug,
+            new_rel,
+            raw_id=entry.get("id") or decode_id_from_slug(page_slug),
+            title=entry.get("title", ""),
+            source=entry.get("source"),
+            page_sha256=hashlib.sha256(new_index.read_bytes()).hexdigest(),
+        )
+        manifest["pages"][page_slug]["redirect_from"] = f"pages/{page_slug}/"
+        migrated.append(page_slug)
+
+    manifest["layout"] = "sharded"
+    save_manifest(manifest)
+    return migrated
+
+
 # NOTE:
 # We intentionally do NOT write/overwrite repository root `index.html` here.
 # Root `index.html` is reserved as a permanent '404 / Not Found' landing page
@@ -338,51 +957,239 @@ def read_content_from_file(path: Path) -> str:
     return path.read_text(encoding="utf-8")
 
 
-def git_commit_push(commit_message: str) -> None:
+def git_commit_push(commit_message: str, page_paths: Optional[list[str]] = None) -> None:
     """git add/commit/push; only commit the files we own.
 
     Team-friendly behavior:
-      1) Pull/rebase first to avoid non-fast-forward errors.
+      1) Rebase this run's commit onto origin to avoid non-fast-forward errors.
       2) Only stage/commit privacy_merge.py + googleSites.py + pages/**
          (do NOT commit root index.html or privacy_text.txt).
 
     IMPORTANT:
-      -   PyCharm 
-        : 
-        SSH 
-        remote `git@github-common-hosts:...`
-         `~/.ssh/config`  Host 
+      -   PyCharm 
+        : 
+        SSH 
+        remote `git@github-common-hosts:...`
+         `~/.ssh/config`  Host 
     """
-    _ensure_origin_uses_preferred_host()
-    _print_git_account_hint()
-    _ensure_git_identity()
+    env = git_commit(commit_message, page_paths)
+    git_push(env)
 
-    # 1) Pull first (best effort). If no upstream yet, skip.
-    env = _git_env_for_pages_push()
-    try:
-        # If upstream isn't set, this will fail; we ignore it.
-        run(["git", "pull", "--rebase", "--autostash"], cwd=REPO_ROOT, env=env, check=False)
-    except Exception:
-        pass
 
-    # 2) Only stage what this tool should manage
-    paths_to_add = [
-        "googleSites.py",
-        "privacy_merge.py",
-        "pages",
-    ]
-    run(["git", "add", "--"] + paths_to_add, cwd=REPO_ROOT)
-
-    st = run(["git", "status", "--porcelain"], cwd=REPO_ROOT, check=False)
-    if not (st.stdout or "").strip():
-        print("  (googleSites.py/privacy_merge.py/pages/) commit")
-    else:
-        run(["git", "commit", "-m", commit_message], cwd=REPO_ROOT, env=env)
+def git_commit(commit_message: str, page_paths: Optional[list[str]] = None) -> dict[str, str]:
+    """Stage the files this tool owns, commit, then rebase onto origin (no push). Returns the git env for git_push().
+
+    page_paths: only stage these page dirs (this run's pages) instead of the whole pages/ tree,
+    so a parallel run's half-finished pages never end up in our commit. Call under repo_lock().
+    The rebase never stashes the shared working tree (see _rebase_onto_upstream).
+    """
+    with METRICS.stage("git.commit"):
+        _ensure_origin_uses_preferred_host()
+        _print_git_account_hint()
+        _ensure_git_identity()
+
+        env = _git_env_for_pages_push()
+
+        # 1) Only stage what this tool should manage
+        paths_to_add = [
+            "googleSites.py",
+            "privacy_merge.py",
+        ]
+        if DEPLOY_BRANCH:
+            # 页面只进部署分支的快照；工具分支上不再跟踪 pages/ 和 assets/
+            _untrack_deployed_paths()
+        else:
+            if page_paths is None:
+                paths_to_add.append("pages")
+            else:
+                paths_to_add.extend(p for p in page_paths if (REPO_ROOT / p).exists())
+            if (REPO_ROOT / ASSETS_DIR_NAME).exists():
+                paths_to_add.append(ASSETS_DIR_NAME)
+        if _manifest_path().exists():
+            paths_to_add.append(MANIFEST_NAME)
+        run(["git", "add", "--"] + paths_to_add, cwd=REPO_ROOT)
+
+        # 只看已暂存的改动：工作区里其他运行未提交的文件不算
+        st = run(["git", "diff", "--cached", "--name-only"], cwd=REPO_ROOT, check=False)
+        if not (st.stdout or "").strip():
+            print("  (googleSites.py/privacy_merge.py/pages/) commit")
+        else:
+            run(["git", "commit", "-m", commit_message], cwd=REPO_ROOT, env=env)
+
+        # 2) Put our commit(s) on top of origin (best effort; no upstream yet -> skip)
+        _rebase_onto_upstream(env)
+        return env
+
 
-    # 3) Push using origin (already rewritten to preferred host).
+def _rebase_onto_upstream(env: Optional[dict[str, str]] = None) -> None:
+    """Replay the local-only commits onto origin/<branch> without touching the rest of the shared tree.
+
+    `git pull --rebase --autostash` stashed every dirty file in the checkout, including pages a
+    parallel run was still writing, and could pop them back with conflicts. Instead: fetch,
+    cherry-pick the local commits onto upstream in a throwaway worktree, then move HEAD with a
+    two-tree read-tree (like checkout: only paths that differ between the two commits are
+    updated, and a dirty file at one of those paths aborts the move).
+    """
+    b = run(["git", "symbolic-ref", "-q", "--short", "HEAD"], cwd=REPO_ROOT, check=False)
+    branch = (b.stdout or "").strip()
+    if not branch:
+        return
+    upstream = f"refs/remotes/origin/{branch}"
+    fetched = run(["git", "fetch", "-q", "origin", f"+refs/heads/{branch}:{upstream}"], cwd=REPO_ROOT, env=env, check=False)
+    if fetched.returncode != 0:
+        return  # 远端还没有这个分支 / 离线：push 时再报错
+    if run(["git", "merge-base", "--is-ancestor", upstream, "HEAD"], cwd=REPO_ROOT, check=False).returncode == 0:
+        return
+    head = (run(["git", "rev-parse", "HEAD"], cwd=REPO_ROOT).stdout or "").strip()
+    new = (run(["git", "rev-parse", upstream], cwd=REPO_ROOT).stdout or "").strip()
+    # 只重放本地独有、上游还没有等价改动的提交（通常只有这次运行的那一个）
+    local = run(
+        ["git", "rev-list", "--reverse", "--right-only", "--cherry-pick", "--no-merges", f"{upstream}...HEAD"], cwd=REPO_ROOT
+    ).stdout.split()
+    if local:
+        with tempfile.TemporaryDirectory(prefix="pages-rebase-") as tmp:
+            wt = Path(tmp) / "worktree"
+            run(["git", "worktree", "add", "-q", "--detach", str(wt), new], cwd=REPO_ROOT)
+            try:
+                picked = run(["git", "cherry-pick", "--allow-empty", *local], cwd=wt, env=env, check=False)
+                if picked.returncode != 0:
+                    run(["git", "cherry-pick", "--abort"], cwd=wt, check=False)
+                    print(f"⚠️ 本地提交和 origin/{branch} 冲突，未变基；push 会被拒绝，请手动处理")
+                    return
+                new = (run(["git", "rev-parse", "HEAD"], cwd=wt).stdout or "").strip()
+            finally:
+                run(["git", "worktree", "remove", "--force", str(wt)], cwd=REPO_ROOT, check=False)
+    moved = run(["git", "read-tree", "-m", "-u", head, new], cwd=REPO_ROOT, check=False)
+    if moved.returncode != 0:
+        print(f"⚠️ 工作区里有未提交的改动挡住了 origin/{branch} 的更新，未变基；push 会被拒绝")
+        print((moved.stderr or "").strip())
+        return
+    run(["git", "update-ref", "-m", f"rebase onto origin/{branch}", "HEAD", new, head], cwd=REPO_ROOT)
+
+
+def git_push(env: Optional[dict[str, str]] = None) -> None:
+    """Push the current branch to origin (already rewritten to preferred host); also pushes earlier unpushed commits.
+
+    With DEPLOY_BRANCH set, the pages snapshot is deployed to that branch afterwards.
+    """
+    if env is None:
+        _ensure_origin_uses_preferred_host()
+        env = _git_env_for_pages_push()
     b = run(["git", "rev-parse", "--abbrev-ref", "HEAD"], cwd=REPO_ROOT)
     branch = (b.stdout or "main").strip() or "main"
-    run(["git", "push", "origin", branch], cwd=REPO_ROOT, env=env)
+    with METRICS.stage("git.push"):
+        try:
+            run(["git", "push", "origin", branch], cwd=REPO_ROOT, env=env)
+            if DEPLOY_BRANCH:
+                deploy_snapshot(DEPLOY_BRANCH, env)
+        except subprocess.CalledProcessError:
+            METRICS.outcome("push", "failed")
+            raise
+    METRICS.outcome("push", "ok")
+
+
+def _untrack_deployed_paths() -> None:
+    """Stop tracking pages/ + assets/ on the tool branch (files stay on disk) and exclude them locally."""
+    tracked = run(["git", "ls-files", "--", "pages", ASSETS_DIR_NAME], cwd=REPO_ROOT, check=False)
+    if (tracked.stdout or "").strip():
+        run(["git", "rm", "-r", "--cached", "--quiet", "--ignore-unmatch", "--", "pages", ASSETS_DIR_NAME], cwd=REPO_ROOT)
+        print(f"🔧 工具分支不再跟踪 pages/ 和 {ASSETS_DIR_NAME}/（页面改为部署到 {DEPLOY_BRANCH} 分支）")
+    exclude = REPO_ROOT / ".git" / "info" / "exclude"
+    if exclude.parent.exists():
+        current = exclude.read_text(encoding="utf-8") if exclude.exists() else ""
+        missing = [p for p in ("/pages/", f"/{ASSETS_DIR_NAME}/") if p not in current.splitlines()]
+        if missing:
+            with exclude.open("a", encoding="utf-8") as f:
+                f.write(("" if current.endswith("\n") or not current else "\n") + "\n".join(missing) + "\n")
+
+
+def deploy_snapshot(branch: str, env: Optional[dict[str, str]] = None, message: str = "") -> Optional[str]:
+    """Deploy DEPLOY_PATHS as ONE parentless commit on `branch`, force-pushed with lease.
+
+    The snapshot starts from the branch's current tree (so a fresh clone with a partial pages/
+    never drops published pages) and overlays the local files. Uses a temporary index, so the
+    working tree and the tool branch's index are untouched. Returns the deployed commit (None
+    when there is nothing to deploy).
+    """
+    remote_ref = f"refs/remotes/origin/{branch}"
+    run(["git", "fetch", "origin", f"+refs/heads/{branch}:{remote_ref}"], cwd=REPO_ROOT, env=env, check=False)
+    p = run(["git", "rev-parse", "--verify", "-q", f"{remote_ref}^{{commit}}"], cwd=REPO_ROOT, check=False)
+    old = (p.stdout or "").strip() if p.returncode == 0 else ""
+
+    paths = [name for name in DEPLOY_PATHS if (REPO_ROOT / name).exists()]
+    if not paths and not old:
+        return None
+    with tempfile.TemporaryDirectory(prefix="pages-deploy-") as tmp:
+        index_env = dict(env or {})
+        index_env["GIT_INDEX_FILE"] = str(Path(tmp) / "index")
+        if old:
+            run(["git", "read-tree", old], cwd=REPO_ROOT, env=index_env)
+        if paths:
+            # -f：工具分支上这些路径已被 exclude
+            run(["git", "add", "-f", "--"] + paths, cwd=REPO_ROOT, env=index_env)
+        tree = (run(["git", "write-tree"], cwd=REPO_ROOT, env=index_env).stdout or "").strip()
+
+    if old and tree == (run(["git", "rev-parse", f"{old}^{{tree}}"], cwd=REPO_ROOT).stdout or "").strip():
+        print(f"ℹ️ {branch} 分支已是最新快照")
+        return None
+
+    n_pages = sum(1 for _ in (REPO_ROOT / "pages").rglob("index.html")) if (REPO_ROOT / "pages").exists() else 0
+    commit = (
+        run(
+            ["git", "commit-tree", tree, "-m", message or f"Deploy privacy pages snapshot ({n_pages} local pages)"],
+            cwd=REPO_ROOT,
+            env=env,
+        ).stdout
+        or ""
+    ).strip()
+    # lease：远端分支必须仍是我们刚 fetch 到的那个提交（或仍不存在），否则拒绝覆盖别人的部署
+    run(
+        ["git", "push", f"--force-with-lease=refs/heads/{branch}:{old}", "origin", f"{commit}:refs/heads/{branch}"],
+        cwd=REPO_ROOT,
+        env=env,
+    )
+    print(f"🚀 已部署快照到 {branch}: {commit[:10]}")
+    return commit
+
+
+class GitPagesBackend(PublishBackend):
+    """The original delivery: commit + push to origin's GitHub Pages (or the deploy-branch snapshot)."""
+
+    name = "git"
+    deploy_delay = True
+
+    def __init__(self, commit_only: bool = False):
+        super().__init__()
+        self.commit_only = commit_only
+
+    def page_base_url(self) -> str:
+        return github_pages_base_url(get_repo_slug_from_remote(get_git_remote_url("origin")))
+
+    def publish(self, root: Path, rel_paths: list[str], message: str = "") -> dict[str, int]:
+        page_dirs = sorted({str(Path(p).parent) for p in rel_paths if p.startswith("pages/")})
+        with repo_lock():
+            if self.commit_only:
+                git_commit(message, page_paths=page_dirs)
+                print("ℹ️ --commit-only used. Skipping git push.")
+            else:
+                git_commit_push(message, page_paths=page_dirs)
+        return {"files": len(rel_paths)}
+
+
+def make_backend(name: str, commit_only: bool = False) -> PublishBackend:
+    if name == "git":
+        return GitPagesBackend(commit_only=commit_only)
+    return backend_from_env(name)
+
+
+def deliverable_paths(rel_dirs: list[str], root: Optional[Path] = None) -> list[str]:
+    """Files a backend has to upload for these pages: each index.html + the shared stylesheet + root 404/robots."""
+    root = root or REPO_ROOT
+    paths = [f"{d}/index.html" for d in dict.fromkeys(rel_dirs)]
+    if LEAN_OUTPUT:
+        paths.append(f"{ASSETS_DIR_NAME}/{shared_stylesheet_name()}")
+    paths.extend(p for p in TARGET_SEED_FILES if (root / p).exists())
+    return [p for p in paths if (root / p).is_file()]
 
 
 def wait_until_url_ready(url: str, timeout_seconds: int = 120, interval_seconds: float = 3.0) -> bool:
@@ -390,23 +1197,28 @@ def wait_until_url_ready(url: str, timeout_seconds: int = 120, interval_seconds:
 
     GitHub Pages often has a small build/deploy delay. This prevents the
     "new page 404, old page works" confusion.
+    等待时间不超过 verify 阶段上限和剩余运行预算；页面已经发布，等不到只提示，不算失败。
     """
+    timeout_seconds = min(timeout_seconds, deadlines.stage_limit("verify"), max(0.0, deadlines.remaining()))
     end = time.time() + timeout_seconds
     last_err = ""
-    while time.time() < end:
-        try:
-            req = urllib.request.Request(url, headers={"User-Agent": "Mozilla/5.0"})
-            with urllib.request.urlopen(req, timeout=20) as resp:
-                if getattr(resp, "status", 200) == 200:
-                    return True
-        except Exception as e:
-            last_err = str(e)
-        time.sleep(interval_seconds)
+    with TRACER.span(url, "verify") as span:
+        while time.time() < end:
+            span["attempts"] = span.get("attempts", 0) + 1
+            try:
+                req = urllib.request.Request(url, headers={"User-Agent": "Mozilla/5.0"})
+                with urllib.request.urlopen(req, timeout=max(1.0, min(20.0, end - time.time()))) as resp:
+                    if getattr(resp, "status", 200) == 200:
+                        span["ready"] = True
+                        return True
+            except Exception as e:
+                last_err = str(e)
+            time.sleep(interval_seconds)
 
     if last_err:
-        print(f"⚠️ 页面在 {timeout_seconds}s 内仍不可访问（可能还在部署中）：{last_err}")
+        print(f"⚠️ 页面在 {timeout_seconds:.0f}s 内仍不可访问（可能还在部署中）：{last_err}")
     else:
-        print(f"⚠️ 页面在 {timeout_seconds}s 内仍不可访问（可能还在部署中）。")
+        print(f"⚠️ 页面在 {timeout_seconds:.0f}s 内仍不可访问（可能还在部署中）。")
     return False
 
 
@@ -416,8 +1228,7 @@ def copy_to_clipboard_macos(text: str) -> bool:
     if not text:
         return False
     try:
-        subprocess.run(["pbcopy"], input=text.encode("utf-8"), check=True)
-        return True
+        return deadlines.run_process(["pbcopy"], "cmd", input=text.encode("utf-8")).returncode == 0
     except Exception:
         return False
 
@@ -426,49 +1237,434 @@ def show_macos_toast(message: str, seconds: int = 3) -> None:
     """Best-effort toast via AppleScript (no hard failure if blocked)."""
     msg = (message or "").replace('"', "\\\"")
     try:
-        subprocess.run(
-            ["osascript", "-e", f'display notification "{msg}" with title "PrivacyTools"'],
-            check=False,
-            capture_output=True,
-            text=True,
-        )
+        deadlines.run_process(["osascript", "-e", f'display notification "{msg}" with title "PrivacyTools"'], "cmd")
     except Exception:
         pass
 
 
-def _ensure_git_identity() -> None:
+def _ensure_git_identity(cwd: Optional[Path] = None) -> None:
     """Ensure git has user.name/user.email configured.
 
     Some teammate machines (or fresh Windows installs) don't have git identity set，
     which makes `git commit` fail. We set a repo-local fallback identity.
     """
 
-    def _cfg(key: str) -> str:
-        p = subprocess.run(
-            ["git", "config", "--get", key],
-            cwd=str(REPO_ROOT),
-            capture_output=True,
-        )
-        return _decode_bytes(p.stdout).strip()
-
-    name = _cfg("user.name")
-    email = _cfg("user.email")
+    checked = preflight.check(cwd or REPO_ROOT, key_path=DEFAULT_PAGES_SSH_KEY)
+    name = checked.user_name
+    email = checked.user_email
 
     # Set repository-local config (no --global) to avoid touching user's global setup.
     if not name:
-        run(["git", "config", "user.name", "privacy-bot"], cwd=REPO_ROOT)
+        run(["git", "config", "user.name", "privacy-bot"], cwd=cwd or REPO_ROOT)
     if not email:
-        run(["git", "config", "user.email", "privacy-bot@users.noreply.github.com"], cwd=REPO_ROOT)
+        run(["git", "config", "user.email", "privacy-bot@users.noreply.github.com"], cwd=cwd or REPO_ROOT)
+
+
+# --- Multi-repo targets ---
+# 可选：把页面分散到多个 Pages 仓库（每个仓库各自排队构建，发布吞吐不再受单仓库构建频率限制）。
+# 配置文件（默认仓库根目录 pages_targets.json，或环境变量 PRIVACY_PAGES_TARGETS 指定路径）：
+#   {"targets": [
+#     {"name": "pages-0", "remote": "git@github.com:owner/privacy-page-0.git"},
+#     {"name": "pages-1", "remote": "git@github.com:owner/privacy-page-1.git", "branch": "main",
+#      "base_url": "https://owner.github.io/privacy-page-1/"}
+#   ]}
+# 没有配置文件时保持原来的单 origin 行为。每个 target 在 .cache/targets/<name>/ 有一份本地 checkout。
+TARGETS_CONFIG_NAME = "pages_targets.json"
+TARGETS_WORK_DIR = REPO_ROOT / ".cache" / "targets"
+# 新建 target checkout 时一起带过去的根目录文件（404 落地页、robots）
+TARGET_SEED_FILES = ("index.html", "robots.txt")
+
+
+@dataclass
+class PagesTarget:
+    name: str
+    remote: str
+    branch: str = "main"
+    base_url: str = ""
+
+    @property
+    def workdir(self) -> Path:
+        return TARGETS_WORK_DIR / self.name
+
+    def pages_base_url(self) -> str:
+        if self.base_url:
+            return self.base_url.rstrip("/") + "/"
+        return github_pages_base_url(get_repo_slug_from_remote(self.remote))
+
+
+def _targets_config_path() -> Path:
+    env_path = (os.environ.get("PRIVACY_PAGES_TARGETS") or "").strip()
+    return Path(env_path).expanduser() if env_path else REPO_ROOT / TARGETS_CONFIG_NAME
+
+
+def load_targets(path: Optional[Path] = None) -> list[PagesTarget]:
+    """Configured target repos, in config order; [] when no config file exists."""
+    p = path or _targets_config_path()
+    if not p.exists():
+        return []
+    data = json.loads(p.read_text(encoding="utf-8"))
+    targets: list[PagesTarget] = []
+    for n, t in enumerate(data.get("targets") or []):
+        if not t.get("remote"):
+            raise ValueError(f"{p}: target #{n} has no remote")
+        name = (t.get("name") or f"pages-{n}").strip()
+        if not re.fullmatch(r"[A-Za-z0-9._-]+", name):
+            raise ValueError(f"{p}: invalid target name {name!r}")
+        targets.append(
+            PagesTarget(
+                name=name,
+                remote=_rewrite_remote_to_preferred_host(t["remote"]),
+                branch=(t.get("branch") or "main").strip(),
+                base_url=(t.get("base_url") or "").strip(),
+            )
+        )
+    if len({t.name for t in targets}) != len(targets):
+        raise ValueError(f"{p}: duplicate target names")
+    return targets
+
+
+def target_for_slug(page_slug: str, targets: list[PagesTarget]) -> PagesTarget:
+    """Stable target for a new page: hash of the slug's id part (same key as shard_for_slug) mod len(targets)."""
+    key = (page_slug or "").split("-", 1)[0] or page_slug
+    digest = hashlib.sha1(key.encode("utf-8")).digest()
+    return targets[int.from_bytes(digest[:8], "big") % len(targets)]
+
+
+def target_for_page(manifest: dict, page_slug: str, targets: list[PagesTarget]) -> PagesTarget:
+    """Already published pages stay in the repo recorded in the manifest (adding targets never moves URLs)."""
+    recorded = (manifest["pages"].get(page_slug) or {}).get("target")
+    for t in targets:
+        if t.name == recorded:
+            return t
+    return target_for_slug(page_slug, targets)
+
+
+def _checkout_target_branch(wd: Path, branch: str) -> None:
+    """Put the checkout on `branch`: track origin/<branch> if it exists, else start it as an orphan (empty history)."""
+    head = run(["git", "symbolic-ref", "-q", "--short", "HEAD"], cwd=wd, check=False)
+    if (head.stdout or "").strip() == branch:
+        return
+    if run(["git", "rev-parse", "--verify", "-q", f"refs/heads/{branch}"], cwd=wd, check=False).returncode == 0:
+        run(["git", "checkout", "-q", branch], cwd=wd)
+    elif run(["git", "rev-parse", "--verify", "-q", f"refs/remotes/origin/{branch}"], cwd=wd, check=False).returncode == 0:
+        run(["git", "checkout", "-q", "-b", branch, "--track", f"origin/{branch}"], cwd=wd)
+    else:
+        # 新分支（例如还没有 gh-pages）：不继承默认分支的历史和文件
+        run(["git", "checkout", "-q", "--orphan", branch], cwd=wd)
+        run(["git", "rm", "-r", "-q", "-f", "--ignore-unmatch", "."], cwd=wd)
+
+
+def ensure_target_checkout(target: PagesTarget, env: Optional[dict[str, str]] = None) -> Path:
+    """Check out target.branch in .cache/targets/<name>/ (clone on first use), rebased onto origin.
+
+    The branch may be new or the remote empty: then it is started as an orphan branch and the
+    first push creates it.
+    """
+    wd = target.workdir
+    if not (wd / ".git").exists():
+        wd.parent.mkdir(parents=True, exist_ok=True)
+        cloned = run(["git", "clone", "-q", "-b", target.branch, target.remote, str(wd)], env=env, check=False)
+        if cloned.returncode != 0:
+            shutil.rmtree(wd, ignore_errors=True)
+            run(["git", "clone", "-q", target.remote, str(wd)], env=env)
+        print(f"📥 已克隆 target {target.name}: {target.remote} ({target.branch})")
+    else:
+        run(["git", "fetch", "-q", "origin"], cwd=wd, env=env, check=False)
+    _checkout_target_branch(wd, target.branch)
+    if run(["git", "rev-parse", "--verify", "-q", f"refs/remotes/origin/{target.branch}"], cwd=wd, check=False).returncode == 0:
+        if run(["git", "rebase", "-q", f"origin/{target.branch}"], cwd=wd, check=False).returncode != 0:
+            run(["git", "rebase", "--abort"], cwd=wd, check=False)
+            print(f"⚠️ target {target.name} 的本地提交无法变基到 origin/{target.branch}，推送时会被拒绝")
+    for name in TARGET_SEED_FILES:
+        src = REPO_ROOT / name
+        if src.exists() and not (wd / name).exists():
+            shutil.copy2(src, wd / name)
+    return wd
+
+
+def git_commit_push_target(
+    target: PagesTarget, commit_message: str, env: Optional[dict[str, str]] = None, push: bool = True
+) -> bool:
+    """Commit pages/assets in the target checkout and push to its branch. Returns whether a commit was made."""
+    wd = target.workdir
+    _ensure_git_identity(wd)
+    paths_to_add = [p for p in ("pages", ASSETS_DIR_NAME) + TARGET_SEED_FILES if (wd / p).exists()]
+    if paths_to_add:
+        run(["git", "add", "--"] + paths_to_add, cwd=wd)
+    st = run(["git", "status", "--porcelain"], cwd=wd, check=False)
+    committed = bool((st.stdout or "").strip())
+    if committed:
+        run(["git", "commit", "-m", commit_message], cwd=wd, env=env)
+    # 也推送之前失败遗留的本地提交；空仓库（还没有任何提交）跳过
+    if push and run(["git", "rev-parse", "--verify", "-q", "HEAD"], cwd=wd, check=False).returncode == 0:
+        run(["git", "push", "origin", f"HEAD:refs/heads/{target.branch}"], cwd=wd, env=env)
+    return committed
+
+
+def push_targets_parallel(
+    groups: dict[str, tuple[PagesTarget, list[str]]],
+    commit_message: str,
+    wait: bool = False,
+    env: Optional[dict[str, str]] = None,
+    push: bool = True,
+) -> dict[str, Optional[str]]:
+    """One commit + push per target, all targets in parallel; optionally wait for each target's pages.
+
+    groups: target name -> (target, page URLs in that target). Returns target name -> error (None = ok).
+    """
+    env = env if env is not None else _git_env_for_pages_push()
+
+    def _one(target: PagesTarget, urls: list[str]) -> Optional[str]:
+        try:
+            with repo_lock(target.name):
+                committed = git_commit_push_target(target, commit_message, env=env, push=push)
+            print(f"🚀 已推送 {target.name}（{len(urls)} 个页面）" if committed else f"ℹ️ {target.name} 没有新的页面变更")
+        except subprocess.CalledProcessError as e:
+            return f"{e.cmd} (exit {e.returncode})"
+        if wait:
+            for url in urls:
+                wait_until_url_ready(url, timeout_seconds=180, interval_seconds=4.0)
+        return None
+
+    if not groups:
+        return {}
+    with ThreadPoolExecutor(max_workers=len(groups)) as pool:
+        futures = {name: pool.submit(_one, t, urls) for name, (t, urls) in groups.items()}
+        return {name: f.result() for name, f in futures.items()}
+
+
+def build_page_slug(title: str, raw_id: str = "", slug: Optional[str] = None) -> str:
+    """Default slug: encoded_id + '-' + slugify(title)."""
+    if slug:
+        return slug
+    id_prefix = encode_id_to_base64_letters(raw_id or "")
+    if id_prefix:
+        return f"{id_prefix}-{slugify(title)}"
+    return slugify(title)
+
+
+def stage_page(
+    manifest: dict,
+    page: PageData,
+    page_slug: str,
+    raw_id: str = "",
+    layout: Optional[str] = None,
+    target: Optional["PagesTarget"] = None,
+    source: Optional[dict] = None,
+) -> tuple[Path, str]:
+    """Write one page and record it in the in-memory manifest (caller saves). Returns (path, rel_dir).
+
+    With a target, the page is written into that target repo's checkout and the manifest entry
+    remembers the target name.
+    """
+    layout = layout or current_layout(manifest)
+    existing = manifest["pages"].get(page_slug)
+    if existing and existing.get("path"):
+        # 已发布过的页面原地更新，不因布局切换而换地址
+        layout = "sharded" if existing["path"].rstrip("/").count("/") >= 2 else "flat"
+    rel_dir = page_rel_dir(page_slug, layout)
+
+    meta = build_page_meta(page, raw_id=raw_id, source=source)
+    out_path = write_privacy_page(page, page_slug, layout, root=target.workdir if target else None, meta=meta)
+    record_page_in_manifest(
+        manifest,
+        page_slug,
+        rel_dir,
+        raw_id=raw_id,
+        title=page.title,
+        source=source,
+        page_sha256=hashlib.sha256(out_path.read_bytes()).hexdigest(),
+    )
+    if target:
+        manifest["pages"][page_slug]["target"] = target.name
+    return out_path, rel_dir
+
+
+def item_source(item: dict) -> Optional[dict]:
+    """app/company/email of a batch item (title is the app name), or None when the text came from elsewhere."""
+    if item.get("content_is_html") or not (item.get("company") and item.get("email")):
+        return None
+    return {"app": item["title"], "company": item["company"], "email": item["email"]}
+
+
+def load_batch_file(path: Path) -> list[dict]:
+    """JSONL, one page per line: {"title", "id", "content" | "content_file", "slug"?, "content_is_html"?, "company"?, "email"?}."""
+    items: list[dict] = []
+    for n, line in enumerate(path.read_text(encoding="utf-8").splitlines(), 1):
+        if not line.strip():
+            continue
+        item = json.loads(line)
+        if not item.get("title"):
+            raise ValueError(f"{path}:{n}: missing title")
+        if "content" not in item:
+            if not item.get("content_file"):
+                raise ValueError(f"{path}:{n}: need content or content_file")
+            item["content"] = read_content_from_file(Path(item["content_file"]))
+        items.append(item)
+    return items
+
+
+def publish_to_targets(items: list[dict], args, targets: list[PagesTarget]) -> list[str]:
+    """Multi-repo publish: each page goes to its target repo; one commit/push per target, in parallel.
+
+    The manifest (with each page's target) stays in this tool repo and is committed after the pushes.
+    Returns the page URLs in item order.
+    """
+    manifest = load_manifest()
+    env = _git_env_for_pages_push()
+    groups: dict[str, tuple[PagesTarget, list[str]]] = {}
+    page_urls: list[str] = []
+    slugs: list[str] = []
+    for item in items:
+        page = PageData(title=item["title"], content=item["content"], content_is_html=bool(item.get("content_is_html")))
+        page_slug = build_page_slug(item["title"], item.get("id") or "", item.get("slug"))
+        target = target_for_page(manifest, page_slug, targets)
+        if target.name not in groups:
+            with repo_lock(target.name):
+                ensure_target_checkout(target, env=env)
+            groups[target.name] = (target, [])
+        out_path, rel_dir = stage_page(
+            manifest, page, page_slug, raw_id=item.get("id") or "", layout=args.layout, target=target, source=item_source(item)
+        )
+        page_url = target.pages_base_url() + rel_dir + "/"
+        groups[target.name][1].append(page_url)
+        page_urls.append(page_url)
+        print(f"✅ Wrote privacy page: {out_path} [{target.name}]")
+        print(f"🌐 Page URL: {page_url} (id={item.get('id') or ''})")
+        slugs.append(page_slug)
+
+    if args.no_push:
+        with repo_lock():
+            merge_into_manifest(manifest, slugs)
+        print("ℹ️ --no-push used. Skipping git commit/push.")
+        return page_urls
+
+    message = args.commit_message
+    if message == DEFAULT_COMMIT_MESSAGE and len(items) > 1:
+        message = f"Publish {len(items)} privacy pages"
+    push = not args.commit_only
+    if push and not args.no_wait:
+        print("⏳ 推送完成后等待各仓库的 GitHub Pages 部署生效...")
+    errors = push_targets_parallel(groups, message, wait=push and not args.no_wait, env=env, push=push)
+
+    try:
+        # 工具仓库只提交 manifest（页面都在各 target 仓库里）
+        with repo_lock():
+            merge_into_manifest(manifest, slugs)
+            if push:
+                git_commit_push(message, page_paths=[])
+            else:
+                git_commit(message, page_paths=[])
+                print("ℹ️ --commit-only used. Skipping git push.")
+    except subprocess.CalledProcessError as e:
+        raise SystemExit(f"命令失败: {e.cmd} (exit {e.returncode})")
+
+    failed = {name: err for name, err in errors.items() if err}
+    for name, err in failed.items():
+        print(f"❌ 推送 {name} 失败: {err}（本地提交已保留，下次发布会一并推送）")
+    if failed:
+        raise SystemExit(1)
+    return page_urls
+
+
+def publish_batch(args, backend: PublishBackend) -> None:
+    """Write every page of a batch, then ONE commit + push for the whole batch."""
+    items = load_batch_file(Path(args.batch_file))
+    if not items:
+        print("ℹ️ 批量文件为空，无需发布。")
+        return
+
+    targets = load_targets() if args.backend == "git" else []
+    if targets:
+        publish_to_targets(items, args, targets)
+        return
+
+    message = args.commit_message
+    if message == DEFAULT_COMMIT_MESSAGE:
+        message = f"Publish {len(items)} privacy pages"
+    publish_with_backend(items, args, backend, message)
+
+
+def publish_with_backend(items: list[dict], args, backend: PublishBackend, message: str) -> list[str]:
+    """Render every page into pages/, merge the manifest, then hand the files to the backend in one go.
+
+    Returns the page URLs in item order.
+    """
+    manifest = load_manifest()
+    base_url = backend.page_base_url()
+    page_urls: list[str] = []
+    slugs: list[str] = []
+    rel_dirs: list[str] = []
+    with METRICS.stage("render"):
+        for item in items:
+            page = PageData(title=item["title"], content=item["content"], content_is_html=bool(item.get("content_is_html")))
+            page_slug = build_page_slug(item["title"], item.get("id") or "", item.get("slug"))
+            with TRACER.span(item.get("id") or page_slug, "order", step="render"):
+                out_path, rel_dir = stage_page(
+                    manifest, page, page_slug, raw_id=item.get("id") or "", layout=args.layout, source=item_source(item)
+                )
+            page_url = base_url + rel_dir + "/"
+            page_urls.append(page_url)
+            slugs.append(page_slug)
+            rel_dirs.append(rel_dir)
+            print(f"✅ Wrote privacy page: {out_path}")
+            print(f"🌐 Page URL: {page_url} (id={item.get('id') or ''})")
+    METRICS.count("pages_rendered", len(items))
+
+    with METRICS.stage("manifest"), repo_lock():
+        merge_into_manifest(manifest, slugs)
+    if args.no_push:
+        print("ℹ️ --no-push used. Skipping git commit/push.")
+        return page_urls
+
+    started = time.monotonic()
+    try:
+        with METRICS.stage("deliver"):
+            stats = backend.publish(REPO_ROOT, deliverable_paths(rel_dirs), message)
+    except subprocess.CalledProcessError as e:
+        METRICS.outcome("deliver", "failed")
+        err = (e.stderr or "").strip()
+        out = (e.output or "").strip()
+        if out:
+            print(out)
+        if err:
+            print(err)
+        raise SystemExit(f"命令失败: {e.cmd} (exit {e.returncode})")
+    except PublishError as e:
+        METRICS.outcome("deliver", "failed")
+        raise SystemExit(f"❌ 发布失败（{backend.name}）: {e}")
+    METRICS.outcome("deliver", "ok")
+    METRICS.outcome("backend", backend.name)
+    METRICS.count("deliver_bytes", stats.get("bytes", 0))
+    if backend.name != "git":
+        print(
+            f"🚀 已发布到 {backend.name}: {stats.get('files', 0)} 个文件，{stats.get('bytes', 0)} 字节"
+            f"（未变化跳过 {stats.get('skipped', 0)}），耗时 {time.monotonic() - started:.2f}s"
+        )
+
+    if backend.deploy_delay and not args.no_wait:
+        print("⏳ 等待 GitHub Pages 部署生效...")
+        with METRICS.stage("verify"):
+            ready = [wait_until_url_ready(u, timeout_seconds=180, interval_seconds=4.0) for u in page_urls]
+        METRICS.outcome("verify", "ok" if all(ready) else "timeout")
+        if all(ready):
+            print("✅ 页面已可访问。")
+        else:
+            print("ℹ️ 可能需要再等一会儿再刷新浏览器（GitHub Pages 有部署延迟）。")
+    return page_urls
 
 
 def main():
+    global DEPLOY_BRANCH
     parser = argparse.ArgumentParser(description="Publish per-app privacy page to GitHub Pages (no overwrite).")
-    parser.add_argument("--title", required=True, help="App name (for logging only; page H1/title are fixed)")
+    parser.add_argument("--title", help="App name (for logging only; page H1/title are fixed). Required when publishing")
     parser.add_argument("--content", help="Page content (plain text).")
     parser.add_argument("--content-file", help="Read content from a text file instead of --content")
     parser.add_argument("--content-is-html", action="store_true", help="Treat content as HTML (no escaping).")
     parser.add_argument("--slug", help="Optional custom slug; default: encoded_id + '-' + slugify(title)")
     parser.add_argument("--id", help="Optional raw ID (e.g. IGT1128). If provided, will be encoded into slug prefix.")
+    parser.add_argument("--company", help="Company the text was rendered for (stored in the manifest for catalog_audit.py)")
+    parser.add_argument("--email", help="Contact email the text was rendered for (stored in the manifest)")
     parser.add_argument("--commit-message", default=DEFAULT_COMMIT_MESSAGE, help="Git commit message")
     parser.add_argument("--no-push", action="store_true", help="Only write files, do not commit/push")
     parser.add_argument(
@@ -477,62 +1673,146 @@ def main():
         help="Do not wait/poll for GitHub Pages deployment (faster; URL may 404 for a bit).",
     )
 
-    args = parser.parse_args()
-
-    if args.content_file:
-        content = read_content_from_file(Path(args.content_file))
-    else:
-        content = args.content or ""
+    parser.add_argument(
+        "--layout",
+        choices=PAGE_LAYOUTS,
+        help="pages/ layout for this page (default: env PRIVACY_PAGES_LAYOUT, else the layout recorded in pages_manifest.json)",
+    )
+    parser.add_argument(
+        "--migrate-layout",
+        choices=("sharded",),
+        help="Move existing flat pages/<slug>/ into pages/<shard>/<slug>/, leaving redirect stubs at the old URLs",
+    )
 
-    # Build slug
-    if args.slug:
-        page_slug = args.slug
-    else:
-        id_prefix = encode_id_to_base64_letters(args.id or "")
-        if id_prefix:
-            page_slug = f"{id_prefix}-{slugify(args.title)}"
-        else:
-            page_slug = slugify(args.title)
+    parser.add_argument(
+        "--batch-file",
+        help="JSONL of pages to publish in one commit/push (see load_batch_file); ignores --title/--content",
+    )
+    parser.add_argument(
+        "--deploy-branch",
+        default=DEPLOY_BRANCH,
+        help="Deploy pages/ to this branch as a single squashed snapshot commit (default: env PRIVACY_PAGES_DEPLOY_BRANCH); "
+        "the tool branch then only tracks the scripts and pages_manifest.json",
+    )
+    parser.add_argument(
+        "--commit-only",
+        action="store_true",
+        help="With --batch-file: write pages and commit, but do not push (see --push-only)",
+    )
+    parser.add_argument(
+        "--push-only",
+        action="store_true",
+        help="Only push already committed pages to origin (resumes a --commit-only batch)",
+    )
+    parser.add_argument(
+        "--backend",
+        choices=BACKENDS,
+        default=None,
+        help="Where rendered pages are delivered: git (GitHub Pages, default), dir (local dir / rsync) or s3 "
+        "(S3-compatible store); default: env PRIVACY_PUBLISH_BACKEND. See publish_backends.py",
+    )
+    parser.add_argument(
+        "--trace",
+        metavar="PATH",
+        help="Write a Chrome trace-event timeline (stages, pages, git subprocesses, URL checks) to PATH; "
+        "open it in chrome://tracing or ui.perfetto.dev",
+    )
+    parser.add_argument(
+        "--verify-render",
+        action="store_true",
+        help="Golden check: lean output of every legacy page in pages/ must render the same visible text",
+    )
 
-    page = PageData(title=args.title, content=content, content_is_html=args.content_is_html)
-    out_path = write_privacy_page(page, page_slug)
+    args = parser.parse_args()
+    if args.trace:
+        TRACER.start(args.trace, "googleSites")
+    # 运行预算：由 privacy_merge.py 拉起时继承父进程的截止时间（PRIVACY_DEADLINE）
+    deadlines.start_run()
 
-    repo_slug = get_repo_slug_from_remote(get_git_remote_url("origin"))
-    page_url = github_pages_base_url(repo_slug) + f"pages/{page_slug}/"
+    DEPLOY_BRANCH = (args.deploy_branch or "").strip()
+    try:
+        args.backend = selected_backend_name(args.backend)
+        backend = make_backend(args.backend, commit_only=args.commit_only)
+        if args.backend != "git":
+            backend.page_base_url()
+    except PublishError as e:
+        parser.error(str(e))
+    if args.backend != "git" and (args.commit_only or args.push_only or args.migrate_layout):
+        parser.error("--commit-only / --push-only / --migrate-layout only apply to the git backend")
+
+    if args.verify_render:
+        mismatches = verify_render_golden()
+        for m in mismatches:
+            print(f"❌ 渲染文本不一致: {m}")
+        if mismatches:
+            raise SystemExit(1)
+        print("✅ 精简输出与现有页面的可见文本一致")
+        return
 
-    # Do NOT overwrite root index.html (keep permanent 404 landing page)
+    if args.migrate_layout:
+        # 迁移会整体改写 manifest：和提交放在同一把锁里，并行发布合并进来的条目不会被覆盖
+        message = args.commit_message if args.commit_message != DEFAULT_COMMIT_MESSAGE else "Migrate pages to sharded layout"
+        try:
+            with repo_lock():
+                migrated = migrate_pages_layout(args.migrate_layout)
+                print(f"✅ 已迁移 {len(migrated)} 个页面到 {args.migrate_layout} 布局（旧地址保留跳转页）")
+                if args.no_push or not migrated:
+                    return
+                moved = [p for slug in migrated for p in (f"pages/{slug}", page_rel_dir(slug, args.migrate_layout))]
+                git_commit_push(message, page_paths=moved)
+        except subprocess.CalledProcessError as e:
+            raise SystemExit(f"命令失败: {e.cmd} (exit {e.returncode})")
+        return
 
-    print(f"✅ Wrote privacy page: {out_path}")
-    print(f"🌐 Page URL: {page_url}")
+    if args.push_only:
+        targets = [t for t in load_targets() if (t.workdir / ".git").exists()]
+        errors = push_targets_parallel({t.name: (t, []) for t in targets}, args.commit_message)
+        try:
+            with repo_lock():
+                git_push()
+        except subprocess.CalledProcessError as e:
+            raise SystemExit(f"命令失败: {e.cmd} (exit {e.returncode})")
+        failed = {name: err for name, err in errors.items() if err}
+        for name, err in failed.items():
+            print(f"❌ 推送 {name} 失败: {err}")
+        if failed:
+            raise SystemExit(1)
+        print("✅ 已推送")
+        return
 
-    if args.no_push:
-        print("ℹ️ --no-push used. Skipping git commit/push.")
+    if args.batch_file:
+        publish_batch(args, backend)
         return
 
-    try:
-        git_commit_push(args.commit_message)
+    if not args.title:
+        parser.error("--title is required")
 
-        # give user a quick clipboard copy for convenience
-        if copy_to_clipboard_macos(page_url):
-            show_macos_toast("发布链接已复制", seconds=3)
+    if args.content_file:
+        content = read_content_from_file(Path(args.content_file))
+    else:
+        content = args.content or ""
 
-        # Default speed: don't wait unless user explicitly wants it
-        if not args.no_wait:
-            print("⏳ 等待 GitHub Pages 部署生效...")
-            if wait_until_url_ready(page_url, timeout_seconds=180, interval_seconds=4.0):
-                print("✅ 页面已可访问。")
-            else:
-                print("ℹ️ 可能需要再等一会儿再刷新浏览器（GitHub Pages 有部署延迟）。")
+    item = {
+        "title": args.title,
+        "content": content,
+        "content_is_html": args.content_is_html,
+        "id": args.id,
+        "slug": args.slug,
+        "company": args.company,
+        "email": args.email,
+    }
+    targets = load_targets() if args.backend == "git" else []
+    if targets:
+        page_urls = publish_to_targets([item], args, targets)
+    else:
+        # Do NOT overwrite root index.html (keep permanent 404 landing page)
+        page_urls = publish_with_backend([item], args, backend, args.commit_message)
 
-    except subprocess.CalledProcessError as e:
-        err = (e.stderr or "").strip()
-        out = (e.output or "").strip()
-        if out:
-            print(out)
-        if err:
-            print(err)
-        raise SystemExit(f"命令失败: {e.cmd} (exit {e.returncode})")
+    # give user a quick clipboard copy for convenience
+    if not args.no_push and copy_to_clipboard_macos(page_urls[0]):
+        show_macos_toast("发布链接已复制", seconds=3)
 
 
 if __name__ == "__main__":
-    main()
+    with record_run("googleSites"), exit_on_timeout():
+        main()
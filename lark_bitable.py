@@ -0,0 +1,282 @@
+"""records 的另一个数据源：Lark 开放平台 Bitable API（不需要浏览器，也不需要网页 Cookie）。
+
+网页端的 records 接口一次返回整张表所有字段（gzip + base64 整包），而我们只用三个字段。
+这里改走官方接口：
+  - 只请求需要的字段（field_names 投影，FIELDS 里的三个字段 ID 先映射成字段名）；
+  - 查单个/少量订单时用服务端过滤（订单号字段 is ...），不再下载整张表；
+  - 按 page_token 分页，直到 has_more=false。
+
+返回的 records 树与网页接口解压后的结构一致（recordMap -> {recordId, fields: {字段 ID: {value: [...]}}}），
+find_and_collect_by_target_value / RecordsIndex 不需要改动。
+
+鉴权（环境变量）：
+  LARK_ACCESS_TOKEN                 直接使用的 tenant/user access token；或
+  LARK_APP_ID + LARK_APP_SECRET     自建应用凭证，自动换取 tenant_access_token（过期前自动刷新）
+其他：
+  LARK_OPEN_API_BASE       开放平台地址（默认 https://open.larksuite.com）
+  LARK_BITABLE_APP_TOKEN   多维表格 app token（默认从 table_url 解析）
+  LARK_BITABLE_TABLE_ID    数据表 ID（默认从 table_url 解析）
+  LARK_BITABLE_VIEW_ID     视图 ID（默认从 table_url 解析；设为空字符串则不限视图）
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import threading
+import time
+import urllib.parse
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import requests
+
+import lark_http
+from records_index import FIELD_APP_NAME, FIELD_DOC_MENTION, FIELD_ORDER_ID
+from run_metrics import METRICS
+
+DEFAULT_OPEN_API_BASE = "https://open.larksuite.com"
+
+# 只需要这三个字段
+FIELDS = (FIELD_ORDER_ID, FIELD_APP_NAME, FIELD_DOC_MENTION)
+
+PAGE_SIZE = 500
+# 一次 search 请求里 OR 起来的订单号条件个数上限
+MAX_FILTER_CONDITIONS = 50
+# token 失效相关的错误码：刷新一次 token 后重试
+_TOKEN_ERROR_CODES = (99991661, 99991663, 99991668)
+
+
+class BitableError(RuntimeError):
+    pass
+
+
+def parse_table_url(url: str) -> Tuple[str, str, str]:
+    """https://xxx.larksuite.com/base/<app_token>?table=<table_id>&view=<view_id> -> (app_token, table_id, view_id)。"""
+    parsed = urllib.parse.urlparse(url or "")
+    parts = [p for p in parsed.path.split("/") if p]
+    app_token = parts[parts.index("base") + 1] if "base" in parts and parts.index("base") + 1 < len(parts) else ""
+    query = urllib.parse.parse_qs(parsed.query)
+    return app_token, (query.get("table") or [""])[0], (query.get("view") or [""])[0]
+
+
+def normalize_field_value(value: Any) -> List[Any]:
+    """开放平台的字段值 -> 网页接口的 value 列表（[{text, ...}]）。
+
+    文本字段本来就是 [{"type": "text", "text": ...}, {"type": "mention", "text", "link", ...}]；
+    其余类型（字符串、数字、超链接 {"text", "link"}）包成同样的形状。
+    """
+    if value is None:
+        return []
+    if isinstance(value, list):
+        return [v if isinstance(v, dict) else {"type": "text", "text": str(v)} for v in value]
+    if isinstance(value, dict):
+        return [value]
+    return [{"type": "text", "text": str(value)}]
+
+
+def records_tree_from_items(items: Iterable[Dict[str, Any]], name_to_id: Dict[str, str]) -> Dict[str, Any]:
+    """search 返回的 items（fields 以字段名为 key）-> 网页接口形状的 records 树（fields 以字段 ID 为 key）。"""
+    record_map: Dict[str, Any] = {}
+    for item in items:
+        rid = item.get("record_id") or f"rec{len(record_map):08d}"
+        fields = {}
+        for name, value in (item.get("fields") or {}).items():
+            fid = name_to_id.get(name)
+            if fid:
+                fields[fid] = {"value": normalize_field_value(value)}
+        record_map[rid] = {"recordId": rid, "fields": fields}
+    return {"recordMap": record_map, "total": len(record_map), "hasMore": False}
+
+
+class BitableClient:
+    def __init__(
+        self,
+        app_token: str,
+        table_id: str,
+        view_id: str = "",
+        base_url: str = DEFAULT_OPEN_API_BASE,
+        access_token: str = "",
+        app_id: str = "",
+        app_secret: str = "",
+        timeout: float = 30,
+    ):
+        if not app_token or not table_id:
+            raise BitableError("缺少多维表格 app token / table id")
+        if not access_token and not (app_id and app_secret):
+            raise BitableError("缺少鉴权：设置 LARK_ACCESS_TOKEN，或 LARK_APP_ID + LARK_APP_SECRET")
+        self.app_token = app_token
+        self.table_id = table_id
+        self.view_id = view_id
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self._static_token = access_token
+        self._app_id = app_id
+        self._app_secret = app_secret
+        self._token = access_token
+        self._token_expires_at = float("inf") if access_token else 0.0
+        self._lock = threading.Lock()
+        self._field_names: Optional[Dict[str, str]] = None
+        self.stats: Dict[str, int] = {"requests": 0, "response_bytes": 0, "records": 0}
+
+    @classmethod
+    def from_env(cls, table_url: str = "") -> "BitableClient":
+        app_token, table_id, view_id = parse_table_url(table_url)
+        env_view = os.environ.get("LARK_BITABLE_VIEW_ID")
+        return cls(
+            app_token=(os.environ.get("LARK_BITABLE_APP_TOKEN") or app_token).strip(),
+            table_id=(os.environ.get("LARK_BITABLE_TABLE_ID") or table_id).strip(),
+            view_id=(env_view if env_view is not None else view_id).strip(),
+            base_url=(os.environ.get("LARK_OPEN_API_BASE") or DEFAULT_OPEN_API_BASE).strip(),
+            access_token=(os.environ.get("LARK_ACCESS_TOKEN") or "").strip(),
+            app_id=(os.environ.get("LARK_APP_ID") or "").strip(),
+            app_secret=(os.environ.get("LARK_APP_SECRET") or "").strip(),
+        )
+
+    # --- HTTP ---
+
+    def _access_token(self, force_refresh: bool = False) -> str:
+        with self._lock:
+            if self._static_token:
+                return self._static_token
+            if force_refresh or not self._token or time.time() > self._token_expires_at - 60:
+                data = self._call(
+                    "POST",
+                    "/open-apis/auth/v3/tenant_access_token/internal",
+                    json_body={"app_id": self._app_id, "app_secret": self._app_secret},
+                    auth=False,
+                )
+                self._token = data.get("tenant_access_token") or ""
+                self._token_expires_at = time.time() + float(data.get("expire") or 7200)
+                if not self._token:
+                    raise BitableError("换取 tenant_access_token 失败：响应里没有 token")
+            return self._token
+
+    def _call(
+        self,
+        method: str,
+        path: str,
+        *,
+        params: Optional[Dict[str, Any]] = None,
+        json_body: Any = None,
+        auth: bool = True,
+    ) -> Dict[str, Any]:
+        """调用开放平台接口，返回顶层 JSON（code == 0）；token 失效时刷新一次。"""
+        url = self.base_url + path
+        if params:
+            url += "?" + urllib.parse.urlencode({k: v for k, v in params.items() if v not in (None, "")})
+        for retry in (False, True):
+            headers = {"Content-Type": "application/json; charset=utf-8"}
+            if auth:
+                headers["Authorization"] = f"Bearer {self._access_token(force_refresh=retry)}"
+            resp = lark_http.lark_request(method, url, headers=headers, json_body=json_body, timeout=self.timeout)
+            self.stats["requests"] += 1
+            self.stats["response_bytes"] += len(resp.content or b"")
+            try:
+                payload = resp.json()
+            except ValueError:
+                raise BitableError(f"HTTP {resp.status_code}: 响应不是 JSON: {resp.text[:200]!r}")
+            code = payload.get("code")
+            if code == 0:
+                return payload
+            if auth and not retry and not self._static_token and code in _TOKEN_ERROR_CODES:
+                continue
+            raise BitableError(f"HTTP {resp.status_code}: code={code} msg={payload.get('msg')!r} ({path})")
+        raise BitableError(f"token 刷新后仍然失败 ({path})")
+
+    def _table_path(self, suffix: str) -> str:
+        return f"/open-apis/bitable/v1/apps/{self.app_token}/tables/{self.table_id}/{suffix}"
+
+    # --- 字段 / 记录 ---
+
+    def field_names(self) -> Dict[str, str]:
+        """字段 ID -> 字段名（整张表，只请求一次）。"""
+        if self._field_names is None:
+            names: Dict[str, str] = {}
+            page_token = ""
+            while True:
+                data = self._call("GET", self._table_path("fields"), params={"page_size": 100, "page_token": page_token})["data"]
+                for f in data.get("items") or []:
+                    names[f["field_id"]] = f["field_name"]
+                if not data.get("has_more"):
+                    break
+                page_token = data.get("page_token") or ""
+            self._field_names = names
+        return self._field_names
+
+    def _needed_field_names(self) -> Dict[str, str]:
+        names = self.field_names()
+        missing = [fid for fid in FIELDS if fid not in names]
+        if missing:
+            raise BitableError(f"表里没有这些字段: {missing}")
+        return {fid: names[fid] for fid in FIELDS}
+
+    def iter_items(self, order_ids: Optional[List[str]] = None) -> Iterator[Dict[str, Any]]:
+        """search 分页遍历；order_ids 非空时按订单号在服务端过滤（每批最多 MAX_FILTER_CONDITIONS 个）。"""
+        wanted = self._needed_field_names()
+        body_base: Dict[str, Any] = {"field_names": list(wanted.values()), "automatic_fields": False}
+        if self.view_id:
+            body_base["view_id"] = self.view_id
+
+        ids = [i for i in dict.fromkeys((o or "").strip() for o in (order_ids or [])) if i]
+        chunks: List[Optional[List[str]]] = (
+            [ids[i : i + MAX_FILTER_CONDITIONS] for i in range(0, len(ids), MAX_FILTER_CONDITIONS)] if ids else [None]
+        )
+        for chunk in chunks:
+            body = dict(body_base)
+            if chunk:
+                body["filter"] = {
+                    "conjunction": "or",
+                    "conditions": [
+                        {"field_name": wanted[FIELD_ORDER_ID], "operator": "is", "value": [oid]} for oid in chunk
+                    ],
+                }
+            page_token = ""
+            while True:
+                data = self._call(
+                    "POST",
+                    self._table_path("records/search"),
+                    params={"page_size": PAGE_SIZE, "page_token": page_token},
+                    json_body=body,
+                )["data"]
+                items = data.get("items") or []
+                self.stats["records"] += len(items)
+                yield from items
+                if not data.get("has_more"):
+                    break
+                page_token = data.get("page_token") or ""
+                if not page_token:
+                    break
+
+    def fetch_records_tree(self, order_ids: Optional[List[str]] = None) -> Dict[str, Any]:
+        """拉取（过滤后的）记录，返回与网页 records 接口解压后同结构的树。"""
+        name_to_id = {name: fid for fid, name in self._needed_field_names().items()}
+        return records_tree_from_items(self.iter_items(order_ids), name_to_id)
+
+
+def fetch_records_tree(table_url: str = "", order_ids: Optional[List[str]] = None) -> Optional[Dict[str, Any]]:
+    """privacy_merge / --watch 用：按环境变量建客户端并拉取；失败打印原因并返回 None。"""
+    try:
+        client = BitableClient.from_env(table_url)
+        tree = client.fetch_records_tree(order_ids)
+    except (BitableError, requests.RequestException) as e:
+        print(f"❌ Bitable 接口请求失败: {e}")
+        return None
+    METRICS.count("records_decoded", client.stats["records"])
+    scope = f"订单 {', '.join(order_ids[:5])}{' …' if len(order_ids) > 5 else ''}" if order_ids else "整张表"
+    print(
+        f"✅ Bitable：{scope} -> {client.stats['records']} 行，"
+        f"{client.stats['requests']} 次请求，{client.stats['response_bytes']} 字节"
+    )
+    return tree
+
+
+if __name__ == "__main__":
+    # 调试：python lark_bitable.py [IGT1128 ...]  -> 打印投影后的 records 树
+    import sys
+
+    from privacy_merge import table_url
+
+    tree = fetch_records_tree(table_url, sys.argv[1:] or None)
+    if tree is None:
+        sys.exit(1)
+    print(json.dumps(tree, ensure_ascii=False))
@@ -0,0 +1,129 @@
+"""--source browser 用的 Chromium：持久化 profile、复用已打开的实例、登录过就无头运行、屏蔽重资源。
+
+浏览器只是用来拿到 records 接口 URL + Cookie，页面本身的图片 / 字体 / 音视频和埋点上报都用不上：
+  - profile 固定在 .cache/browser-profile，登录状态跨运行保留（扫一次码，之后都不用再扫）；
+  - 端口（9527）上已经有浏览器在跑就直接连上，不再新开；
+  - 保存过登录会话（.cache/lark_session.json）时无头启动；登录失效时由调用方切回有界面模式扫码；
+  - 每个标签页用 tab.set.blocked_urls 屏蔽 BLOCKED_URL_PATTERNS。
+
+环境变量：
+  PRIVACY_BROWSER_PROFILE    profile 目录（默认 <repo>/.cache/browser-profile）
+  PRIVACY_BROWSER_HEADLESS   1 / 0：强制无头 / 有界面（默认：保存过登录会话就无头）
+  PRIVACY_BROWSER_BLOCK      额外屏蔽的 URL 通配（逗号分隔）；设为 0 / off 关闭屏蔽
+"""
+
+from __future__ import annotations
+
+import os
+import socket
+import time
+from pathlib import Path
+from typing import Any, List
+
+try:
+    from DrissionPage import Chromium, ChromiumOptions
+except Exception:  # 离线模式（--records-file / --source bitable）不需要浏览器
+    Chromium = None
+    ChromiumOptions = None
+
+REPO_ROOT = Path(__file__).resolve().parent
+BROWSER_PORT = 9527
+PROFILE_DIR = Path(os.environ.get("PRIVACY_BROWSER_PROFILE") or REPO_ROOT / ".cache" / "browser-profile").expanduser()
+
+# 图片、字体、音视频，以及 Lark 网页端的监控 / 埋点上报；脚本、样式和 API 请求不能屏蔽
+BLOCKED_URL_PATTERNS = (
+    "*.png",
+    "*.jpg",
+    "*.jpeg",
+    "*.gif",
+    "*.webp",
+    "*.svg",
+    "*.ico",
+    "*.woff",
+    "*.woff2",
+    "*.ttf",
+    "*.otf",
+    "*.mp4",
+    "*.webm",
+    "*.mp3",
+    "*.m4a",
+    "*slardar*",
+    "*/monitor_browser/*",
+    "*/service/2/app_log/*",
+)
+
+
+def available() -> bool:
+    return Chromium is not None
+
+
+def blocked_patterns() -> List[str]:
+    extra = (os.environ.get("PRIVACY_BROWSER_BLOCK") or "").strip()
+    if extra.lower() in ("0", "off", "false", "no"):
+        return []
+    return list(BLOCKED_URL_PATTERNS) + [p.strip() for p in extra.split(",") if p.strip()]
+
+
+def headless_preferred(has_saved_login: bool) -> bool:
+    forced = (os.environ.get("PRIVACY_BROWSER_HEADLESS") or "").strip().lower()
+    if forced in ("1", "true", "yes", "on"):
+        return True
+    if forced in ("0", "false", "no", "off"):
+        return False
+    return has_saved_login
+
+
+def is_running(port: int = BROWSER_PORT) -> bool:
+    """端口上是否已经有浏览器（调试端口）在监听。"""
+    try:
+        with socket.create_connection(("127.0.0.1", port), timeout=0.3):
+            return True
+    except OSError:
+        return False
+
+
+def launch(port: int = BROWSER_PORT, headless: bool = False) -> Any:
+    """连接已打开的浏览器；没有就用持久化 profile 启动一个（headless 决定是否无头）。"""
+    if Chromium is None:
+        raise RuntimeError("未安装 DrissionPage，无法打开浏览器抓取；可改用 --records-file 离线运行")
+    if is_running(port):
+        print(f"🔗 连接已打开的浏览器（端口 {port}）")
+        return Chromium(port)
+    PROFILE_DIR.mkdir(parents=True, exist_ok=True)
+    co = ChromiumOptions().set_local_port(port).set_user_data_path(str(PROFILE_DIR))
+    co.headless(headless)
+    co.no_imgs(True)
+    co.mute(True)
+    print(f"🚀 启动{'无头' if headless else ''}浏览器（profile: {PROFILE_DIR}）")
+    return Chromium(co)
+
+
+def is_headless(tab: Any) -> bool:
+    try:
+        return "HeadlessChrome" in (tab.user_agent or "")
+    except Exception:
+        return False
+
+
+def prepare_tab(tab: Any) -> None:
+    """屏蔽图片 / 字体 / 音视频 / 埋点请求；失败（旧版 DrissionPage）只提示，不影响抓取。"""
+    patterns = blocked_patterns()
+    if not patterns:
+        return
+    try:
+        tab.set.blocked_urls(patterns)
+    except Exception as e:
+        print(f"⚠️ 设置资源屏蔽失败（可忽略）: {e}")
+
+
+def relaunch_headed(browser: Any, port: int = BROWSER_PORT) -> Any:
+    """无头浏览器里的登录失效时：关掉它，用同一个 profile 有界面启动，让用户扫码。"""
+    try:
+        browser.quit()
+    except Exception:
+        pass
+    # 等旧进程释放调试端口，否则 launch 会又连回那个正在退出的无头浏览器
+    end = time.monotonic() + 5
+    while is_running(port) and time.monotonic() < end:
+        time.sleep(0.2)
+    return launch(port, headless=False)
@@ -0,0 +1,401 @@
+"""所有 Lark 出站请求共用的限流器 + 请求封装（lark_get / lark_request）。
+
+- 令牌桶控制请求速率，另有并发窗口；二者都按 AIMD 自适应：
+  成功时缓慢加大（加性），遇到 429/503 立即减半（乘性）；
+- 遵守 Retry-After：被限流后所有线程一起暂停到指定时间；没有 Retry-After 则指数退避 + 抖动；
+- 被限流的请求自动重试，不再直接丢掉这一行。
+
+DocCache：doc 页面的条件请求缓存（ETag / Last-Modified）。磁盘上只存校验字段和提取结果
+（邮箱等），不存页面正文；重复抓取时发 If-None-Match / If-Modified-Since，304 直接复用提取结果。
+
+环境变量：
+  LARK_RATE             初始速率（请求/秒，默认 10）
+  LARK_MAX_RATE         速率上限（默认 50）
+  LARK_MAX_CONCURRENCY  并发窗口上限（默认 8）
+  LARK_DOC_CACHE_DIR    doc 缓存目录（默认 <repo>/.cache/lark_docs）
+  LARK_DOC_CACHE_MAX_BYTES  doc 缓存索引大小上限（默认 4 MB，超出按 LRU 淘汰）
+  LARK_DOC_CACHE_FLUSH_EVERY  每写入多少条新结果落盘一次（默认 50；其余在进程退出时写回）
+"""
+
+from __future__ import annotations
+
+import atexit
+import contextlib
+import email.utils
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+import urllib.parse
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, Optional, Tuple
+
+import requests
+
+import deadlines
+from run_metrics import METRICS
+from run_trace import TRACER
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+try:
+    import msvcrt
+except ImportError:
+    msvcrt = None
+
+THROTTLE_STATUS = (429, 503)
+
+REPO_ROOT = Path(__file__).resolve().parent
+DEFAULT_DOC_CACHE_DIR = REPO_ROOT / ".cache" / "lark_docs"
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.environ.get(name) or default)
+    except ValueError:
+        return default
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Retry-After：秒数（允许小数）或 HTTP-date；无法解析返回 None。"""
+    v = (value or "").strip()
+    if not v:
+        return None
+    try:
+        return max(0.0, float(v))
+    except ValueError:
+        pass
+    try:
+        dt = email.utils.parsedate_to_datetime(v)
+    except (TypeError, ValueError):
+        return None
+    if dt is None:
+        return None
+    return max(0.0, dt.timestamp() - time.time())
+
+
+class AdaptiveLimiter:
+    """令牌桶 + AIMD 并发窗口，线程安全；一个进程里所有 Lark 请求共享同一个实例。"""
+
+    def __init__(
+        self,
+        rate: float = 10.0,
+        max_rate: float = 50.0,
+        min_rate: float = 0.5,
+        max_concurrency: int = 8,
+        min_concurrency: int = 1,
+    ):
+        self._cond = threading.Condition()
+        self.max_rate = max_rate
+        self.min_rate = min_rate
+        self.rate = min(max(rate, min_rate), max_rate)
+        self.max_concurrency = max(1, max_concurrency)
+        self.min_concurrency = max(1, min(min_concurrency, self.max_concurrency))
+        self.concurrency = float(self.max_concurrency)
+        self._tokens = 1.0
+        self._last = time.monotonic()
+        self._in_flight = 0
+        self._blocked_until = 0.0
+        self.stats: Dict[str, int] = {"requests": 0, "throttled": 0}
+
+    def _refill(self, now: float) -> None:
+        burst = max(1.0, self.rate)
+        self._tokens = min(burst, self._tokens + (now - self._last) * self.rate)
+        self._last = now
+
+    def acquire(self) -> None:
+        with self._cond:
+            while True:
+                now = time.monotonic()
+                self._refill(now)
+                if now < self._blocked_until:
+                    wait: Optional[float] = self._blocked_until - now
+                elif self._in_flight >= int(self.concurrency):
+                    wait = None  # 等 release() 唤醒
+                elif self._tokens < 1.0:
+                    wait = (1.0 - self._tokens) / self.rate
+                else:
+                    self._tokens -= 1.0
+                    self._in_flight += 1
+                    self.stats["requests"] += 1
+                    return
+                self._cond.wait(timeout=wait)
+
+    def release(self, throttled: bool = False, retry_after: Optional[float] = None, attempt: int = 0) -> None:
+        with self._cond:
+            self._in_flight = max(0, self._in_flight - 1)
+            if throttled:
+                self.stats["throttled"] += 1
+                now = time.monotonic()
+                # 乘性减：一个冷却窗口内最多减一次。同一波并发请求一起收到 429 时，
+                # 它们反映的是同一次过载，逐个减半会把窗口一下压到最小值。
+                if now >= self._blocked_until:
+                    self.concurrency = max(float(self.min_concurrency), self.concurrency / 2)
+                    self.rate = max(self.min_rate, self.rate / 2)
+                self._tokens = min(self._tokens, 0.0)
+                if retry_after is None:
+                    retry_after = min(30.0, 0.5 * (2 ** attempt)) * random.uniform(0.5, 1.5)
+                self._blocked_until = max(self._blocked_until, now + retry_after)
+            else:
+                # 加性增：每个窗口 +1 并发，速率每个请求 +0.5/rate（约每秒 +0.5 req/s）
+                self.concurrency = min(float(self.max_concurrency), self.concurrency + 1.0 / max(1.0, self.concurrency))
+                self.rate = min(self.max_rate, self.rate + 0.5 / max(1.0, self.rate))
+            self._cond.notify_all()
+
+
+LIMITER = AdaptiveLimiter(
+    rate=_env_float("LARK_RATE", 10.0),
+    max_rate=_env_float("LARK_MAX_RATE", 50.0),
+    max_concurrency=int(_env_float("LARK_MAX_CONCURRENCY", 8)),
+)
+
+_session_local = threading.local()
+
+
+def _session() -> requests.Session:
+    # 每个线程一个 Session：复用连接，避免跨线程共享连接池的边角问题
+    s = getattr(_session_local, "session", None)
+    if s is None:
+        s = requests.Session()
+        _session_local.session = s
+    return s
+
+
+def lark_request(
+    method: str,
+    url: str,
+    *,
+    headers: Optional[Dict[str, str]] = None,
+    json_body: Any = None,
+    timeout: float = 15,
+    max_retries: int = 4,
+    limiter: Optional[AdaptiveLimiter] = None,
+) -> requests.Response:
+    """限流后的请求；429/503 按 Retry-After 等待后重试，最多 max_retries 次，返回最后一次响应。
+
+    网络异常（requests.RequestException）原样抛出，由调用方按原有逻辑处理。
+    每次尝试的超时不超过 http 阶段上限和剩余运行预算；预算用完时抛 deadlines.DeadlineExceeded。
+    """
+    limiter = limiter or LIMITER
+    attempt = 0
+    while True:
+        limiter.acquire()
+        try:
+            attempt_timeout = deadlines.timeout_for("http", timeout)
+            with TRACER.span(f"{method} {urllib.parse.urlsplit(url).path}", "http", attempt=attempt) as span:
+                resp = _session().request(method, url, headers=headers, json=json_body, timeout=attempt_timeout)
+                span.update(status=resp.status_code, bytes=len(resp.content or b""))
+        except BaseException:
+            limiter.release()
+            raise
+
+        METRICS.count("http_requests")
+        METRICS.count("http_bytes", len(resp.content or b""))
+        throttled = resp.status_code in THROTTLE_STATUS
+        limiter.release(
+            throttled=throttled,
+            retry_after=parse_retry_after(resp.headers.get("Retry-After")) if throttled else None,
+            attempt=attempt,
+        )
+        if not throttled or attempt >= max_retries:
+            return resp
+        attempt += 1
+        print(f"⏳ 被限流（HTTP {resp.status_code}），第 {attempt} 次重试: {url}")
+
+
+def lark_get(
+    url: str,
+    *,
+    headers: Optional[Dict[str, str]] = None,
+    timeout: float = 15,
+    max_retries: int = 4,
+    limiter: Optional[AdaptiveLimiter] = None,
+) -> requests.Response:
+    """限流后的 GET（见 lark_request）。"""
+    return lark_request("GET", url, headers=headers, timeout=timeout, max_retries=max_retries, limiter=limiter)
+
+
+class DocCache:
+    """按 URL 存 {etag, last_modified, extracted, last_access}，整体是一个 JSON 索引文件。
+
+    大小按索引序列化后的字节数计算，超过 max_bytes 时按 last_access 淘汰最久未用的条目。
+    put 只改内存，每 flush_every 条新结果落盘一次，其余在 flush()（进程退出）时写回。
+    落盘时在文件锁内先读回磁盘上的索引再合并（同一 URL 取 last_access 较新的那条），
+    并行的 batch / watch 进程不会互相覆盖对方写入的条目。
+    """
+
+    INDEX_NAME = "index.json"
+
+    def __init__(self, cache_dir: Optional[Path] = None, max_bytes: Optional[int] = None, flush_every: Optional[int] = None):
+        self.dir = Path(cache_dir or os.environ.get("LARK_DOC_CACHE_DIR") or DEFAULT_DOC_CACHE_DIR)
+        self.max_bytes = int(max_bytes if max_bytes is not None else _env_float("LARK_DOC_CACHE_MAX_BYTES", 4 * 1024 * 1024))
+        self.flush_every = max(1, int(flush_every if flush_every is not None else _env_float("LARK_DOC_CACHE_FLUSH_EVERY", 50)))
+        self._lock = threading.Lock()
+        self._entries: Optional[Dict[str, Dict[str, Any]]] = None
+        self._dirty = False
+        self._unsaved_puts = 0
+        self.stats: Dict[str, int] = {"hits": 0, "misses": 0, "stored": 0, "evicted": 0}
+
+    @staticmethod
+    def key_for(url: str) -> str:
+        return hashlib.sha1((url or "").encode("utf-8")).hexdigest()
+
+    @property
+    def index_path(self) -> Path:
+        return self.dir / self.INDEX_NAME
+
+    def _read_index(self) -> Dict[str, Dict[str, Any]]:
+        try:
+            data = json.loads(self.index_path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return {}
+        return data if isinstance(data, dict) else {}
+
+    def _load(self) -> Dict[str, Dict[str, Any]]:
+        if self._entries is None:
+            self._entries = self._read_index()
+        return self._entries
+
+    @contextlib.contextmanager
+    def _file_lock(self) -> Iterator[None]:
+        """进程间互斥：读回磁盘索引、合并、替换这一段。"""
+        self.dir.mkdir(parents=True, exist_ok=True)
+        with (self.dir / f"{self.INDEX_NAME}.lock").open("a+b") as f:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+            elif msvcrt is not None:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+                elif msvcrt is not None:
+                    f.seek(0)
+                    msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+    def _save(self) -> None:
+        with self._file_lock():
+            self._merge_and_replace()
+        self._dirty = False
+        self._unsaved_puts = 0
+
+    def _merge_and_replace(self) -> None:
+        entries = self._load()
+        for k, theirs in self._read_index().items():
+            ours = entries.get(k)
+            if ours is None or float(theirs.get("last_access", 0)) > float(ours.get("last_access", 0)):
+                entries[k] = theirs
+        sizes = {k: len(k) + len(json.dumps(v, ensure_ascii=False, separators=(",", ":")).encode("utf-8")) + 4 for k, v in entries.items()}
+        total = sum(sizes.values())
+        if total > self.max_bytes:
+            # LRU：先淘汰最久未用的，降到上限的 90% 以下，避免每次写入都触发淘汰
+            for k in sorted(entries, key=lambda k: entries[k].get("last_access", 0)):
+                if total <= self.max_bytes * 0.9:
+                    break
+                total -= sizes[k]
+                entries.pop(k)
+                self.stats["evicted"] += 1
+        tmp = self.index_path.with_name(f"{self.INDEX_NAME}.{os.getpid()}.tmp")
+        tmp.write_text(json.dumps(entries, ensure_ascii=False, separators=(",", ":")), encoding="utf-8")
+        os.replace(tmp, self.index_path)
+
+    def flush(self) -> None:
+        """把还没落盘的新结果和 last_access 改动写回磁盘（进程退出时自动调用）。"""
+        with self._lock:
+            if self._dirty:
+                self._save()
+
+    def get(self, url: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._load().get(self.key_for(url))
+            return dict(entry) if entry else None
+
+    def put(self, url: str, etag: str, last_modified: str, extracted: Any) -> None:
+        with self._lock:
+            self._load()[self.key_for(url)] = {
+                "url": url,
+                "etag": etag,
+                "last_modified": last_modified,
+                "extracted": extracted,
+                "last_access": time.time(),
+            }
+            self.stats["stored"] += 1
+            self._dirty = True
+            self._unsaved_puts += 1
+            if self._unsaved_puts >= self.flush_every:
+                self._save()
+
+    def touch(self, url: str) -> None:
+        with self._lock:
+            entry = self._load().get(self.key_for(url))
+            if entry:
+                entry["last_access"] = time.time()
+                self._dirty = True
+
+    def purge(self) -> int:
+        """清空缓存，返回删除的条目数。"""
+        with self._lock, self._file_lock():
+            n = len(self._load())
+            self._entries = {}
+            self._dirty = False
+            self._unsaved_puts = 0
+            try:
+                self.index_path.unlink()
+            except FileNotFoundError:
+                pass
+            return n
+
+
+_doc_cache: Optional[DocCache] = None
+
+
+def doc_cache() -> DocCache:
+    global _doc_cache
+    if _doc_cache is None:
+        _doc_cache = DocCache()
+        atexit.register(_doc_cache.flush)
+    return _doc_cache
+
+
+def cached_get(
+    url: str,
+    extract: Callable[[str], Any],
+    *,
+    headers: Optional[Dict[str, str]] = None,
+    timeout: float = 15,
+    cache: Optional[DocCache] = None,
+) -> Tuple[Optional[Any], int, bool]:
+    """条件 GET：返回 (extract(正文) 或缓存的提取结果, HTTP 状态码, 是否命中缓存)。
+
+    非 200/304 时返回 (None, 状态码, False)；网络异常原样抛出。
+    """
+    cache = cache or doc_cache()
+    entry = cache.get(url)
+    req_headers = dict(headers or {})
+    if entry:
+        if entry.get("etag"):
+            req_headers["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            req_headers["If-Modified-Since"] = entry["last_modified"]
+
+    resp = lark_get(url, headers=req_headers, timeout=timeout)
+    if resp.status_code == 304 and entry:
+        cache.stats["hits"] += 1
+        cache.touch(url)
+        return entry.get("extracted"), 304, True
+    if resp.status_code != 200:
+        return None, resp.status_code, False
+
+    cache.stats["misses"] += 1
+    extracted = extract(resp.text or "")
+    etag = resp.headers.get("ETag") or ""
+    last_modified = resp.headers.get("Last-Modified") or ""
+    if etag or last_modified:
+        cache.put(url, etag, last_modified, extracted)
+    return extracted, 200, False
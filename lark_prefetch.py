@@ -0,0 +1,220 @@
+"""--prefetch：低优先级后台任务，提前解析所有“还没发布”的订单。
+
+单个订单最慢的是找行 + 抓 doc 页面里的邮箱。预取任务定期：
+  1. 拉一次表格快照（与 --watch 相同的会话 / 数据源），建 RecordsIndex；
+  2. 找出 pages_manifest.json 里还没有页面的订单号；
+  3. 用很小的并发（默认 2 个线程 + 单独的慢速限流器，进程 nice 10）解析 app / company / email；
+  4. 结果写入 .cache/prefetched.jsonl（原子替换）。
+
+文件格式就是 --records-file 能读的“已解析行”JSONL（id, app, company, email，另带 fingerprint /
+resolved_at），所以也可以直接 python privacy_merge.py IGT1128 --records-file .cache/prefetched.jsonl。
+privacy_merge.py 发布时先查这里（见 lookup），命中就只剩渲染 + 推送。
+
+行内容变了（指纹不同）会重新解析；已经发布的订单在下一轮从文件里移除。
+预取之后表格里的行还可能被改：批量发布反正要为未命中的订单拉 records，顺便用指纹核对命中的行；
+单个订单发布不拉表，只接受很新的结果（UNVERIFIED_MAX_AGE_SECONDS）；--watch 每轮拿到快照后
+也会删掉指纹已变的条目（invalidate_changed）。
+
+用法：
+  python privacy_merge.py --prefetch                 # 每 --interval 秒一轮
+  python privacy_merge.py --prefetch --once          # 跑一轮即退出（cron）
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import deadlines
+import lark_http
+import lark_watch
+import privacy_merge
+from records_index import IndexedRow, RecordsIndex
+
+PREFETCH_PATH = lark_watch.REPO_ROOT / ".cache" / "prefetched.jsonl"
+PREFETCH_WORKERS = 2
+# 多少个结果落一次盘（进程被杀最多重做这么多行）
+FLUSH_EVERY = 20
+# 预取结果的有效期：超过后发布时不再使用，重新现查（秒，默认 24 小时）。只适用于能用当前表格
+# 核对指纹的场合（批量发布、预取任务自己）
+MAX_AGE_SECONDS = float(os.environ.get("PRIVACY_PREFETCH_MAX_AGE") or 24 * 3600)
+# 没法核对指纹时（单个订单发布不拉表）只用这么新的结果（秒，默认 10 分钟）
+UNVERIFIED_MAX_AGE_SECONDS = float(os.environ.get("PRIVACY_PREFETCH_UNVERIFIED_MAX_AGE") or 600)
+
+
+def load_prefetched(path: Path = PREFETCH_PATH) -> Dict[str, Dict[str, Any]]:
+    """{订单号: 行}；文件不存在或某行损坏时跳过。"""
+    out: Dict[str, Dict[str, Any]] = {}
+    try:
+        lines = path.read_text(encoding="utf-8").splitlines()
+    except OSError:
+        return out
+    for line in lines:
+        try:
+            row = json.loads(line)
+        except ValueError:
+            continue
+        if isinstance(row, dict) and row.get("id"):
+            out[str(row["id"]).upper()] = row
+    return out
+
+
+def save_prefetched(rows: Dict[str, Dict[str, Any]], path: Path = PREFETCH_PATH) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    with tmp.open("w", encoding="utf-8") as f:
+        for oid in sorted(rows):
+            f.write(json.dumps(rows[oid], ensure_ascii=False) + "\n")
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+def _is_usable(row: Optional[Dict[str, Any]], max_age: float = MAX_AGE_SECONDS) -> bool:
+    if not row or not (row.get("app") and row.get("company") and row.get("email")):
+        return False
+    return time.time() - float(row.get("resolved_at") or 0) <= max_age
+
+
+def lookup(
+    order_ids: Iterable[str], path: Path = PREFETCH_PATH, max_age: float = UNVERIFIED_MAX_AGE_SECONDS
+) -> Dict[str, Dict[str, Any]]:
+    """发布时用：返回这些订单里已预取、字段完整且不超过 max_age 的
+    {id: {id, app, company, email, fingerprint, resolved_at}}。
+
+    默认只接受很新的结果；调用方会用 fingerprint 和当前行核对时，可以放宽到 MAX_AGE_SECONDS。
+    """
+    rows = load_prefetched(path)
+    hits: Dict[str, Dict[str, Any]] = {}
+    for oid in order_ids:
+        row = rows.get((oid or "").upper())
+        if _is_usable(row, max_age):
+            hits[oid] = {
+                "id": oid,
+                "app": row["app"],
+                "company": row["company"],
+                "email": row["email"],
+                "fingerprint": row.get("fingerprint") or "",
+                "resolved_at": float(row.get("resolved_at") or 0),
+            }
+    return hits
+
+
+def invalidate_changed(index: RecordsIndex, path: Path = PREFETCH_PATH) -> int:
+    """删掉行内容已变（指纹不同）的预取结果，返回删除条数；--watch 每轮拿到快照后调用。"""
+    prefetched = load_prefetched(path)
+    if not prefetched:
+        return 0
+    changed = []
+    for row in index.rows:
+        oid = (row.order_id or "").upper()
+        cached = prefetched.get(oid)
+        if cached and cached.get("fingerprint") != lark_watch.row_fingerprint(row):
+            changed.append(oid)
+    for oid in changed:
+        prefetched.pop(oid, None)
+    if changed:
+        save_prefetched(prefetched, path)
+    return len(changed)
+
+
+def pending_rows(index: RecordsIndex, prefetched: Dict[str, Dict[str, Any]]) -> List[Tuple[IndexedRow, str]]:
+    """还没发布、且没有可用预取结果（或行已变化）的订单。"""
+    published = lark_watch._manifest_ids()
+    todo: List[Tuple[IndexedRow, str]] = []
+    seen = set()
+    for row in index.rows:
+        oid = (row.order_id or "").upper()
+        if not oid or oid in seen or oid in published:
+            continue
+        seen.add(oid)
+        fp = lark_watch.row_fingerprint(row)
+        cached = prefetched.get(oid)
+        if cached and cached.get("fingerprint") == fp and _is_usable(cached):
+            continue
+        todo.append((row, fp))
+    return todo
+
+
+def _lower_priority(workers: int = PREFETCH_WORKERS) -> None:
+    try:
+        os.nice(10)
+    except (AttributeError, OSError):  # Windows 没有 os.nice
+        pass
+    # 本进程的 doc 请求用一个慢速限流器，不和前台发布抢 Lark 的配额
+    lark_http.LIMITER = lark_http.AdaptiveLimiter(rate=1.0, max_rate=3.0, max_concurrency=max(1, workers))
+
+
+def run_prefetch_tick(session: Tuple[str, str], source: str = "browser", workers: int = PREFETCH_WORKERS) -> Optional[int]:
+    """跑一轮；返回本轮新解析的订单数，records 请求失败返回 None。"""
+    index = lark_watch._fetch_index(session, source)
+    if index is None:
+        return None
+
+    prefetched = load_prefetched()
+    published = lark_watch._manifest_ids()
+    stale = [oid for oid in prefetched if oid in published]
+    for oid in stale:
+        prefetched.pop(oid)
+
+    todo = pending_rows(index, prefetched)
+    del index
+    if not todo:
+        if stale:
+            save_prefetched(prefetched)
+        print(f"💤 没有需要预取的订单（已预取 {len(prefetched)} 个）")
+        return 0
+    print(f"📥 预取 {len(todo)} 个未发布订单（并发 {workers}）")
+
+    cookies_str = session[1]
+    done = 0
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        results = pool.map(lambda rf: (rf[1], privacy_merge.resolve_row(rf[0], cookies_str)), todo)
+        for fp, info in results:
+            oid = info["id"].upper()
+            prefetched[oid] = {**info, "id": oid, "fingerprint": fp, "resolved_at": time.time()}
+            done += 1
+            if done % FLUSH_EVERY == 0:
+                save_prefetched(prefetched)
+    save_prefetched(prefetched)
+    incomplete = sum(1 for row, _ in todo if not _is_usable(prefetched.get(row.order_id.upper())))
+    print(f"✅ 预取完成：{done} 个（字段不完整 {incomplete} 个），结果在 {PREFETCH_PATH}")
+    return done
+
+
+def prefetch_loop(
+    interval: int = 600,
+    once: bool = False,
+    source: str = "browser",
+    workers: int = PREFETCH_WORKERS,
+    budget: Optional[float] = None,
+) -> None:
+    """budget：每一轮的运行预算（秒，见 deadlines.py）。"""
+    _lower_priority(workers)
+    session = lark_watch._ensure_session(source)
+    if not session:
+        return
+    print(f"🐢 后台预取（间隔 {interval}s，低优先级），结果文件: {PREFETCH_PATH}")
+    while True:
+        started = time.monotonic()
+        try:
+            with deadlines.scope(budget or 0):
+                n = run_prefetch_tick(session, source=source, workers=workers)
+            if n is None:
+                print("⚠️ records 请求失败，可能会话已失效")
+                if source == "browser" and sys.stdin.isatty():
+                    session = privacy_merge.capture_records_session() or session
+        except KeyboardInterrupt:
+            raise
+        except deadlines.DeadlineExceeded as e:
+            print(f"⏱️ 本轮预取超时，下一轮继续: {e}")
+        except Exception as e:
+            print(f"❌ 本轮预取失败: {e}")
+        if once:
+            return
+        time.sleep(max(1.0, interval - (time.monotonic() - started)))
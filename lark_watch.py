@@ -0,0 +1,206 @@
+"""--watch：轮询 Lark 表格，把新增/变更的订单自动解析、渲染并按批发布。
+
+每一轮（tick）：
+  1. 用保存的会话（.cache/lark_session.json）请求 records；会话失效时在终端里重新扫码
+     （--source bitable 时改走开放平台 API，只取需要的字段）；
+  2. 建 RecordsIndex，与状态文件里“已发布”的指纹对比，得到新增/变更的订单号；
+  3. 并发解析（doc 邮箱抓取走共享限流器 + 条件请求缓存），渲染文本；
+  4. 本轮所有变更一次 commit + push（googleSites.py --batch-file）；
+  5. 成功后才把这些订单写入状态文件（原子写），重启后不会重复发布。
+
+用法：
+  python privacy_merge.py --watch --interval 120
+  python privacy_merge.py --watch --once          # 跑一轮即退出（cron）
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import deadlines
+import lark_bitable
+import privacy_merge
+from records_index import IndexedRow, RecordsIndex
+from run_trace import TRACER
+
+REPO_ROOT = Path(__file__).resolve().parent
+WATCH_STATE_PATH = REPO_ROOT / ".cache" / "watch_state.json"
+MANIFEST_PATH = REPO_ROOT / "pages_manifest.json"
+RESOLVE_WORKERS = 4
+
+
+def row_fingerprint(row: IndexedRow) -> str:
+    """影响页面内容的字段指纹；任一变化即视为“变更”需要重新发布。"""
+    raw = json.dumps([row.app, row.doc_text, row.doc_link, row.email], ensure_ascii=False)
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+
+def load_state(path: Path = WATCH_STATE_PATH) -> Optional[Dict[str, Any]]:
+    try:
+        data = json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
+    if not isinstance(data, dict):
+        return None
+    data.setdefault("published", {})
+    return data
+
+
+def save_state(state: Dict[str, Any], path: Path = WATCH_STATE_PATH) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(".json.tmp")
+    with tmp.open("w", encoding="utf-8") as f:
+        json.dump(state, f, ensure_ascii=False)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+def _manifest_ids() -> set:
+    try:
+        pages = json.loads(MANIFEST_PATH.read_text(encoding="utf-8")).get("pages", {})
+    except (OSError, ValueError):
+        return set()
+    return {str(p.get("id") or "").upper() for p in pages.values() if p.get("id")}
+
+
+def diff_snapshot(index: RecordsIndex, published: Dict[str, str]) -> List[Tuple[IndexedRow, str]]:
+    """返回 [(row, 指纹)]：状态文件里没有、或指纹变了的订单（同一订单号只取表中第一行）。"""
+    changed: List[Tuple[IndexedRow, str]] = []
+    seen = set()
+    for row in index.rows:
+        oid = row.order_id
+        if not oid or oid in seen:
+            continue
+        seen.add(oid)
+        fp = row_fingerprint(row)
+        if published.get(oid) != fp:
+            changed.append((row, fp))
+    return changed
+
+
+def _fetch_index(session: Tuple[str, str], source: str = "browser") -> Optional[RecordsIndex]:
+    if source == "bitable":
+        records = lark_bitable.fetch_records_tree(privacy_merge.table_url)
+    else:
+        records = privacy_merge.fetch_records(session[0], session[1])
+    if records is None:
+        return None
+    index = RecordsIndex.from_records(records)
+    del records
+    return index
+
+
+def _ensure_session(source: str = "browser") -> Optional[Tuple[str, str]]:
+    session = privacy_merge.load_lark_session()
+    if source == "bitable":
+        # records 走开放平台 API；Cookie 只用于抓 doc 页面的邮箱
+        return "", os.environ.get("LARK_COOKIE") or (session[1] if session else "")
+    if session:
+        return session
+    if not sys.stdin.isatty():
+        print("❌ 没有可用的 Lark 会话，且当前不是交互终端；请先在终端运行一次 privacy_merge.py 扫码登录")
+        return None
+    return privacy_merge.capture_records_session()
+
+
+def run_tick(
+    session: Tuple[str, str], state: Dict[str, Any], backfill: bool = False, source: str = "browser"
+) -> Optional[int]:
+    """跑一轮；返回本轮发布的页面数，会话失效返回 None。"""
+    index = _fetch_index(session, source)
+    if index is None:
+        return None
+    # 预取结果对应的行被改了：作废，单个订单发布时不会再拿到旧的 app/company/email
+    from lark_prefetch import invalidate_changed
+
+    dropped = invalidate_changed(index)
+    if dropped:
+        print(f"🧹 {dropped} 个预取结果对应的行已变化，已作废")
+
+    published: Dict[str, str] = state["published"]
+    if not state.get("baseline_done"):
+        already = _manifest_ids()
+        for row, fp in diff_snapshot(index, published):
+            # 首次运行：已在清单里的视为已发布；其余默认只记基线，--backfill 时才补发
+            if not backfill or row.order_id.upper() in already:
+                published[row.order_id] = fp
+        state["baseline_done"] = True
+        save_state(state)
+        print(f"📌 已记录基线：{len(published)} 个订单")
+
+    changed = diff_snapshot(index, published)
+    if not changed:
+        print("💤 没有新增/变更的订单")
+        return 0
+    print(f"🆕 发现 {len(changed)} 个新增/变更订单: {', '.join(r.order_id for r, _ in changed[:20])}")
+
+    cookies_str = session[1]
+
+    def _resolve(row: IndexedRow) -> Dict[str, str]:
+        with TRACER.span(row.order_id, "order", step="resolve"):
+            return privacy_merge.resolve_row(row, cookies_str)
+
+    with ThreadPoolExecutor(max_workers=RESOLVE_WORKERS, thread_name_prefix="resolve") as pool:
+        resolved = list(pool.map(lambda rf: _resolve(rf[0]), changed))
+
+    items: List[Dict[str, str]] = []
+    fingerprints: Dict[str, str] = {}
+    for (row, fp), info in zip(changed, resolved):
+        if not (info["app"] and info["company"] and info["email"]):
+            print(f"⚠️ {row.order_id} 字段不完整（app/company/email），下一轮再试: {info}")
+            continue
+        info["text"] = privacy_merge.render_privacy_text(info["app"], info["company"], info["email"])
+        items.append(info)
+        fingerprints[row.order_id] = fp
+
+    if not items:
+        return 0
+
+    urls = privacy_merge.publish_batch_to_github(items, commit_message=f"Publish {len(items)} privacy pages (watch)")
+    for oid, url in urls.items():
+        if oid in fingerprints:
+            published[oid] = fingerprints[oid]
+            print(f"🌐 {oid}: {url}")
+    state["last_publish"] = time.time()
+    save_state(state)
+    return len(urls)
+
+
+def watch_loop(
+    interval: int = 120, backfill: bool = False, once: bool = False, source: str = "browser", budget: Optional[float] = None
+) -> None:
+    """budget：每一轮的运行预算（秒，见 deadlines.py）；一轮超时只放弃这一轮，下一轮照常。"""
+    state = load_state() or {"published": {}}
+    session = _ensure_session(source)
+    if not session:
+        return
+
+    print(f"👀 开始监听表格（间隔 {interval}s），状态文件: {WATCH_STATE_PATH}")
+    while True:
+        started = time.monotonic()
+        try:
+            with deadlines.scope(budget or 0):
+                n = run_tick(session, state, backfill=backfill, source=source)
+            if n is None:
+                print("⚠️ records 请求失败，可能会话已失效")
+                if source == "browser" and sys.stdin.isatty():
+                    session = privacy_merge.capture_records_session() or session
+        except KeyboardInterrupt:
+            raise
+        except deadlines.DeadlineExceeded as e:
+            print(f"⏱️ 本轮超时，下一轮重试: {e}")
+        except Exception as e:
+            # 单轮失败不退出，下一轮重试（状态只在发布成功后更新）
+            print(f"❌ 本轮失败: {e}")
+
+        if once:
+            return
+        time.sleep(max(1.0, interval - (time.monotonic() - started)))
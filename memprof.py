@@ -0,0 +1,128 @@
+"""可选的内存报告（tracemalloc + 进程峰值 RSS），按阶段统计。
+
+默认关闭，开销为零；开启后每个阶段记录：
+  - 阶段结束时仍存活的 Python 分配（current）
+  - 阶段内的 Python 分配峰值（peak）
+  - 进程峰值 RSS（ru_maxrss，单调不减）
+  - 阶段内新增分配最多的若干代码位置
+"""
+
+from __future__ import annotations
+
+import contextlib
+import json
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+
+try:
+    import resource
+except Exception:  # Windows 没有 resource 模块
+    resource = None
+
+
+def peak_rss_bytes() -> int:
+    """进程峰值 RSS（字节）；不支持的平台返回 0。"""
+    if resource is None:
+        return 0
+    try:
+        v = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    except Exception:
+        return 0
+    # Linux 单位为 KB，macOS 为字节
+    return int(v) if sys.platform == "darwin" else int(v) * 1024
+
+
+def _fmt_bytes(n: int) -> str:
+    f = float(n)
+    for unit in ("B", "KB", "MB", "GB"):
+        if abs(f) < 1024 or unit == "GB":
+            return f"{f:.1f} {unit}" if unit != "B" else f"{int(f)} B"
+        f /= 1024
+    return f"{n} B"
+
+
+class MemoryReport:
+    def __init__(self, enabled: bool = False, top_n: int = 5, frames: int = 1):
+        self.enabled = enabled
+        self.top_n = top_n
+        self.frames = frames
+        self.stages: List[Dict[str, Any]] = []
+
+    @contextlib.contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        if not self.enabled:
+            yield
+            return
+
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(self.frames)
+        tracemalloc.reset_peak()
+        before = tracemalloc.take_snapshot()
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - t0
+            current, peak = tracemalloc.get_traced_memory()
+            after = tracemalloc.take_snapshot()
+            ignore = [tracemalloc.Filter(False, tracemalloc.__file__)]
+            top = []
+            diffs = after.filter_traces(ignore).compare_to(before.filter_traces(ignore), "lineno")
+            for stat in diffs[: self.top_n]:
+                frame = stat.traceback[0]
+                top.append(
+                    {
+                        "site": f"{frame.filename}:{frame.lineno}",
+                        "size_diff": stat.size_diff,
+                        "count_diff": stat.count_diff,
+                    }
+                )
+            del before, after, diffs
+            self.stages.append(
+                {
+                    "stage": name,
+                    "seconds": round(elapsed, 4),
+                    "current_bytes": current,
+                    "peak_bytes": peak,
+                    "peak_rss_bytes": peak_rss_bytes(),
+                    "top": top,
+                }
+            )
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "stages": self.stages,
+            "overall_peak_bytes": max((s["peak_bytes"] for s in self.stages), default=0),
+            "peak_rss_bytes": peak_rss_bytes(),
+        }
+
+    def print_report(self) -> None:
+        if not self.enabled:
+            return
+        print("------ 内存报告 ------")
+        for s in self.stages:
+            print(
+                f"📦 {s['stage']}: peak={_fmt_bytes(s['peak_bytes'])} "
+                f"current={_fmt_bytes(s['current_bytes'])} rss_peak={_fmt_bytes(s['peak_rss_bytes'])} "
+                f"({s['seconds']:.2f}s)"
+            )
+            for t in s["top"]:
+                print(f"    {_fmt_bytes(t['size_diff']):>10}  {t['site']}")
+        print("----------------------")
+
+    def write(self, path: Optional[str]) -> None:
+        """path 为空或 '-' 时打印到终端，否则写 JSON 文件。"""
+        if not self.enabled:
+            return
+        if not path or path == "-":
+            self.print_report()
+            return
+        Path(path).write_text(json.dumps(self.to_dict(), ensure_ascii=False, indent=2) + "\n", encoding="utf-8")
+        print(f"📦 内存报告已写入: {path}")
+
+    def stop(self) -> None:
+        if self.enabled and tracemalloc.is_tracing():
+            tracemalloc.stop()
@@ -0,0 +1,189 @@
+"""发布前的环境检查：并行跑一次，结果缓存到 .cache/preflight.json，批量 / watch 只付一次代价。
+
+每次发布原来要串行跑：privacy_merge 的 ssh-add -L，googleSites 的两次 git remote get-url、
+两次 git config --get、又一次 ssh-add -L，再 stat 一次 key 文件。现在分两组：
+  agent  key 文件是否存在、公钥是否已加载到 ssh-agent（ssh-add -L）
+  repo   origin 的 URL、user.name、user.email（每个仓库 / target checkout 一份）
+两组里的探测在线程池里同时跑。缓存键是相关文件的 mtime 和 SSH_AUTH_SOCK：
+  agent  SSH_AUTH_SOCK + key / key.pub
+  repo   <仓库>/.git/config + 全局 / 系统 gitconfig
+这些文件一改（remote set-url、git config 也会改 .git/config），下次调用就重新探测。
+“key 未加载”不写入磁盘缓存：用户按提示 ssh-add 之后，下一次运行马上能看到。反过来，从同一个
+agent 里删掉 key（ssh-add -D）不会改变缓存键，要等 TTL 过期（push 用 BatchMode，照样会快速失败）。
+
+环境变量：
+  PRIVACY_PREFLIGHT_TTL   缓存有效期，秒（默认 3600；0 表示不用磁盘缓存，只在进程内复用）
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import deadlines
+from run_metrics import METRICS
+
+REPO_ROOT = Path(__file__).resolve().parent
+CACHE_PATH = REPO_ROOT / ".cache" / "preflight.json"
+CACHE_VERSION = 1
+TTL_SECONDS = float(os.environ.get("PRIVACY_PREFLIGHT_TTL") or 3600)
+DEFAULT_KEY_PATH = Path(os.environ.get("PRIVACY_PAGES_SSH_KEY", "~/.ssh/id_ed25519_common_hosts")).expanduser()
+
+
+@dataclass
+class Preflight:
+    key_path: str
+    key_exists: bool
+    key_loaded: bool
+    origin_url: str
+    user_name: str
+    user_email: str
+
+
+_lock = threading.Lock()
+# 进程内：(组, 对象) -> (缓存键, 结果)
+_memo: Dict[Tuple[str, str], Tuple[List[Any], Dict[str, Any]]] = {}
+
+
+def _stat_sig(path: Path) -> Optional[List[int]]:
+    try:
+        st = path.stat()
+    except OSError:
+        return None
+    return [st.st_mtime_ns, st.st_size]
+
+
+def _global_git_configs() -> List[Path]:
+    xdg = Path(os.environ.get("XDG_CONFIG_HOME") or Path.home() / ".config")
+    paths = [Path(os.environ.get("GIT_CONFIG_GLOBAL") or Path.home() / ".gitconfig"), xdg / "git" / "config"]
+    return paths + [Path("/etc/gitconfig")]
+
+
+def _agent_key(key_path: Path) -> List[Any]:
+    pub = Path(str(key_path) + ".pub")
+    return [os.environ.get("SSH_AUTH_SOCK") or "", str(key_path), _stat_sig(key_path), _stat_sig(pub)]
+
+
+def _repo_key(root: Path) -> List[Any]:
+    return [str(root), _stat_sig(root / ".git" / "config")] + [_stat_sig(p) for p in _global_git_configs()]
+
+
+def _probe_agent(key_path: Path) -> Dict[str, Any]:
+    pub = Path(str(key_path) + ".pub")
+    result = {"key_exists": key_path.exists(), "key_loaded": False}
+    try:
+        parts = pub.read_text(encoding="utf-8").split()
+    except OSError:
+        return result
+    if len(parts) < 2:
+        return result
+    try:
+        p = deadlines.run_process(["ssh-add", "-L"], "ssh_agent")
+    except (OSError, deadlines.DeadlineExceeded):
+        return result
+    result["key_loaded"] = p.returncode == 0 and parts[1] in p.stdout.decode("utf-8", "replace")
+    return result
+
+
+def _git_value(root: Path, args: List[str]) -> str:
+    try:
+        p = deadlines.run_process(["git", *args], "git", cwd=str(root), env=dict(os.environ, GIT_TERMINAL_PROMPT="0"))
+    except (OSError, deadlines.DeadlineExceeded):
+        return ""
+    return p.stdout.decode("utf-8", "replace").strip() if p.returncode == 0 else ""
+
+
+def _probe_repo_parts(root: Path) -> Dict[str, Callable[[], str]]:
+    return {
+        "origin_url": lambda: _git_value(root, ["remote", "get-url", "origin"]),
+        "user_name": lambda: _git_value(root, ["config", "--get", "user.name"]),
+        "user_email": lambda: _git_value(root, ["config", "--get", "user.email"]),
+    }
+
+
+def _load_cache() -> Dict[str, Any]:
+    try:
+        data = json.loads(CACHE_PATH.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return {}
+    return data if isinstance(data, dict) and data.get("version") == CACHE_VERSION else {}
+
+
+def _save_cache(updates: Dict[str, Dict[str, Any]]) -> None:
+    """按对象合并写回（并行运行各写各的条目）；写失败不影响检查结果。"""
+    data = _load_cache()
+    data["version"] = CACHE_VERSION
+    entries = data.setdefault("entries", {})
+    entries.update(updates)
+    try:
+        CACHE_PATH.parent.mkdir(parents=True, exist_ok=True)
+        tmp = CACHE_PATH.with_name(f"{CACHE_PATH.name}.{os.getpid()}.tmp")
+        tmp.write_text(json.dumps(data, ensure_ascii=False, indent=1, sort_keys=True) + "\n", encoding="utf-8")
+        os.replace(tmp, CACHE_PATH)
+    except OSError:
+        pass
+
+
+def _cached(name: str, key: List[Any], disk: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    memo_key = (name.split(":", 1)[0], name)
+    hit = _memo.get(memo_key)
+    if hit and hit[0] == key:
+        return hit[1]
+    entry = (disk.get("entries") or {}).get(name)
+    if TTL_SECONDS > 0 and entry and entry.get("key") == key and time.time() - float(entry.get("checked") or 0) <= TTL_SECONDS:
+        METRICS.count("preflight_cached")
+        _memo[memo_key] = (key, entry["result"])
+        return entry["result"]
+    return None
+
+
+def check(root: Optional[Path] = None, key_path: Optional[Path] = None) -> Preflight:
+    """root（默认本仓库）和 key（默认 PRIVACY_PAGES_SSH_KEY）的检查结果；缓存失效的部分并行重新探测。"""
+    root = Path(root or REPO_ROOT)
+    key_path = Path(key_path or DEFAULT_KEY_PATH).expanduser()
+    agent_name, repo_name = f"agent:{key_path}", f"repo:{root}"
+    with _lock:
+        disk = _load_cache()
+        agent_key, repo_key = _agent_key(key_path), _repo_key(root)
+        agent = _cached(agent_name, agent_key, disk)
+        repo = _cached(repo_name, repo_key, disk)
+        if agent is None or repo is None:
+            METRICS.count("preflight_probes")
+            jobs: Dict[str, Callable[[], Any]] = {}
+            if agent is None:
+                jobs["agent"] = lambda: _probe_agent(key_path)
+            if repo is None:
+                jobs.update(_probe_repo_parts(root))
+            with ThreadPoolExecutor(max_workers=len(jobs), thread_name_prefix="preflight") as pool:
+                futures = {name: pool.submit(fn) for name, fn in jobs.items()}
+                done = {name: f.result() for name, f in futures.items()}
+            updates: Dict[str, Dict[str, Any]] = {}
+            now = time.time()
+            if agent is None:
+                agent = done["agent"]
+                _memo[("agent", agent_name)] = (agent_key, agent)
+                if agent["key_loaded"]:  # 未加载的不落盘，用户 ssh-add 之后下次运行立刻生效
+                    updates[agent_name] = {"key": agent_key, "checked": now, "result": agent}
+            if repo is None:
+                repo = {k: done[k] for k in _probe_repo_parts(root)}
+                _memo[("repo", repo_name)] = (repo_key, repo)
+                updates[repo_name] = {"key": repo_key, "checked": now, "result": repo}
+            if updates and TTL_SECONDS > 0:
+                _save_cache(updates)
+    return Preflight(key_path=str(key_path), **agent, **repo)
+
+
+def invalidate() -> None:
+    """丢掉所有缓存（进程内和磁盘上）。"""
+    with _lock:
+        _memo.clear()
+        try:
+            CACHE_PATH.unlink()
+        except OSError:
+            pass
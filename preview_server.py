@@ -0,0 +1,297 @@
+"""本地预览服务：发布前在浏览器里逐页检查，不写 pages/、不提交、不访问网络。
+
+按请求现渲染（muban.html 填充 -> render_html，与发布完全相同的代码），数据只来自本机已有的缓存：
+  1. 批次日志（.cache/journals，batch_journal）里已解析的订单；
+  2. 后台预取结果（.cache/prefetched.jsonl，不管是否过期）；
+  3. --records-file 给的已解析 CSV/JSONL（id, app, company, email）；
+  4. pages_manifest.json 记录的 source，以及已发布页面里内嵌的信息（privacy-page-meta）。
+前面的优先。这些文件变了（mtime）下一个请求自动重新加载；渲染结果放在 LRU 里，
+键里带模板指纹，改了 muban.html / 页面模板刷新即可看到新效果。
+
+路由：
+  /                  待审批次的目录（默认最近一个没推送完的批次；命令行给了订单号就列这些）
+  /p/<订单号或 slug>  渲染后的页面
+  /all               所有有缓存数据的订单
+
+用法：
+  python preview_server.py                        # http://127.0.0.1:8765/
+  python preview_server.py IGT1128 IGT1129 --port 9000
+  python preview_server.py --batch 4c929c5a994b --records-file resolved.jsonl
+"""
+
+from __future__ import annotations
+
+import argparse
+import html
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import unquote, urlsplit
+
+import googleSites
+import lark_prefetch
+import privacy_merge
+from batch_journal import JOURNAL_DIR, BatchJournal
+from googleSites import REPO_ROOT
+
+DEFAULT_PORT = 8765
+DEFAULT_CACHE_SIZE = 256
+SOURCE_FIELDS = ("app", "company", "email")
+
+INDEX_TEMPLATE = """<!doctype html>
+<html lang="zh-CN"><head><meta charset="utf-8"><title>{title}</title>
+<style>body{{font:14px/1.5 -apple-system,sans-serif;margin:24px}}table{{border-collapse:collapse}}
+td,th{{border:1px solid #ddd;padding:4px 8px;text-align:left}}tr.missing td{{color:#b00}}</style></head>
+<body><h1>{title}</h1><p>{summary}</p>
+<table><tr><th>#</th><th>订单号</th><th>App</th><th>公司</th><th>邮箱</th><th>进度</th><th>数据来源</th></tr>
+{rows}
+</table></body></html>
+"""
+
+
+class PreviewCatalog:
+    """订单号 -> app/company/email（附来源）；文件 mtime 变化时整体重新加载。"""
+
+    def __init__(self, batch: Optional[str] = None, ids: Optional[List[str]] = None, records_file: Optional[str] = None):
+        self.batch = batch
+        self.ids = [i.strip().upper() for i in ids or [] if i.strip()]
+        self.records_file = records_file
+        self._lock = threading.Lock()
+        self._stamp: Optional[Tuple] = None
+        self.sources: Dict[str, Dict[str, str]] = {}
+        self.slugs: Dict[str, str] = {}  # slug -> 订单号
+        self.journal: Optional[BatchJournal] = None
+
+    def _watched_paths(self) -> List[Path]:
+        paths = [lark_prefetch.PREFETCH_PATH, REPO_ROOT / googleSites.MANIFEST_NAME, JOURNAL_DIR]
+        if JOURNAL_DIR.exists():
+            paths += sorted(JOURNAL_DIR.glob("*.jsonl"))
+        if self.records_file:
+            paths.append(Path(self.records_file).expanduser())
+        return paths
+
+    def _current_stamp(self) -> Tuple:
+        stamp = []
+        for p in self._watched_paths():
+            try:
+                stamp.append((str(p), p.stat().st_mtime_ns))
+            except OSError:
+                stamp.append((str(p), None))
+        return tuple(stamp)
+
+    def _load_journal(self) -> Optional[BatchJournal]:
+        if self.batch:
+            path = JOURNAL_DIR / f"{self.batch}.jsonl"
+            return BatchJournal.load(path) if path.exists() else None
+        return BatchJournal.find(self.ids or None)
+
+    def _load(self) -> None:
+        sources: Dict[str, Dict[str, str]] = {}
+        slugs: Dict[str, str] = {}
+
+        def _add(oid: str, row: Dict[str, Any], origin: str) -> None:
+            oid = (oid or "").strip().upper()
+            if oid and oid not in sources and all(row.get(k) for k in SOURCE_FIELDS):
+                sources[oid] = {**{k: str(row[k]) for k in SOURCE_FIELDS}, "origin": origin}
+
+        try:
+            self.journal = self._load_journal()
+        except (OSError, ValueError):
+            self.journal = None
+        if self.journal:
+            for oid, entry in self.journal.entries.items():
+                _add(oid, entry, f"批次 {self.journal.batch_id}")
+        for oid, row in lark_prefetch.load_prefetched().items():
+            _add(oid, row, "预取")
+        if self.records_file:
+            try:
+                kind, data = privacy_merge.load_records_file(self.records_file)
+            except (OSError, ValueError) as e:
+                print(f"⚠️ 读取 {self.records_file} 失败: {e}")
+            else:
+                if kind == "resolved":
+                    for oid, row in data.items():
+                        _add(oid, row, "records 文件")
+                else:
+                    print(f"⚠️ {self.records_file} 是原始 records（需要联网抓 doc），预览只用已解析的 CSV/JSONL")
+        manifest = googleSites.load_manifest()
+        for slug, entry in manifest["pages"].items():
+            oid = (entry.get("id") or googleSites.decode_id_from_slug(slug)).upper()
+            slugs[slug] = oid
+            source = entry.get("source")
+            if not source and oid not in sources:
+                try:
+                    root = googleSites.TARGETS_WORK_DIR / entry["target"] if entry.get("target") else REPO_ROOT
+                    rel_dir = (entry.get("path") or googleSites.page_rel_dir(slug)).rstrip("/")
+                    doc = (root / rel_dir / "index.html").read_text(encoding="utf-8", errors="replace")
+                    source = googleSites.read_page_meta(doc)
+                except OSError:
+                    source = None
+            if source:
+                _add(oid, source, "已发布页面")
+        self.sources, self.slugs = sources, slugs
+
+    def refresh(self) -> None:
+        with self._lock:
+            stamp = self._current_stamp()
+            if stamp != self._stamp:
+                self._load()
+                self._stamp = stamp
+
+    def resolve(self, key: str) -> Tuple[str, Optional[Dict[str, str]]]:
+        """订单号或 slug -> (订单号, source)；没有缓存数据时 source 为 None。"""
+        self.refresh()
+        key = key.strip().strip("/")
+        oid = self.slugs.get(key) or key.upper()
+        if oid not in self.sources and "-" in key:
+            oid = googleSites.decode_id_from_slug(key).upper() or oid
+        return oid, self.sources.get(oid)
+
+    def pending_ids(self) -> List[str]:
+        self.refresh()
+        if self.ids:
+            return list(self.ids)
+        if self.journal:
+            return list(self.journal.ids)
+        return []
+
+
+class PageCache:
+    """渲染结果的 LRU：键为 (订单号, app, company, email, 模板指纹)。"""
+
+    def __init__(self, size: int = DEFAULT_CACHE_SIZE):
+        self.size = max(1, size)
+        self._lock = threading.Lock()
+        self._pages: "OrderedDict[Tuple[str, ...], bytes]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, oid: str, source: Dict[str, str]) -> bytes:
+        key = (oid,) + tuple(source[k] for k in SOURCE_FIELDS) + (googleSites.template_fingerprint(),)
+        with self._lock:
+            data = self._pages.get(key)
+            if data is not None:
+                self._pages.move_to_end(key)
+                self.hits += 1
+                return data
+        data = render_preview(oid, source)  # 锁外渲染：并发请求不互相等
+        with self._lock:
+            self.misses += 1
+            self._pages[key] = data
+            self._pages.move_to_end(key)
+            while len(self._pages) > self.size:
+                self._pages.popitem(last=False)
+        return data
+
+
+def render_preview(oid: str, source: Dict[str, str]) -> bytes:
+    """与发布相同的渲染，只是样式内联（不依赖 assets/ 下的文件）。"""
+    text = privacy_merge.render_privacy_text(source["app"], source["company"], source["email"])
+    page = googleSites.PageData(title=source["app"], content=text)
+    meta = googleSites.build_page_meta(page, raw_id=oid, source=source)
+    return googleSites.render_html(page, meta=meta).encode("utf-8")
+
+
+def render_index(catalog: PreviewCatalog, ids: List[str], title: str) -> bytes:
+    rows = []
+    for n, oid in enumerate(ids, 1):
+        source = catalog.sources.get(oid)
+        stage = (catalog.journal.stage_of(oid) if catalog.journal else None) or "-"
+        cells = [html.escape(str(n))]
+        if source:
+            cells.append(f'<a href="/p/{html.escape(oid, quote=True)}">{html.escape(oid)}</a>')
+            cells += [html.escape(source[k]) for k in SOURCE_FIELDS]
+        else:
+            cells += [html.escape(oid), "没有缓存数据", "", ""]
+        cells += [html.escape(stage), html.escape(source["origin"] if source else "-")]
+        cls = "" if source else ' class="missing"'
+        rows.append(f"<tr{cls}>" + "".join(f"<td>{c}</td>" for c in cells) + "</tr>")
+    found = sum(1 for oid in ids if catalog.sources.get(oid))
+    summary = f"{len(ids)} 个订单，{found} 个可预览；模板 {googleSites.template_fingerprint()}"
+    if not ids:
+        summary = "没有待审的批次（命令行给订单号，或 --batch 指定批次）；<a href=\"/all\">查看所有有缓存数据的订单</a>"
+    return INDEX_TEMPLATE.format(title=html.escape(title), summary=summary, rows="\n".join(rows)).encode("utf-8")
+
+
+def make_server(catalog: PreviewCatalog, cache: PageCache, host: str = "127.0.0.1", port: int = DEFAULT_PORT) -> ThreadingHTTPServer:
+    class _Handler(BaseHTTPRequestHandler):
+        def log_message(self, *args):  # 静默
+            pass
+
+        def _send(self, code: int, data: bytes, content_type: str = "text/html; charset=utf-8") -> None:
+            self.send_response(code)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(data)))
+            self.send_header("Cache-Control", "no-store")
+            self.end_headers()
+            if self.command != "HEAD":
+                self.wfile.write(data)
+
+        def do_GET(self):
+            path = unquote(urlsplit(self.path).path)
+            try:
+                if path in ("/", "/index.html"):
+                    ids = catalog.pending_ids()
+                    batch = f"批次 {catalog.journal.batch_id}" if catalog.journal and not catalog.ids else "待审订单"
+                    self._send(200, render_index(catalog, ids, f"预览：{batch}"))
+                elif path == "/all":
+                    catalog.refresh()
+                    self._send(200, render_index(catalog, sorted(catalog.sources), "预览：所有有缓存数据的订单"))
+                elif path.startswith("/p/"):
+                    oid, source = catalog.resolve(path[3:])
+                    if not source:
+                        msg = f"{oid}: 本机没有缓存的 app/company/email（先跑一次 --prefetch，或用 --records-file）"
+                        self._send(404, html.escape(msg).encode("utf-8"))
+                        return
+                    self._send(200, cache.get(oid, source))
+                elif path == "/favicon.ico":
+                    self._send(204, b"", "image/x-icon")
+                else:
+                    self._send(404, b"not found", "text/plain; charset=utf-8")
+            except Exception as e:  # 渲染失败只影响这一页
+                self._send(500, html.escape(f"{type(e).__name__}: {e}").encode("utf-8"))
+
+        do_HEAD = do_GET
+
+    return ThreadingHTTPServer((host, port), _Handler)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Local preview server: render pages on demand from cached metadata, no git/network.")
+    parser.add_argument("ids", nargs="*", help="Order IDs to list on the index (default: the latest unfinished batch)")
+    parser.add_argument("--batch", help="Batch ID under .cache/journals to list on the index")
+    parser.add_argument("--records-file", help="Extra resolved CSV/JSONL (id, app, company, email)")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=int(os.environ.get("PRIVACY_PREVIEW_PORT") or DEFAULT_PORT))
+    parser.add_argument("--cache-size", type=int, default=DEFAULT_CACHE_SIZE, help="Rendered pages kept in memory (LRU)")
+    args = parser.parse_args()
+
+    catalog = PreviewCatalog(batch=args.batch, ids=args.ids, records_file=args.records_file)
+    started = time.monotonic()
+    catalog.refresh()
+    pending = catalog.pending_ids()
+    print(f"📚 已加载 {len(catalog.sources)} 个订单的缓存数据（{time.monotonic() - started:.2f}s），待审 {len(pending)} 个")
+    cache = PageCache(args.cache_size)
+    try:
+        server = make_server(catalog, cache, args.host, args.port)
+    except OSError as e:
+        print(f"❌ 无法监听 {args.host}:{args.port}: {e}")
+        return 1
+    host, port = server.server_address[:2]
+    print(f"👀 预览: http://{host}:{port}/   （Ctrl+C 退出）")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print(f"\n👋 已退出（渲染 {cache.misses} 次，缓存命中 {cache.hits} 次）")
+    finally:
+        server.server_close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -3,9 +3,9 @@ from __future__ import annotations
 import html
 import sys
 import urllib
-import subprocess
 import os
-from typing import Optional, List, Tuple, Dict, Any
+import tempfile
+from typing import Optional, List, Tuple, Dict, Any, Iterator
 
 import requests
 import time
@@ -17,22 +17,89 @@ import json
 import re
 from io import BytesIO
 from pathlib import Path
-from DrissionPage import Chromium
+import contextlib
+import csv
+import shutil
+from dataclasses import dataclass
+from concurrent.futures import ThreadPoolExecutor
+
+import deadlines
+import lark_bitable
+import lark_browser
+import lark_http
+import preflight
+from batch_journal import BatchJournal
+from deadlines import CommandTimeout, DeadlineExceeded, exit_on_timeout
+from memprof import MemoryReport
+from records_index import RecordsIndex
+from run_metrics import METRICS, record_run
+from run_trace import TRACER
+from records_index import extract_company_from_text as _extract_company_from_text
 
 table_url = "https://superxgr.larksuite.com/base/SebGbrq2yaNXXSsVOcJudpzxsCf?table=tblTywpT1yCgOaV7&view=vewOnkM00z"
 api_keyword = "SebGbrq2yaNXXSsVOcJudpzxsCf/records"
-browser = None
-browser_port = 9527
-cookies_str = ""
-app_name: str = ""
-company_name: str = ""
-email: str = ""
+browser_port = lark_browser.BROWSER_PORT
+
+# 登录检测：Lark 网页端登录成功后才会有的 Cookie（任意一个出现即视为已登录）
+LOGIN_COOKIE_NAMES = ("session", "session_list")
+# 轮询间隔：每次最多等这么久的 records 请求，然后检查一次 Cookie
+LOGIN_POLL_SECONDS = 1.0
+# 登录后这么久还停在登录页（没有自动跳回表格）才主动打开一次表格页
+LOGIN_REDIRECT_GRACE_SECONDS = 5.0
+
+# records 数据源：browser = 监听网页端 records 接口（扫码登录）；bitable = 开放平台 Bitable API（见 lark_bitable.py）
+RECORDS_SOURCES = ("browser", "bitable")
 
 # 用于 finally 安全退出
 driver = None
 
-# 生成并发布静态页需要的输出文件
-PRIVACY_TEXT_OUT = Path(__file__).resolve().parent / "privacy_text.txt"
+# --mem-report 时开启；默认关闭（no-op）
+mem_report = MemoryReport(enabled=False)
+
+
+@contextlib.contextmanager
+def _stage(name: str) -> Iterator[None]:
+    """阶段计时写入运行指标（.cache/metrics.jsonl）；开了 --mem-report 时同时记内存。"""
+    with METRICS.stage(name), mem_report.stage(name):
+        yield
+
+
+@dataclass
+class RunContext:
+    """一次运行的全部状态（原来的模块全局变量 app_name / company_name / email / browser）。
+
+    with RunContext(...) as ctx: 进入时创建本次运行独享的临时目录（ctx.workspace），退出时删除；
+    同一台机器上并行的多次运行互不覆盖对方的文本文件。
+    """
+
+    publish_id: str = ""
+    app_name: str = ""
+    company_name: str = ""
+    email: str = ""
+    cookies: str = ""
+    browser: Any = None
+    workspace: Optional[Path] = None
+
+    def __enter__(self) -> "RunContext":
+        if self.workspace is None:
+            self.workspace = Path(tempfile.mkdtemp(prefix="privacy-run-"))
+        return self
+
+    def __exit__(self, *exc) -> None:
+        if self.workspace is not None:
+            shutil.rmtree(self.workspace, ignore_errors=True)
+            self.workspace = None
+
+    @property
+    def privacy_text_path(self) -> Path:
+        """发布用的纯文本（原来固定写在仓库根目录的 privacy_text.txt）。"""
+        if self.workspace is None:
+            raise RuntimeError("RunContext 未进入（请使用 with RunContext() as ctx）")
+        return self.workspace / "privacy_text.txt"
+
+
+# 保存的 Lark 会话（records 接口 URL + Cookie），--watch 复用
+LARK_SESSION_PATH = Path(__file__).resolve().parent / ".cache" / "lark_session.json"
 
 # muban.html 模板路径（内容固定，只替换少量字段）
 MUBAN_TEMPLATE_PATH = Path(__file__).resolve().parent / "muban.html"
@@ -150,33 +217,90 @@ def html_to_formatted_text(html_fragment: str) -> str:
     return text
 
 
-def get_gzip_json_from_api(timeout: int = 60):
-    """
-    1. 监听接口捕获动态参数。
-    2. 手动扫码登录，刷新页面触发接口。
-    3. 修改捕获到的 URL，设置 offset=0。
-    4. 提取 Cookies，使用 requests 库重新发送请求。
-    5. 解析响应，解压 Gzip 数据。
-    """
-    global browser
-    if browser is None:
-        browser = Chromium(browser_port)
+def _has_login_cookie(tab) -> bool:
+    try:
+        return any(c.get("name") in LOGIN_COOKIE_NAMES and c.get("value") for c in tab.cookies())
+    except Exception:
+        return False
 
-    tab = browser.latest_tab
-    tab.get(table_url)
-    print(f"🔍 开始监听接口: {api_keyword}")
-    tab.listen.start(api_keyword)
 
-    input("请扫码登录并按 Enter 继续 >>> ")
-    tab.refresh()  # 触发接口请求
+def _is_authenticated_packet(packet) -> bool:
+    """未登录时 records 接口可能也会发出（401/403 等），只接受 200 的响应。"""
+    resp = getattr(packet, "response", None)
+    status = getattr(resp, "status", None) if resp is not None else None
+    return status is None or status == 200
 
-    print(f"🔎 开始捕获接口请求...")
-    # 等待接口触发
-    req = tab.listen.wait(timeout=timeout)
-    tab.listen.stop()  # 捕获到后停止监听
+
+def _wait_for_records_request(tab, timeout: float = 60):
+    """等页面发出第一个已登录的 records 请求；没登录时提示扫码，登录完成自动继续（不需要按 Enter）。
+
+    登录检测靠 Cookie（LOGIN_COOKIE_NAMES）。扫码后 Lark 会自己跳回表格页并发出 records 请求；
+    如果登录后一段时间还停在别的页面，才主动打开一次表格页。登录前最多等 login 阶段上限，
+    登录后最多再等 timeout 秒。返回捕获到的数据包，超时返回 None。
+    """
+    end = time.monotonic() + deadlines.timeout_for("login")
+    table_path = urllib.parse.urlparse(table_url).path
+    logged_in_at: Optional[float] = None
+    prompted = navigated = False
+    while True:
+        now = time.monotonic()
+        if now >= end or (logged_in_at is not None and now - logged_in_at >= timeout):
+            print("❌ 未捕获到 records 接口请求（" + ("已登录，但表格页没有发出请求" if logged_in_at else "等待扫码登录超时") + "）")
+            return None
+        packet = tab.listen.wait(timeout=min(LOGIN_POLL_SECONDS, end - now))
+        if packet and _is_authenticated_packet(packet):
+            return packet
+        if logged_in_at is None:
+            if _has_login_cookie(tab):
+                logged_in_at = time.monotonic()
+                print("✅ 检测到已登录，等待表格发出 records 请求...")
+            elif not prompted:
+                print("📱 请在浏览器里扫码登录（登录完成后自动继续，无需按 Enter）")
+                prompted = True
+        elif (
+            not navigated
+            and time.monotonic() - logged_in_at >= LOGIN_REDIRECT_GRACE_SECONDS
+            and table_path not in (tab.url or "")
+        ):
+            print("↪️ 登录后没有回到表格页，打开一次表格页")
+            tab.get(table_url, timeout=deadlines.timeout_for("browser_wait"))
+            navigated = True
+
+
+def capture_records_session(timeout: int = 60, ctx: Optional[RunContext] = None) -> Optional[Tuple[str, str]]:
+    """打开浏览器、扫码登录（自动检测登录完成），捕获 records 接口 URL（offset=0）和 Cookie。
+
+    浏览器句柄保存在 ctx.browser（同一次运行里复用）；不传 ctx 时每次连接一次浏览器。
+    """
+    ctx = ctx or RunContext()
+    if ctx.browser is None:
+        # 持久化 profile；端口上已有浏览器就直接连上；保存过登录会话时无头启动
+        ctx.browser = lark_browser.launch(browser_port, headless=lark_browser.headless_preferred(load_lark_session() is not None))
+
+    for attempt in range(2):
+        tab = ctx.browser.latest_tab
+        lark_browser.prepare_tab(tab)
+        # 先开始监听再打开页面：已登录时页面自己发出的第一个 records 请求就能被捕获，不用再刷新
+        print(f"🔍 开始监听接口: {api_keyword}")
+        tab.listen.start(api_keyword)
+        req = None
+        try:
+            tab.get(table_url, timeout=deadlines.timeout_for("browser_wait"))
+            # 无头浏览器里没法扫码
+            needs_headed = lark_browser.is_headless(tab) and not _has_login_cookie(tab)
+            if not needs_headed:
+                req = _wait_for_records_request(tab, timeout)
+        finally:
+            tab.listen.stop()  # 捕获到后停止监听
+        if not needs_headed:
+            break
+        if attempt:
+            print("❌ 浏览器仍是无头模式且未登录，无法扫码（检查 PRIVACY_BROWSER_HEADLESS）")
+            return None
+        print("🔑 保存的登录已失效，打开有界面的浏览器扫码登录（同一个 profile）")
+        ctx.browser = lark_browser.relaunch_headed(ctx.browser, browser_port)
 
     if not req:
-        print(f"❌ {timeout} 秒内未捕获到接口请求。")
         return None
 
     # --- 1. 获取原始 URL 并修改 offset ---
@@ -194,8 +318,6 @@ def get_gzip_json_from_api(timeout: int = 60):
     new_query_string = urllib.parse.urlencode(query_params, doseq=True)
     new_url = urllib.parse.urlunparse(parsed_url._replace(query=new_query_string))
 
-    print(f"🔄 正在用修改后的 URL (后台请求): {new_url}")
-
     # --- 2. 提取已登录的 Cookies ---
     current_cookies = tab.cookies()
 
@@ -204,54 +326,272 @@ def get_gzip_json_from_api(timeout: int = 60):
         [f"{cookie['name']}={cookie['value']}" for cookie in current_cookies]
     )
 
+    # 保存会话，供 --watch 等后续运行直接复用（不再扫码）
+    save_lark_session(new_url, cookies_str)
+    return new_url, cookies_str
+
+
+def get_gzip_json_from_api(timeout: int = 60, ctx: Optional[RunContext] = None):
+    """
+    1. 先监听接口再打开表格页，捕获动态参数。
+    2. 未登录时扫码；登录完成自动检测，捕获页面发出的第一个 records 请求（不刷新、不按 Enter）。
+    3. 修改捕获到的 URL，设置 offset=0。
+    4. 提取 Cookies，使用 requests 库重新发送请求。
+    5. 解析响应，解压 Gzip 数据。
+    """
+    session = capture_records_session(timeout=timeout, ctx=ctx)
+    if not session:
+        return None
+    new_url, cookies_str = session
+
+    records_json = fetch_records(new_url, cookies_str, timeout=timeout)
+    if records_json is None:
+        return None
+    return records_json, cookies_str
+
+
+def save_lark_session(records_url: str, cookies_str: str) -> None:
+    """把 records 接口 URL + Cookie 存到 .cache/lark_session.json（仅本机可读）。"""
+    try:
+        LARK_SESSION_PATH.parent.mkdir(parents=True, exist_ok=True)
+        tmp = LARK_SESSION_PATH.with_suffix(".tmp")
+        tmp.write_text(
+            json.dumps({"records_url": records_url, "cookies": cookies_str, "saved_at": time.time()}),
+            encoding="utf-8",
+        )
+        try:
+            os.chmod(tmp, 0o600)
+        except OSError:
+            pass
+        os.replace(tmp, LARK_SESSION_PATH)
+    except OSError as e:
+        print(f"⚠️ 保存 Lark 会话失败（可忽略）: {e}")
+
+
+def load_lark_session() -> Optional[Tuple[str, str]]:
+    try:
+        data = json.loads(LARK_SESSION_PATH.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
+    url, cookies = data.get("records_url"), data.get("cookies")
+    if not url or not cookies:
+        return None
+    return url, cookies
+
+
+def fetch_records(records_url: str, cookies_str: str, timeout: int = 60):
+    """用已登录的 Cookie 请求 records 接口并解压；失败返回 None。"""
+    print(f"🔄 正在用修改后的 URL (后台请求): {records_url}")
+
     # 设置 headers，带上 cookies
     headers = {"Cookie": cookies_str}
 
     # --- 3. 使用 requests 发送请求 ---
-    try:
-        response = requests.get(new_url, headers=headers, timeout=timeout)
-    except requests.exceptions.RequestException as e:
-        print(f"❌ 请求失败: {e}")
-        return None
+    with _stage("records.fetch"):
+        try:
+            response = lark_http.lark_get(records_url, headers=headers, timeout=timeout)
+        except requests.exceptions.RequestException as e:
+            print(f"❌ 请求失败: {e}")
+            return None
 
-    # --- 4. 检查和提取响应体 ---
+        # --- 4. 检查和提取响应体 ---
 
-    if response.status_code != 200:
-        print(f"❌ 重新请求失败！HTTP 状态码: {response.status_code}")
+        if response.status_code != 200:
+            print(f"❌ 重新请求失败！HTTP 状态码: {response.status_code}")
+            return None
+
+        if not response.content:
+            print(f"❌ 重新请求成功 (200)，但响应体为空。")
+            return None
+
+        # 只保留 data.records 的 base64 字符串，响应对象（原始字节 + 解析后的 JSON）立即释放
+        gzip_base64_str = extract_records_blob(response.content)
+        del response
+
+    if gzip_base64_str is None:
         return None
 
-    resp_body_text = response.text
+    # --- 5. Gzip 解压 + 解析 JSON ---
+    with _stage("records.decode"):
+        records_json = inflate_records_blob(gzip_base64_str)
+        del gzip_base64_str
 
-    if not resp_body_text:
-        print(f"❌ 重新请求成功 (200)，但响应体为空。")
+    if records_json is None:
         return None
 
-    # --- 5. 解析 JSON 和 Gzip 解压 ---
+    print("✅ 成功解压 JSON 数据！")
+    return records_json
 
+
+def extract_records_blob(resp_body) -> Optional[str]:
+    """响应体（str/bytes）-> data.records 的 gzip base64 字符串；失败时打印原因并返回 None。"""
     try:
-        resp_json = json.loads(resp_body_text)
+        resp_json = json.loads(resp_body)
     except Exception as e:
-        print(f"⚠️ 响应不是合法 JSON：{e}\n原始内容: {resp_body_text[:200]}")
+        print(f"⚠️ 响应不是合法 JSON：{e}\n原始内容: {resp_body[:200]!r}")
         return None
 
-    # 提取 gzip Base64 数据
     try:
-        gzip_base64_str = resp_json["data"]["records"]
-    except KeyError:
+        blob = resp_json["data"]["records"]
+    except (KeyError, TypeError):
         print("❌ 未找到 data.records 字段，请检查返回结构。")
         return None
+    return blob
+
+
+def inflate_records_blob(gzip_base64_str: str):
+    """gzip base64 -> records JSON。
 
+    每一步用完立即丢弃上一步的缓冲区（base64 解码后的 gzip 字节、解压后的 JSON 文本），
+    解压出来的 bytes 在 decode 后即释放，同一时刻最多只有一份整串存活。
+    """
     try:
         gzip_bytes = base64.b64decode(gzip_base64_str)
-        with gzip.GzipFile(fileobj=BytesIO(gzip_bytes)) as f:
-            decompressed_data = f.read().decode("utf-8")
+        METRICS.count("records_bytes", len(gzip_bytes))
+        decompressed_data = gzip.decompress(gzip_bytes).decode("utf-8")
+        del gzip_bytes
         records_json = json.loads(decompressed_data)
+        del decompressed_data
     except Exception as e:
         print(f"❌ 解压或解析失败: {e}")
         return None
+    if isinstance(records_json, dict):
+        METRICS.count("records_decoded", len(records_json.get("recordMap") or {}))
+    return records_json
 
-    print("✅ 成功解压 JSON 数据！")
-    return records_json, cookies_str
+
+def decode_records_response(resp_body_text: str):
+    """解析 records 接口的响应体：JSON -> data.records(gzip base64) -> 解压后的 records JSON。
+
+    从 get_gzip_json_from_api() 拆出来，便于离线复用（例如 bench_privacy.py）。
+    失败时打印原因并返回 None。
+    """
+    blob = extract_records_blob(resp_body_text)
+    if blob is None:
+        return None
+    return inflate_records_blob(blob)
+
+
+# 预先解析好的行（id, app, company, email）支持的列名别名
+_RESOLVED_COLUMNS = {
+    "id": ("id", "order_id", "publish_id"),
+    "app": ("app", "app_name"),
+    "company": ("company", "company_name"),
+    "email": ("email",),
+}
+
+
+def _normalize_resolved_row(row: Dict[str, Any]) -> Optional[Dict[str, str]]:
+    out: Dict[str, str] = {}
+    for key, aliases in _RESOLVED_COLUMNS.items():
+        for a in aliases:
+            v = row.get(a)
+            if v not in (None, ""):
+                out[key] = str(v).strip()
+                break
+        else:
+            out[key] = ""
+    rid = _standardize_id(out["id"])
+    if not rid:
+        return None
+    out["id"] = rid
+    return out
+
+
+def _looks_like_resolved_row(obj: Any) -> bool:
+    return isinstance(obj, dict) and any(a in obj for a in _RESOLVED_COLUMNS["id"]) and any(
+        a in obj for a in _RESOLVED_COLUMNS["app"]
+    )
+
+
+def _parse_resolved_rows(text: str) -> Optional[Dict[str, Dict[str, str]]]:
+    """尝试按 JSONL 或 CSV（带表头）解析预先解析好的行；都不是则返回 None。"""
+    lines = [ln for ln in text.splitlines() if ln.strip()]
+    if not lines:
+        return None
+
+    rows: List[Dict[str, Any]] = []
+    if lines[0].lstrip().startswith("{"):
+        try:
+            rows = [json.loads(ln) for ln in lines]
+        except ValueError:
+            return None
+        if not all(_looks_like_resolved_row(r) for r in rows):
+            return None
+    else:
+        reader = csv.DictReader(lines)
+        header = [h.strip().lower() for h in (reader.fieldnames or [])]
+        if not _looks_like_resolved_row({h: "" for h in header}):
+            return None
+        reader.fieldnames = header
+        rows = list(reader)
+
+    resolved: Dict[str, Dict[str, str]] = {}
+    for r in rows:
+        nr = _normalize_resolved_row(r)
+        if nr:
+            resolved[nr["id"]] = nr
+    return resolved
+
+
+def load_records_file(path: str) -> Tuple[str, Any]:
+    """从本地文件（或 '-' 表示 stdin）读取 records，自动识别格式：
+
+      - 接口原始响应（JSON，含 data.records 的 gzip base64）
+      - 已解压的 records JSON
+      - gzip base64 文本，或原始 gzip 文件
+      - 预先解析好的 CSV/JSONL：(id, app, company, email)
+
+    返回 ("records", records_json) 或 ("resolved", {id: {id, app, company, email}})；
+    无法识别时抛 ValueError。
+    """
+    if path == "-":
+        raw = sys.stdin.buffer.read()
+    else:
+        raw = Path(path).expanduser().read_bytes()
+
+    if raw[:2] == b"\x1f\x8b":
+        raw = gzip.decompress(raw)
+
+    text = raw.decode("utf-8-sig")
+    del raw
+    stripped = text.strip()
+    if not stripped:
+        raise ValueError("records 文件为空")
+
+    if stripped[0] in "{[":
+        try:
+            obj = json.loads(stripped)
+        except ValueError:
+            obj = None
+        if obj is not None:
+            if isinstance(obj, dict) and isinstance((obj.get("data") or {}).get("records"), str):
+                tree = inflate_records_blob(obj["data"]["records"])
+                if tree is None:
+                    raise ValueError("data.records 解压失败")
+                return "records", tree
+            if _looks_like_resolved_row(obj) or (
+                isinstance(obj, list) and obj and all(_looks_like_resolved_row(r) for r in obj)
+            ):
+                rows = obj if isinstance(obj, list) else [obj]
+                resolved = {}
+                for r in rows:
+                    nr = _normalize_resolved_row(r)
+                    if nr:
+                        resolved[nr["id"]] = nr
+                return "resolved", resolved
+            return "records", obj
+
+    resolved = _parse_resolved_rows(text)
+    if resolved is not None:
+        return "resolved", resolved
+
+    if re.fullmatch(r"[A-Za-z0-9+/=\s]+", stripped):
+        tree = inflate_records_blob(re.sub(r"\s+", "", stripped))
+        if tree is not None:
+            return "records", tree
+
+    raise ValueError("无法识别 records 文件格式（支持：接口响应 / records JSON / gzip base64 / CSV / JSONL）")
 
 
 try:
@@ -294,13 +634,41 @@ def _decode_bytes(b: Optional[bytes]) -> str:
         return b.decode(errors="replace")
 
 
-def _run_capture(cmd: List[str], *, env: Optional[Dict[str, str]] = None, cwd: Optional[str] = None) -> Tuple[int, str, str]:
-    """Run a command and capture stdout/stderr safely (bytes -> utf-8 replace)."""
-    p = subprocess.run(cmd, env=env, cwd=cwd, capture_output=True)
+def _run_capture(
+    cmd: List[str],
+    *,
+    env: Optional[Dict[str, str]] = None,
+    cwd: Optional[str] = None,
+    stage: str = "cmd",
+) -> Tuple[int, str, str]:
+    """Run a command and capture stdout/stderr safely (bytes -> utf-8 replace).
+
+    Bounded by the stage timeout and the run budget (deadlines.py). A timed-out command is
+    killed with its whole process group and reported as exit code 124.
+    """
+    try:
+        p = deadlines.run_process(cmd, stage, env=env, cwd=cwd)
+    except CommandTimeout as e:
+        print(f"⏱️ {e}")
+        return deadlines.TIMEOUT_EXIT_CODE, _decode_bytes(e.stdout), _decode_bytes(e.stderr) + f"\n{e}"
+    return p.returncode, _decode_bytes(p.stdout), _decode_bytes(p.stderr)
+
+
+def _run_googlesites(cmd: List[str], env: Dict[str, str]) -> Tuple[int, str, str]:
+    """拉起 googleSites.py：子进程继承本次运行的截止时间，父进程多等 KILL_GRACE_SECONDS 让它先自己报告超时。"""
+    cap = deadlines.stage_limit("publish")
+    rem = deadlines.remaining()
+    if rem != float("inf"):
+        cap = min(cap, rem + deadlines.KILL_GRACE_SECONDS)
+    try:
+        p = deadlines.run_process(cmd, "publish", env=deadlines.child_env(env), cap=cap)
+    except CommandTimeout as e:
+        print(f"⏱️ googleSites.py {e}")
+        return deadlines.TIMEOUT_EXIT_CODE, _decode_bytes(e.stdout), _decode_bytes(e.stderr)
     return p.returncode, _decode_bytes(p.stdout), _decode_bytes(p.stderr)
 
 
-def ensure_github_ssh_keychain_ready(key_path: str = "~/.ssh/id_ed25519_common_hosts") -> None:
+def ensure_github_ssh_keychain_ready(key_path: Optional[str] = None) -> None:
     """Teammate-friendly: don't spam `ssh-add` output and don't block on passphrase.
 
     We only *check* whether key is loaded. If not loaded, we print a one-time hint.
@@ -308,25 +676,11 @@ def ensure_github_ssh_keychain_ready(key_path: str = "~/.ssh/id_ed25519_common_h
       ssh-add --apple-use-keychain ~/.ssh/id_ed25519_common_hosts
     """
 
-    def _pub_key_body(pub_text: str) -> str:
-        parts = (pub_text or "").strip().split()
-        return parts[1] if len(parts) >= 2 else ""
-
     try:
-        kp = Path(key_path).expanduser()
-        if not kp.exists():
-            return
-
-        pub_path = Path(str(kp) + ".pub")
-        if not pub_path.exists():
-            return
-
-        want_body = _pub_key_body(pub_path.read_text(encoding="utf-8"))
-        if not want_body:
-            return
-
-        ret, out, _err = _run_capture(["ssh-add", "-L"])
-        if ret == 0 and want_body in (out or ""):
+        kp = Path(key_path).expanduser() if key_path else preflight.DEFAULT_KEY_PATH
+        # 同时探测 origin / git config 并写入缓存，拉起的 googleSites.py 直接复用（见 preflight.py）
+        checked = preflight.check(key_path=kp)
+        if not checked.key_exists or checked.key_loaded or not Path(str(kp) + ".pub").exists():
             return
 
         print(
@@ -339,28 +693,14 @@ def ensure_github_ssh_keychain_ready(key_path: str = "~/.ssh/id_ed25519_common_h
         pass
 
 
-def _run_git_push_main_with_env() -> None:
-    """Best-effort fallback push using the preferred SSH host alias.
+def _uses_git_backend() -> bool:
+    """googleSites.py 的发布后端是否为 git（PRIVACY_PUBLISH_BACKEND，见 publish_backends.py）。"""
+    return (os.environ.get("PRIVACY_PUBLISH_BACKEND") or "git").strip().lower() == "git"
 
-    Note: We do NOT pass '-i key' here to avoid interactive passphrase prompts.
-    Use ssh-agent+Keychain for non-interactive use.
-    """
-    env = os.environ.copy()
-    env.setdefault("PRIVACY_PAGES_SSH_HOST", "github-common-hosts")
 
-    env["GIT_SSH_COMMAND"] = (
-        "ssh -o BatchMode=yes -o IdentitiesOnly=yes "
-        "-o StrictHostKeyChecking=accept-new "
-        "-o ControlMaster=auto -o ControlPersist=10m -o ControlPath=~/.ssh/cm-%r@%h:%p"
-    )
-
-    repo_root = Path(__file__).resolve().parent
-
-    # push regardless of status (commit may already exist)
-    subprocess.run(["git", "push", "origin", "main"], cwd=str(repo_root), env=env, check=False)
-
-
-def publish_privacy_page_to_github(app_title: str, publish_id: str, content_file: Path) -> str:
+def publish_privacy_page_to_github(
+    app_title: str, publish_id: str, content_file: Path, company: str = "", email_addr: str = ""
+) -> str:
     """Call googleSites.py to generate & push pages/<slug>/index.html.
 
     Return: published page URL (best-effort parsed).
@@ -385,8 +725,11 @@ def publish_privacy_page_to_github(app_title: str, publish_id: str, content_file
         f"Publish privacy page: {safe_title}",
         "--no-wait",
     ]
+    if company and email_addr:
+        # 记进 pages_manifest.json，catalog_audit.py 用它按当前模板重新渲染核对
+        cmd += ["--company", company, "--email", email_addr]
 
-    rc, stdout, stderr = _run_capture(cmd, env=env)
+    rc, stdout, stderr = _run_googlesites(cmd, env)
     combined = (stdout or "") + ("\n" + (stderr or "") if stderr else "")
 
     if combined.strip():
@@ -396,17 +739,87 @@ def publish_privacy_page_to_github(app_title: str, publish_id: str, content_file
 
     m = re.search(r"(https?://[^\s]+/pages/[^\s]+/)", combined)
     page_url = m.group(1) if m else ""
+    METRICS.outcome("publish", "ok" if rc == 0 else "failed")
 
-    if rc != 0:
+    if rc != 0 and _uses_git_backend():
+        # 走 googleSites.py --push-only：当前分支、部署分支快照、git 锁都和正常发布一致
         print("⚠️ googleSites.py 返回非 0，尝试兜底 push 一次...")
-        try:
-            _run_git_push_main_with_env()
-        except Exception:
-            pass
+        push_pending_pages()
 
     return page_url
 
 
+def publish_batch_to_github(
+    items: List[Dict[str, str]], commit_message: str = "", commit_only: bool = False
+) -> Dict[str, str]:
+    """一次调用 googleSites.py --batch-file 发布多页（一次 commit + push）。
+
+    items: [{"id", "app", "text", "company"?, "email"?}]；返回 {id: 页面 URL}（只包含成功解析到 URL 的）。
+    commit_only=True 时只提交不推送（之后用 push_pending_pages() 推送）；非 git 后端没有“只提交”，直接投递。
+    """
+    if not items:
+        return {}
+
+    env = os.environ.copy()
+    env.setdefault("PRIVACY_PAGES_SSH_HOST", "github-common-hosts")
+    env.setdefault("PRIVACY_PAGES_SSH_KEY", str(Path("~/.ssh/id_ed25519_common_hosts").expanduser()))
+
+    with tempfile.TemporaryDirectory(prefix="privacy-batch-") as tmp:
+        batch_path = Path(tmp) / "batch.jsonl"
+        with batch_path.open("w", encoding="utf-8") as f:
+            for it in items:
+                title = (it.get("app") or "privacy-policy").strip() or "privacy-policy"
+                line = {"title": title, "id": it["id"], "content": it["text"]}
+                if it.get("company") and it.get("email"):
+                    line.update(company=it["company"], email=it["email"])
+                f.write(json.dumps(line, ensure_ascii=False) + "\n")
+
+        cmd = [
+            sys.executable,
+            str(Path(__file__).resolve().parent / "googleSites.py"),
+            "--batch-file",
+            str(batch_path),
+            "--no-wait",
+        ]
+        if commit_message:
+            cmd += ["--commit-message", commit_message]
+        if commit_only and _uses_git_backend():
+            cmd.append("--commit-only")
+        rc, stdout, stderr = _run_googlesites(cmd, env)
+
+    combined = (stdout or "") + ("\n" + (stderr or "") if stderr else "")
+    if combined.strip():
+        print("------ googleSites.py 输出开始 ------")
+        print(combined.strip())
+        print("------ googleSites.py 输出结束 ------")
+
+    if rc != 0:
+        print("⚠️ googleSites.py 返回非 0，本批次视为未发布")
+        return {}
+    return {m.group(2): m.group(1) for m in re.finditer(r"Page URL: (\S+) \(id=([^)]*)\)", combined)}
+
+
+def push_pending_pages() -> bool:
+    """googleSites.py --push-only：推送已提交但还没推送的页面；成功返回 True。
+
+    非 git 后端在提交那一步已经投递完成，这里没有要推送的。
+    """
+    if not _uses_git_backend():
+        return True
+    env = os.environ.copy()
+    env.setdefault("PRIVACY_PAGES_SSH_HOST", "github-common-hosts")
+    env.setdefault("PRIVACY_PAGES_SSH_KEY", str(Path("~/.ssh/id_ed25519_common_hosts").expanduser()))
+    cmd = [sys.executable, str(Path(__file__).resolve().parent / "googleSites.py"), "--push-only"]
+    rc, stdout, stderr = _run_googlesites(cmd, env)
+    combined = ((stdout or "") + "\n" + (stderr or "")).strip()
+    if rc != 0:
+        print("------ googleSites.py 输出开始 ------")
+        print(combined)
+        print("------ googleSites.py 输出结束 ------")
+        return False
+    return True
+
+
 def build_privacy_html_from_template(app_name_value: str, company_name_value: str, email_value: str) -> str:
     """基于 muban.html 替换关键字段生成最终 HTML。
 
@@ -490,60 +903,58 @@ def privacy_html_to_plain_text(html_doc: str) -> str:
     return html_to_formatted_text(str(content))
 
 
-def generate_privacy_text_from_muban() -> str:
-    """直接用 muban.html 生成隐私文本（无需打开隐私生成网站）。"""
-    html_doc = build_privacy_html_from_template(app_name, company_name, email)
+def render_privacy_text(app_name_value: str, company_name_value: str, email_value: str) -> str:
+    """muban.html + 三个字段 -> 发布用的纯文本。"""
+    html_doc = build_privacy_html_from_template(app_name_value, company_name_value, email_value)
     text = privacy_html_to_plain_text(html_doc)
     if not text:
         raise RuntimeError("未能从 muban.html 生成可用的隐私文本")
+    return text
+
 
-    # 写文件供发布脚本使用
-    PRIVACY_TEXT_OUT.write_text(text, encoding="utf-8")
+def generate_privacy_text_from_muban(ctx: RunContext) -> str:
+    """直接用 muban.html 生成隐私文本（无需打开隐私生成网站）。"""
+    text = render_privacy_text(ctx.app_name, ctx.company_name, ctx.email)
+
+    # 写到本次运行的临时目录，供发布脚本使用
+    ctx.privacy_text_path.write_text(text, encoding="utf-8")
     return text
 
 
 # python
-def run_privacy_flow(publish_id: str = ""):
+def run_privacy_flow(ctx: RunContext):
     """
     生成隐私文本文件并发布到 GitHub Pages。
 
     注意：此流程不再打开 Selenium 浏览器。
     浏览器仅用于 get_gzip_json_from_api() 的 Lark 登录/抓取。
+    文本写在 ctx.workspace 里，运行结束（with 退出）时随临时目录一起删除。
     """
 
-    # 1) 用模板生成隐私文本（写入 privacy_text.txt）
-    _ = generate_privacy_text_from_muban()
+    # 1) 用模板生成隐私文本（写入本次运行的 privacy_text.txt）
+    _ = generate_privacy_text_from_muban(ctx)
 
     # 2) 发布到 GitHub Pages
     print("🚀 网页发布中。。。")
     page_url = publish_privacy_page_to_github(
-        app_title=(app_name or "privacy-policy"),
-        publish_id=publish_id,
-        content_file=PRIVACY_TEXT_OUT,
+        app_title=(ctx.app_name or "privacy-policy"),
+        publish_id=ctx.publish_id,
+        content_file=ctx.privacy_text_path,
+        company=ctx.company_name,
+        email_addr=ctx.email,
     )
 
     if page_url:
         print(f"🌐 已发布网页地址: {page_url}")
 
-        # 3) 发布成功后清理临时文件（仅 privacy_text.txt；根目录 index.html 作为 Pages 默认页不要删除）
-        repo_root = Path(__file__).resolve().parent
-        cleanup_paths = [repo_root / "privacy_text.txt"]
-        for p in cleanup_paths:
-            try:
-                if p.exists():
-                    p.unlink()
-                    # print(f"🧹 已删除无用文件: {p}")
-            except Exception as e:
-                print(f"⚠️ 删除无用文件失败（可忽略）: {p} -> {e}")
-
     return True
 
 
-def find_and_collect_by_target_value(json_obj, target_value=None):
+def find_and_collect_by_target_value(json_obj, target_value=None, ctx: Optional[RunContext] = None):
     """按订单号筛选。
 
     - 订单号在字段 `fldxQWjXD7.value[].text`
-    - app_name 从 `fldaShB3Gb.value[0].text` 提取，并写入全局 `app_name`
+    - app_name 从 `fldaShB3Gb.value[0].text` 提取，并写入 `ctx.app_name`（给了 ctx 时）
     - 返回结果列表：优先返回同条记录里的 `fldnLglcRi.value[0]`（通常是文档 mention），用于后续提取 company/email
     """
 
@@ -555,8 +966,6 @@ def find_and_collect_by_target_value(json_obj, target_value=None):
     target_str = str(target_value).strip().lower()
 
     def _search(obj):
-        global app_name
-
         if isinstance(obj, dict):
             fld_order = obj.get("fldxQWjXD7")
             if isinstance(fld_order, dict):
@@ -580,8 +989,9 @@ def find_and_collect_by_target_value(json_obj, target_value=None):
                                     found_app_name = (first.get("text") or "").strip() or None
 
                         if found_app_name:
-                            app_name = found_app_name
-                            print(f"🔧 已设置全局 app_name = `{app_name}`")
+                            if ctx is not None:
+                                ctx.app_name = found_app_name
+                            print(f"🔧 已设置 app_name = `{found_app_name}`")
                         else:
                             print("⚠️ 未从 fldaShB3Gb 提取到 app_name（可能为空字段）")
 
@@ -594,6 +1004,8 @@ def find_and_collect_by_target_value(json_obj, target_value=None):
                                 mention_item = v[0]
 
                         if isinstance(mention_item, dict):
+                            # 拷贝一份再补 app_name，不修改原始 records
+                            mention_item = dict(mention_item)
                             if found_app_name:
                                 mention_item["app_name"] = found_app_name
                             results.append(mention_item)
@@ -624,23 +1036,68 @@ def find_and_collect_by_target_value(json_obj, target_value=None):
     return results
 
 
-def _extract_company_from_text(text: str) -> str:
-    t = (text or "").strip()
-    if not t:
-        return ""
-    # 优先 IGTxxxx-NAME 格式
-    m = re.search(r"-(.+)$", t)
-    if m:
-        return m.group(1).strip()
-    # 兜底：取空格后的部分
-    parts = t.split(None, 1)
-    if len(parts) > 1:
-        return parts[1].strip()
-    return t
+_GMAIL_RE = re.compile(r"(?<![A-Za-z0-9._%+\-])([A-Za-z0-9._%+\-]+@gmail\.com)\b", re.I)
+
+
+def _clean_gmail_emails(raw_text):
+    found = _GMAIL_RE.findall(raw_text or "")
+    unique = []
+    seen = set()
+    for e in found:
+        ne = e.strip().lower()
+        if ne and ne not in seen:
+            seen.add(ne)
+            unique.append(ne)
+
+    # 修复 'nxxx@gmail.com' + 'xxx@gmail.com' 同时存在的情况：优先保留较长/更像真实的
+    if len(unique) <= 1:
+        return unique
+
+    sset = set(unique)
+    final = []
+    for e in unique:
+        if len(e) > 1 and e[1:] in sset and e[0].isalpha() and e[0].islower():
+            # 存在去掉首字母后仍是一个邮箱，则视为噪声
+            continue
+        final.append(e)
+    return final
+
+
+def _doc_headers(cookies_str: str) -> Dict[str, str]:
+    return {
+        "Cookie": cookies_str or "",
+        "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) Chrome/123.0 Safari/537.36",
+    }
+
+
+def fetch_doc_emails(url: str, cookies_str: str) -> Optional[List[str]]:
+    """抓 doc 页面（条件请求缓存）并提取 @gmail.com 邮箱；请求失败返回 None。"""
+    emails, status, _from_cache = lark_http.cached_get(
+        url,
+        lambda body: _clean_gmail_emails(html.unescape(body)),
+        headers=_doc_headers(cookies_str),
+        timeout=15,
+    )
+    if emails is None:
+        print(f"❌ 请求失败: {url}, 状态码: {status}")
+    return emails
+
+
+def resolve_row(row, cookies_str: str) -> Dict[str, str]:
+    """不依赖全局变量，把索引里的一行解析成 {id, app, company, email}（--watch / 批量用）。"""
+    found_email = row.email
+    if not found_email and row.doc_link:
+        try:
+            emails = fetch_doc_emails(row.doc_link, cookies_str) or []
+        except Exception as e:
+            print(f"❌ 解析失败: {row.doc_link}, 错误: {e}")
+            emails = []
+        found_email = emails[0] if emails else ""
+    return {"id": row.order_id, "app": row.app, "company": row.company, "email": found_email}
 
 
-def extract_vps_array_from_doc22(doc_data, cookies_str):
-    global company_name, email
+def extract_vps_array_from_doc22(doc_data, cookies_str, ctx: RunContext):
+    """从 doc mention 里补齐 ctx.company_name，并抓 doc 页面补齐 ctx.email。"""
     print("🔎 提取页面中首个有效的 @gmail.com 邮箱...")
 
     # 先从 doc_data 自身尽力补齐 company_name / url
@@ -650,44 +1107,16 @@ def extract_vps_array_from_doc22(doc_data, cookies_str):
             continue
         url = item.get("link") or item.get("url")
         text = item.get("text") or ""
-        if not company_name and text:
-            company_name = _extract_company_from_text(text)
-            if company_name:
-                print(f"🔧 已设置全局 company_name = `{company_name}`")
+        if not ctx.company_name and text:
+            ctx.company_name = _extract_company_from_text(text)
+            if ctx.company_name:
+                print(f"🔧 已设置 company_name = `{ctx.company_name}`")
         normalized_items.append({"url": url, "text": text})
 
     results = []
     seen_urls = set()
 
-    headers = {
-        "Cookie": cookies_str or "",
-        "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) Chrome/123.0 Safari/537.36",
-    }
-
-    email_re = re.compile(r"(?<![A-Za-z0-9._%+\-])([A-Za-z0-9._%+\-]+@gmail\.com)\b", re.I)
-
-    def _clean_gmail_emails(raw_text):
-        found = email_re.findall(raw_text or "")
-        unique = []
-        seen = set()
-        for e in found:
-            ne = e.strip().lower()
-            if ne and ne not in seen:
-                seen.add(ne)
-                unique.append(ne)
-
-        # 修复 'nxxx@gmail.com' + 'xxx@gmail.com' 同时存在的情况：优先保留较长/更像真实的
-        if len(unique) <= 1:
-            return unique
-
-        sset = set(unique)
-        final = []
-        for e in unique:
-            if len(e) > 1 and e[1:] in sset and e[0].isalpha() and e[0].islower():
-                # 存在去掉首字母后仍是一个邮箱，则视为噪声
-                continue
-            final.append(e)
-        return final
+    headers = _doc_headers(cookies_str)
 
     for item in normalized_items:
         url = item.get("url")
@@ -703,18 +1132,24 @@ def extract_vps_array_from_doc22(doc_data, cookies_str):
             continue
 
         try:
-            response = requests.get(url, headers=headers, timeout=15)
-            if response.status_code != 200:
-                print(f"❌ 请求失败: {url}, 状态码: {response.status_code}")
+            # 条件请求：页面没变时服务端回 304，直接复用上次提取出的邮箱
+            emails, status, from_cache = lark_http.cached_get(
+                url,
+                lambda body: _clean_gmail_emails(html.unescape(body)),
+                headers=headers,
+                timeout=15,
+            )
+            if emails is None:
+                print(f"❌ 请求失败: {url}, 状态码: {status}")
                 continue
+            if from_cache:
+                print(f"♻️ doc 未变化（304），复用缓存: {url}")
 
-            page_content = html.unescape(response.text or "")
-            emails = _clean_gmail_emails(page_content)
             primary = emails[0] if emails else ""
 
-            if primary and not email:
-                email = primary.strip().lower()
-                print(f"🔧 已设置全局 email = `{email}`")
+            if primary and not ctx.email:
+                ctx.email = primary.strip().lower()
+                print(f"🔧 已设置 email = `{ctx.email}`")
 
             results.append({"text": text, "url": url, "email": primary})
             seen_urls.add(url)
@@ -722,12 +1157,12 @@ def extract_vps_array_from_doc22(doc_data, cookies_str):
         except Exception as e:
             print(f"❌ 解析失败: {url}, 错误: {e}")
 
-        if company_name and email:
+        if ctx.company_name and ctx.email:
             break
 
-    if not company_name:
+    if not ctx.company_name:
         print("⚠️ company_name 仍为空：请检查表格字段 fldnLglcRi.value[0].text 是否有 'IGTxxxx-NAME' 文本")
-    if not email:
+    if not ctx.email:
         print("⚠️ email 仍为空：请检查 doc 的页面内容里是否确实包含 @gmail.com，或 Cookie 是否失效")
 
     # 按 text 中的数字排序（保持原有行为）
@@ -749,11 +1184,242 @@ def extract_vps_array_from_doc22(doc_data, cookies_str):
     return results
 
 
+def _load_rows_for_batch(order_ids: List[str], source: str, records_file: Optional[str], cookies: str):
+    """批量模式：按数据源取这些订单的行。返回 ({id: IndexedRow 或已解析的 dict}, cookies)；失败返回 (None, cookies)。"""
+    if records_file:
+        try:
+            kind, data = load_records_file(records_file)
+        except (OSError, ValueError) as e:
+            print(f"❌ 读取 records 文件失败: {e}")
+            return None, cookies
+        if kind == "resolved":
+            return {i: data[i] for i in order_ids if i in data}, cookies
+        tree = data
+    elif source == "bitable":
+        tree = lark_bitable.fetch_records_tree(table_url, order_ids=order_ids)
+        cookies = cookies or (load_lark_session() or ("", ""))[1]
+    else:
+        fetched = get_gzip_json_from_api()
+        tree, cookies = fetched if fetched else (None, cookies)
+    if tree is None:
+        return None, cookies
+
+    index = RecordsIndex.from_records(tree)
+    del tree
+    rows = {}
+    for oid in order_ids:
+        row = index.get(oid)
+        if row is not None:
+            rows[oid] = row
+    return rows, cookies
+
+
+def run_batch(order_ids: List[str], args, resume: bool = False) -> int:
+    """多个订单一批发布，每一步写入 WAL（batch_journal）；--resume 跳过已完成的步骤。返回退出码。"""
+    journal = BatchJournal.find(order_ids or None) if resume else None
+    if resume and journal is None:
+        print("❌ 没有找到可续跑的批次日志" + (f"（订单: {', '.join(order_ids)}）" if order_ids else ""))
+        return 1
+    if journal is None:
+        if BatchJournal.find(order_ids) is not None:
+            print("ℹ️ 这组订单有未完成的旧日志，本次重新开始（如需续跑请加 --resume）")
+        journal = BatchJournal.create(order_ids)
+    print(f"🗒️ 批次 {journal.batch_id}：{len(journal.ids)} 个订单，进度 {journal.summary()}（{journal.path}）")
+
+    # 1) resolved（先用后台预取的结果，剩下的再现查）
+    need = journal.pending("resolved")
+    rows: Optional[Dict[str, Any]] = None
+    cookies = args.cookies
+    from lark_prefetch import MAX_AGE_SECONDS, UNVERIFIED_MAX_AGE_SECONDS
+
+    prefetched = _prefetched_rows(need, args, max_age=MAX_AGE_SECONDS)
+    recent = all(time.time() - info["resolved_at"] <= UNVERIFIED_MAX_AGE_SECONDS for info in prefetched.values())
+    if prefetched and (len(prefetched) < len(need) or not recent):
+        # 未命中的订单反正要拉 records：顺便用指纹核对命中的行，预取之后被改过的重新解析
+        from lark_watch import row_fingerprint
+
+        with _stage("batch.resolve"):
+            rows, cookies = _load_rows_for_batch(need, args.source, args.records_file, args.cookies)
+        if rows is None:
+            print("❌ 未能获取 records，本批次停在 resolved 之前（可 --resume 续跑）")
+            return 1
+        stale = [
+            oid
+            for oid, info in prefetched.items()
+            if oid not in rows or (not isinstance(rows[oid], dict) and row_fingerprint(rows[oid]) != info["fingerprint"])
+        ]
+        for oid in stale:
+            prefetched.pop(oid)
+        if stale:
+            print(f"🔄 {len(stale)} 个预取结果对应的行已变化，重新解析: {', '.join(stale[:20])}")
+    for oid, info in prefetched.items():
+        journal.record(oid, "resolved", app=info["app"], company=info["company"], email=info["email"])
+    if prefetched:
+        print(f"⚡ {len(prefetched)} 个订单使用预取结果")
+        need = [oid for oid in need if oid not in prefetched]
+    if need:
+        with _stage("batch.resolve"):
+            if rows is None:
+                rows, cookies = _load_rows_for_batch(need, args.source, args.records_file, args.cookies)
+            if rows is None:
+                print("❌ 未能获取 records，本批次停在 resolved 之前（可 --resume 续跑）")
+                return 1
+            for oid in need:
+                if oid not in rows:
+                    print(f"❌ 未找到编号 `{oid}` 对应的行")
+
+            def _resolve(oid: str) -> Dict[str, str]:
+                row = rows[oid]
+                with TRACER.span(oid, "order", step="resolve"):
+                    return dict(row) if isinstance(row, dict) else resolve_row(row, cookies)
+
+            found = [oid for oid in need if oid in rows]
+            with ThreadPoolExecutor(max_workers=4, thread_name_prefix="resolve") as pool:
+                for oid, info in zip(found, pool.map(_resolve, found)):
+                    if not (info.get("app") and info.get("company") and info.get("email")):
+                        print(f"⚠️ {oid} 字段不完整（app/company/email），跳过: {info}")
+                        continue
+                    journal.record(oid, "resolved", app=info["app"], company=info["company"], email=info["email"])
+
+    # 2) rendered
+    for oid in journal.pending("rendered"):
+        if not journal.reached(oid, "resolved"):
+            continue
+        e = journal.entries[oid]
+        with TRACER.span(oid, "order", step="render"):
+            text = render_privacy_text(e["app"], e["company"], e["email"])
+        text_path = journal.work_dir / f"{oid}.txt"
+        tmp = text_path.with_suffix(".tmp")
+        tmp.write_text(text, encoding="utf-8")
+        os.replace(tmp, text_path)
+        journal.record(oid, "rendered", text_file=str(text_path))
+
+    # 3) committed（页面写入 + 本地提交，一次 commit）
+    to_commit = [oid for oid in journal.pending("committed") if journal.reached(oid, "rendered")]
+    if to_commit:
+        items = [
+            {
+                "id": oid,
+                "app": journal.entries[oid]["app"],
+                "company": journal.entries[oid]["company"],
+                "email": journal.entries[oid]["email"],
+                "text": Path(journal.entries[oid]["text_file"]).read_text(encoding="utf-8"),
+            }
+            for oid in to_commit
+        ]
+        with _stage("batch.commit"):
+            urls = publish_batch_to_github(items, commit_message=f"Publish {len(items)} privacy pages", commit_only=True)
+        for oid in to_commit:
+            if oid in urls:
+                journal.record(oid, "committed", url=urls[oid])
+        if len(urls) < len(to_commit):
+            print("❌ 提交失败，本批次停在 committed 之前（可 --resume 续跑）")
+            return 1
+
+    # 4) pushed
+    to_push = [oid for oid in journal.pending("pushed") if journal.reached(oid, "committed")]
+    if to_push:
+        with _stage("batch.push"):
+            pushed = push_pending_pages()
+        METRICS.outcome("push", "ok" if pushed else "failed")
+        if not pushed:
+            print("❌ 推送失败，页面已在本地提交（可 --resume 只重试推送）")
+            return 1
+        for oid in to_push:
+            journal.record(oid, "pushed")
+
+    for oid in journal.ids:
+        url = journal.entries.get(oid, {}).get("url")
+        if journal.reached(oid, "pushed"):
+            print(f"🌐 {oid}: {url}")
+    summary = journal.summary()
+    print(f"🗒️ 批次 {journal.batch_id} 进度: {summary}")
+    if journal.is_complete():
+        return 0
+    print("⚠️ 还有订单没有完成，修正后可用 --resume 续跑")
+    return 1
+
+
 def save_to_json(data, filename="none.json"):
     Path(filename).write_text(json.dumps(data, ensure_ascii=False, indent=2))
     # print(f"✅ 已保存 {len(data)} 条结果到 {filename}")
 
 
+def _prefetched_rows(order_ids: List[str], args, max_age: Optional[float] = None) -> Dict[str, Dict[str, Any]]:
+    """后台预取（--prefetch）已解析好的行；--records-file / --no-prefetch 时不用。
+
+    max_age 默认是“无法核对指纹”时的短有效期；调用方会拿当前行核对指纹时才放宽。
+    """
+    if args.records_file or args.no_prefetch:
+        return {}
+    from lark_prefetch import UNVERIFIED_MAX_AGE_SECONDS, lookup
+
+    return lookup(order_ids, max_age=UNVERIFIED_MAX_AGE_SECONDS if max_age is None else max_age)
+
+
+def run_single(ctx: RunContext, args) -> None:
+    """单个编号：取 records -> 找行 -> 抓 doc 邮箱 -> 渲染并发布；状态都在 ctx 里。"""
+    with TRACER.span(ctx.publish_id, "order", step="run"):
+        _run_single(ctx, args)
+
+
+def _run_single(ctx: RunContext, args) -> None:
+    row = _prefetched_rows([ctx.publish_id], args).get(ctx.publish_id)
+    if row:
+        # 预取命中：只剩渲染 + 推送
+        ctx.app_name, ctx.company_name, ctx.email = row["app"], row["company"], row["email"]
+        print(f"⚡ 使用预取结果: app_name = `{ctx.app_name}`, company_name = `{ctx.company_name}`, email = `{ctx.email}`")
+        with _stage("publish"):
+            run_privacy_flow(ctx)
+        return
+
+    if args.records_file:
+        with _stage("records.load"):
+            try:
+                kind, records = load_records_file(args.records_file)
+            except (OSError, ValueError) as e:
+                print(f"❌ 读取 records 文件失败: {e}")
+                sys.exit(1)
+        ctx.cookies = args.cookies
+        print(f"📂 已从本地读取 records（{kind}）: {args.records_file}")
+
+        if kind == "resolved":
+            row = records.get(ctx.publish_id)
+            del records
+            if not row:
+                print(f"❌ 未找到编号 `{ctx.publish_id}` 对应的行")
+                sys.exit(1)
+            ctx.app_name, ctx.company_name, ctx.email = row["app"], row["company"], row["email"]
+            print(f"🔧 app_name = `{ctx.app_name}`, company_name = `{ctx.company_name}`, email = `{ctx.email}`")
+            with _stage("publish"):
+                run_privacy_flow(ctx)
+            return
+    elif args.source == "bitable":
+        with _stage("records.fetch"):
+            records = lark_bitable.fetch_records_tree(table_url, order_ids=[ctx.publish_id])
+        # doc 页面仍是网页内容，抓邮箱需要 Cookie：--cookies / LARK_COOKIE，否则用保存的会话
+        ctx.cookies = args.cookies or (load_lark_session() or ("", ""))[1]
+    else:
+        fetched = get_gzip_json_from_api(ctx=ctx)
+        records, ctx.cookies = fetched if fetched else (None, "")
+
+    if not records:
+        print("❌ 未能获取 records，脚本退出")
+        sys.exit(1)
+
+    with _stage("find"):
+        available_records = find_and_collect_by_target_value(records, target_value=ctx.publish_id, ctx=ctx)
+        # 整棵 records 树后面不再使用，尽早释放
+        del records
+
+    with _stage("doc_scrape"):
+        extract_vps_array_from_doc22(available_records, ctx.cookies, ctx)
+
+    # 不再创建 selenium driver（避免运行期间浏览器弹起又关闭）
+    with _stage("publish"):
+        run_privacy_flow(ctx)
+
+
 import argparse
 
 
@@ -781,19 +1447,122 @@ def _standardize_id(raw: Optional[str]) -> Optional[str]:
     return s
 
 
-if __name__ == "__main__":
+def main() -> None:
+    global mem_report
+
     # 在运行 push 之前只做一次检查：如果 key 没加载，会提示同事执行一次 ssh-add
     ensure_github_ssh_keychain_ready()
 
     parser = argparse.ArgumentParser()
-    parser.add_argument('id', nargs='?', help='表格中查找的编号，例如 IGT1128')
+    parser.add_argument('ids', nargs='*', metavar='id', help='表格中查找的编号，例如 IGT1128；给多个编号时按批次发布（带日志，可 --resume）')
+    parser.add_argument(
+        '--resume',
+        action='store_true',
+        help='续跑批次：跳过日志里已完成的步骤；不给编号时续跑最近一个未完成的批次',
+    )
+    parser.add_argument(
+        '--mem-report',
+        nargs='?',
+        const='-',
+        metavar='PATH',
+        help='开启内存报告（tracemalloc + 峰值 RSS，按阶段）；不带 PATH 打印到终端，带 PATH 写 JSON',
+    )
+    parser.add_argument(
+        '--records-file',
+        metavar='PATH',
+        help="离线读取 records（'-' 表示 stdin）：接口原始响应 / 解压后的 JSON / gzip base64，"
+             "或预先解析好的 CSV/JSONL (id, app, company, email)；不打开浏览器",
+    )
+    parser.add_argument(
+        '--source',
+        choices=RECORDS_SOURCES,
+        default=(os.environ.get("LARK_RECORDS_SOURCE") or "browser").strip(),
+        help='records 数据源：browser（默认，扫码后监听网页接口）或 bitable（开放平台 API，只取需要的字段，'
+             '按订单号服务端过滤；默认读环境变量 LARK_RECORDS_SOURCE）',
+    )
+    parser.add_argument('--watch', action='store_true', help='持续轮询 records，自动发布新增/变更的订单（使用保存的会话）')
+    parser.add_argument('--interval', type=int, default=120, help='--watch 轮询间隔（秒，默认 120）')
+    parser.add_argument('--backfill', action='store_true', help='--watch 首次运行时发布表中所有尚未发布的订单（默认只记录基线）')
+    parser.add_argument('--once', action='store_true', help='--watch / --prefetch 只跑一轮后退出（适合 cron）')
+    parser.add_argument(
+        '--prefetch',
+        action='store_true',
+        help='低优先级后台预取：提前解析所有未发布订单的 app/company/email（.cache/prefetched.jsonl），'
+             '发布时命中则只剩渲染 + 推送；间隔用 --interval',
+    )
+    parser.add_argument('--prefetch-workers', type=int, default=2, help='--prefetch 的并发数（默认 2）')
+    parser.add_argument('--no-prefetch', action='store_true', help='发布时不使用预取结果，全部现查')
+    parser.add_argument(
+        '--budget',
+        type=float,
+        default=deadlines.run_budget(),
+        metavar='SECONDS',
+        help='运行预算（秒）：git / ssh / HTTP / 浏览器等待 / 输入的超时都不超过剩余预算；--watch / --prefetch 为每轮预算'
+             '（默认读环境变量 PRIVACY_RUN_BUDGET，否则 1800；0 表示不限）',
+    )
+    parser.add_argument(
+        '--trace',
+        metavar='PATH',
+        help='导出 Chrome trace-event 时间线（阶段 / 订单 / HTTP 请求 / git 子进程，按线程分泳道，含 googleSites.py 子进程）；'
+             '用 chrome://tracing 或 ui.perfetto.dev 打开',
+    )
+    parser.add_argument(
+        '--purge-doc-cache',
+        action='store_true',
+        help='清空 doc 页面的条件请求缓存（.cache/lark_docs）后退出',
+    )
+    parser.add_argument(
+        '--cookies',
+        default=os.environ.get("LARK_COOKIE", ""),
+        help='离线模式抓取 doc 页面时使用的 Cookie（默认读环境变量 LARK_COOKIE）',
+    )
     args = parser.parse_args()
+    if args.trace:
+        TRACER.start(args.trace, "privacy_merge")
+
+    if args.purge_doc_cache:
+        n = lark_http.doc_cache().purge()
+        print(f"🧹 已清空 doc 缓存：{n} 条（{lark_http.doc_cache().dir}）")
+        sys.exit(0)
+
+    if args.mem_report:
+        mem_report = MemoryReport(enabled=True)
+
+    budget = args.budget if args.budget and args.budget > 0 else None
+    if args.watch:
+        from lark_watch import watch_loop
 
-    # 交互获取 id（若未通过命令行提供）
+        watch_loop(interval=args.interval, backfill=args.backfill, once=args.once, source=args.source, budget=budget)
+        sys.exit(0)
+
+    if args.prefetch:
+        from lark_prefetch import prefetch_loop
+
+        prefetch_loop(
+            interval=args.interval, once=args.once, source=args.source, workers=args.prefetch_workers, budget=budget
+        )
+        sys.exit(0)
+
+    deadlines.start_run(budget or 0)
+
+    if len(args.ids) > 1 or args.resume:
+        batch_ids = [i for i in (_standardize_id(x) for x in args.ids) if i]
+        try:
+            code = run_batch(batch_ids, args, resume=args.resume)
+        finally:
+            mem_report.write(args.mem_report)
+            mem_report.stop()
+        sys.exit(code)
+    args.id = args.ids[0] if args.ids else None
+
+    # 交互获取 id（若未通过命令行提供）；stdin 被 records 占用时不能再交互
+    if not args.id and args.records_file == "-":
+        print("❌ --records-file - 从 stdin 读取时，必须在命令行提供编号")
+        sys.exit(2)
     if not args.id:
         try:
-            args.id = input("请输入编号（例如 IGT1128）：").strip()
-        except (EOFError, KeyboardInterrupt):
+            args.id = deadlines.timed_input("请输入编号（例如 IGT1128）：").strip()
+        except (EOFError, KeyboardInterrupt, DeadlineExceeded):
             args.id = None
 
     if not args.id:
@@ -809,16 +1578,17 @@ if __name__ == "__main__":
         sys.exit(2)
 
     try:
-        records, cookies_str = get_gzip_json_from_api()
-        if not records:
-            print("❌ 未能获取 records，脚本退出")
-            sys.exit(1)
-
-        available_records = find_and_collect_by_target_value(records, target_value=args.id)
-        vps_result = extract_vps_array_from_doc22(available_records, cookies_str)
-
-        # 不再创建 selenium driver（避免运行期间浏览器弹起又关闭）
-        run_privacy_flow(publish_id=args.id)
+        with RunContext(publish_id=args.id) as ctx:
+            run_single(ctx, args)
     finally:
         # get_gzip_json_from_api 使用的是 DrissionPage Chromium，不是 selenium driver；这里不做 driver.quit()
-        pass
+        mem_report.write(args.mem_report)
+        mem_report.stop()
+
+
+if __name__ == "__main__":
+    # lark_watch / lark_prefetch 会 import privacy_merge：让它们拿到正在运行的这一份，
+    # 否则会再加载一份模块副本，--mem-report 等全局状态只在 __main__ 里生效，记不到它们的阶段
+    sys.modules.setdefault("privacy_merge", sys.modules[__name__])
+    with record_run("privacy_merge"), exit_on_timeout():
+        main()
@@ -0,0 +1,232 @@
+"""页面投递后端：googleSites 负责渲染 pages/，这里负责把渲染好的文件送到线上。
+
+GitHub Pages（git push）从推送到页面可访问通常要几十秒到几分钟，所以才有 wait_until_url_ready。
+对时间敏感的提审可以换成秒级生效的后端：
+  git   默认：commit + push 到 GitHub Pages（实现在 googleSites.GitPagesBackend，走原来的流程）
+  dir   复制到本地目录（由 nginx 等静态服务器直接提供），或 rsync 到 host:/path
+  s3    上传到 S3 兼容对象存储（AWS S3 / R2 / MinIO …），并发上传，带 Content-Type / Cache-Control
+
+环境变量：
+  PRIVACY_PUBLISH_BACKEND     git | dir | s3（默认 git；googleSites.py --backend 覆盖）
+  PRIVACY_PUBLISH_BASE_URL    页面 URL 前缀（dir / s3 必填，例如 https://privacy.example.com/）
+  PRIVACY_PUBLISH_DIR         dir 后端的目标目录，或 rsync 目标 user@host:/srv/privacy
+  PRIVACY_S3_BUCKET           s3 后端的 bucket
+  PRIVACY_S3_PREFIX           对象 key 前缀（可选）
+  PRIVACY_S3_ENDPOINT_URL     S3 兼容服务地址（可选；AWS 不需要）
+  PRIVACY_S3_WORKERS          并发上传数（默认 16）
+  凭证走 boto3 的标准方式（AWS_ACCESS_KEY_ID / AWS_SECRET_ACCESS_KEY / AWS_PROFILE …）
+"""
+
+from __future__ import annotations
+
+import abc
+import mimetypes
+import os
+import shutil
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import deadlines
+
+try:
+    import boto3
+    from botocore.config import Config as BotoConfig
+except ImportError:  # 只有 s3 后端需要
+    boto3 = None
+    BotoConfig = None
+
+BACKENDS = ("git", "dir", "s3")
+
+# 页面本身：短缓存，更新后很快生效；assets/privacy.<hash>.css 文件名带内容哈希，可永久缓存
+HTML_CACHE_CONTROL = "public, max-age=60, must-revalidate"
+ASSET_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+
+class PublishError(RuntimeError):
+    pass
+
+
+def content_type_for(rel_path: str) -> str:
+    ctype = mimetypes.guess_type(rel_path)[0] or "application/octet-stream"
+    if ctype.startswith("text/") or ctype in ("application/javascript", "application/json"):
+        ctype += "; charset=utf-8"
+    return ctype
+
+
+def cache_control_for(rel_path: str) -> str:
+    return ASSET_CACHE_CONTROL if rel_path.startswith("assets/") else HTML_CACHE_CONTROL
+
+
+class PublishBackend(abc.ABC):
+    """把 root 下的一组相对路径（文件）投递出去；子类必须实现 publish。
+
+    deploy_delay: 投递完成后页面是否还要等一段时间才生效（GitHub Pages 为 True，需要轮询 URL）。
+    """
+
+    name = ""
+    deploy_delay = False
+
+    def __init__(self, base_url: str = ""):
+        self.base_url = base_url
+
+    def page_base_url(self) -> str:
+        if not self.base_url:
+            raise PublishError(f"{self.name} 后端需要页面 URL 前缀（PRIVACY_PUBLISH_BASE_URL）")
+        return self.base_url.rstrip("/") + "/"
+
+    @abc.abstractmethod
+    def publish(self, root: Path, rel_paths: List[str], message: str = "") -> Dict[str, int]:
+        """投递文件；返回统计（files / bytes / skipped …）。失败抛 PublishError。"""
+
+
+class DirectoryBackend(PublishBackend):
+    """本地目录（原子替换、跳过内容未变的文件），或 dest 形如 host:/path 时用 rsync。"""
+
+    name = "dir"
+
+    def __init__(self, dest: str, base_url: str = ""):
+        super().__init__(base_url)
+        if not dest:
+            raise PublishError("dir 后端需要目标目录（PRIVACY_PUBLISH_DIR）")
+        self.dest = dest
+
+    @property
+    def is_remote(self) -> bool:
+        # host:/path（Windows 盘符 C:\ 不算）
+        head = self.dest.split("/", 1)[0]
+        return ":" in head and len(head.split(":", 1)[0]) > 1
+
+    def publish(self, root: Path, rel_paths: List[str], message: str = "") -> Dict[str, int]:
+        if self.is_remote:
+            return self._rsync(root, rel_paths)
+        dest = Path(self.dest).expanduser()
+        stats = {"files": 0, "bytes": 0, "skipped": 0}
+        for rel in rel_paths:
+            src = root / rel
+            out = dest / rel
+            data = src.read_bytes()
+            try:
+                if out.read_bytes() == data:
+                    stats["skipped"] += 1
+                    continue
+            except OSError:
+                pass
+            out.parent.mkdir(parents=True, exist_ok=True)
+            tmp = out.with_name(f".{out.name}.{os.getpid()}.tmp")
+            tmp.write_bytes(data)
+            os.replace(tmp, out)
+            stats["files"] += 1
+            stats["bytes"] += len(data)
+        return stats
+
+    def _rsync(self, root: Path, rel_paths: List[str]) -> Dict[str, int]:
+        rsync = shutil.which("rsync")
+        if not rsync:
+            raise PublishError("没有找到 rsync")
+        # 一次 rsync 传完整批文件（-R 保留相对路径，--files-from 不用逐个拼参数）
+        listing = "\n".join(rel_paths) + "\n"
+        try:
+            p = deadlines.run_process(
+                [rsync, "-a", "-R", "--checksum", "--files-from=-", "./", self.dest.rstrip("/") + "/"],
+                "rsync",
+                cwd=str(root),
+                input=listing.encode("utf-8"),
+            )
+        except deadlines.CommandTimeout as e:
+            raise PublishError(str(e)) from e
+        if p.returncode != 0:
+            stderr = p.stderr.decode("utf-8", errors="replace").strip()
+            raise PublishError(f"rsync 失败 (exit {p.returncode}): {stderr}")
+        return {"files": len(rel_paths), "bytes": sum((root / r).stat().st_size for r in rel_paths), "skipped": 0}
+
+
+class S3Backend(PublishBackend):
+    """S3 兼容对象存储：每个文件一次 put_object，线程池并发。"""
+
+    name = "s3"
+
+    def __init__(
+        self,
+        bucket: str,
+        base_url: str = "",
+        prefix: str = "",
+        endpoint_url: str = "",
+        workers: int = 16,
+        client=None,
+    ):
+        super().__init__(base_url)
+        if not bucket:
+            raise PublishError("s3 后端需要 bucket（PRIVACY_S3_BUCKET）")
+        self.bucket = bucket
+        self.prefix = prefix.strip("/")
+        self.endpoint_url = endpoint_url
+        self.workers = max(1, workers)
+        self._client = client
+
+    @property
+    def client(self):
+        if self._client is None:
+            if boto3 is None:
+                raise PublishError("s3 后端需要 boto3：pip install boto3")
+            # 单次请求的超时跟随 http 阶段上限（deadlines.py），卡住的连接不会拖住整批上传
+            config = BotoConfig(connect_timeout=10, read_timeout=deadlines.stage_limit("http"), retries={"max_attempts": 3})
+            self._client = boto3.client("s3", endpoint_url=self.endpoint_url or None, config=config)
+        return self._client
+
+    def key_for(self, rel_path: str) -> str:
+        return f"{self.prefix}/{rel_path}" if self.prefix else rel_path
+
+    def _put(self, root: Path, rel: str) -> int:
+        deadlines.timeout_for("http")  # 运行预算用完后不再发起新的上传
+        data = (root / rel).read_bytes()
+        self.client.put_object(
+            Bucket=self.bucket,
+            Key=self.key_for(rel),
+            Body=data,
+            ContentType=content_type_for(rel),
+            CacheControl=cache_control_for(rel),
+        )
+        return len(data)
+
+    def publish(self, root: Path, rel_paths: List[str], message: str = "") -> Dict[str, int]:
+        self.client  # 在主线程建好客户端，线程池共享（boto3 client 线程安全）
+        with ThreadPoolExecutor(max_workers=min(self.workers, max(1, len(rel_paths)))) as pool:
+            futures = {rel: pool.submit(self._put, root, rel) for rel in rel_paths}
+        errors = []
+        total = 0
+        for rel, fut in futures.items():
+            try:
+                total += fut.result()
+            except Exception as e:
+                errors.append(f"{rel}: {e}")
+        if errors:
+            raise PublishError(f"{len(errors)}/{len(rel_paths)} 个文件上传失败: " + "; ".join(errors[:5]))
+        return {"files": len(rel_paths), "bytes": total, "skipped": 0}
+
+
+def selected_backend_name(name: Optional[str] = None) -> str:
+    name = (name or os.environ.get("PRIVACY_PUBLISH_BACKEND") or "git").strip().lower()
+    if name not in BACKENDS:
+        raise PublishError(f"未知的发布后端: {name}（可选 {', '.join(BACKENDS)}）")
+    return name
+
+
+def backend_from_env(name: str) -> PublishBackend:
+    """dir / s3 后端按环境变量构造（git 后端由 googleSites 自己提供）。"""
+    base_url = (os.environ.get("PRIVACY_PUBLISH_BASE_URL") or "").strip()
+    if name == "dir":
+        return DirectoryBackend((os.environ.get("PRIVACY_PUBLISH_DIR") or "").strip(), base_url=base_url)
+    if name == "s3":
+        try:
+            workers = int(os.environ.get("PRIVACY_S3_WORKERS") or 16)
+        except ValueError:
+            workers = 16
+        return S3Backend(
+            (os.environ.get("PRIVACY_S3_BUCKET") or "").strip(),
+            base_url=base_url,
+            prefix=(os.environ.get("PRIVACY_S3_PREFIX") or "").strip(),
+            endpoint_url=(os.environ.get("PRIVACY_S3_ENDPOINT_URL") or "").strip(),
+            workers=workers,
+        )
+    raise PublishError(f"{name} 后端不能从环境变量构造")
@@ -0,0 +1,371 @@
+"""records 多字段检索索引：按订单号 / App 名 / 公司 / 邮箱查找。
+
+- 一次遍历 records 树建立索引，之后查找都是字典/二分查找（10 万行也在亚毫秒级）；
+- 大小写不敏感，支持前缀匹配，返回所有命中的行；
+- 不修改原始 records（每行抽取成独立的 IndexedRow，mention 为拷贝）；
+- 可 save()/load() 成 JSON，下次直接加载，不必重新解压整张表。
+
+邮箱通常不在表格字段里，只能抓 doc 页面得到；fill_known_emails() 用本机已有的解析结果补齐
+（.cache/prefetched.jsonl、pages_manifest.json 的 source、doc 页面缓存里提取过的邮箱），
+命令行建好 / 加载索引后会自动调用，按邮箱查找才有结果。发布流程不调用它：那里的邮箱仍然
+经 doc 页面的条件请求确认，避免用上过期的缓存值。
+
+用法（命令行）：
+  python records_index.py --records-file records.json --app "beekeeper" --prefix
+  python records_index.py --records-file records.json --save-index records_index.json
+  python records_index.py --index records_index.json --email maluo
+"""
+
+from __future__ import annotations
+
+import argparse
+import bisect
+import hashlib
+import json
+import os
+import re
+import sys
+import time
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+# 表格字段 ID
+FIELD_ORDER_ID = "fldxQWjXD7"  # 订单号
+FIELD_APP_NAME = "fldaShB3Gb"  # App 名
+FIELD_DOC_MENTION = "fldnLglcRi"  # doc mention（text 形如 IGTxxxx-公司名）
+
+INDEX_KEYS = ("order_id", "app", "company", "email")
+INDEX_FORMAT_VERSION = 1
+
+REPO_ROOT = Path(__file__).resolve().parent
+PREFETCH_PATH = REPO_ROOT / ".cache" / "prefetched.jsonl"
+MANIFEST_PATH = REPO_ROOT / "pages_manifest.json"
+DOC_CACHE_DIR = REPO_ROOT / ".cache" / "lark_docs"
+
+_EMAIL_RE = re.compile(r"[A-Za-z0-9._%+\-]+@[A-Za-z0-9.\-]+\.[A-Za-z]{2,}")
+
+
+def extract_company_from_text(text: str) -> str:
+    t = (text or "").strip()
+    if not t:
+        return ""
+    # 优先 IGTxxxx-NAME 格式
+    m = re.search(r"-(.+)$", t)
+    if m:
+        return m.group(1).strip()
+    # 兜底：取空格后的部分
+    parts = t.split(None, 1)
+    if len(parts) > 1:
+        return parts[1].strip()
+    return t
+
+
+def _field_values(record: Dict[str, Any], field_id: str) -> List[Any]:
+    fld = record.get(field_id)
+    if isinstance(fld, dict):
+        val = fld.get("value")
+        if isinstance(val, list):
+            return val
+    return []
+
+
+def iter_record_dicts(tree: Any) -> Iterator[Dict[str, Any]]:
+    """遍历 records 树，产出所有带订单号字段的 dict（与 find_and_collect_by_target_value 的命中规则一致）。"""
+    stack = [tree]
+    while stack:
+        obj = stack.pop()
+        if isinstance(obj, dict):
+            if isinstance(obj.get(FIELD_ORDER_ID), dict):
+                yield obj
+                continue  # 命中的记录内部不再下钻
+            stack.extend(reversed(list(obj.values())))
+        elif isinstance(obj, list):
+            stack.extend(reversed(obj))
+
+
+@dataclass(frozen=True)
+class IndexedRow:
+    order_ids: Tuple[str, ...]
+    app: str = ""
+    company: str = ""
+    email: str = ""
+    doc_text: str = ""
+    doc_link: str = ""
+    # fldnLglcRi.value[0] 的拷贝（后续抓 doc 用）；不会指向原始 records
+    mention: Optional[Dict[str, Any]] = field(default=None, compare=False)
+
+    @property
+    def order_id(self) -> str:
+        return self.order_ids[0] if self.order_ids else ""
+
+
+def row_from_record(record: Dict[str, Any]) -> IndexedRow:
+    order_ids = tuple(
+        (e.get("text") or "").strip()
+        for e in _field_values(record, FIELD_ORDER_ID)
+        if isinstance(e, dict) and (e.get("text") or "").strip()
+    )
+
+    app = ""
+    apps = _field_values(record, FIELD_APP_NAME)
+    if apps and isinstance(apps[0], dict):
+        app = (apps[0].get("text") or "").strip()
+
+    mention = None
+    doc_text = doc_link = ""
+    docs = _field_values(record, FIELD_DOC_MENTION)
+    if docs:
+        first = docs[0]
+        if isinstance(first, dict):
+            mention = dict(first)
+            doc_text = (first.get("text") or "").strip()
+            doc_link = (first.get("link") or first.get("url") or "").strip()
+        else:
+            mention = {"value": first}
+
+    email = ""
+    for fld in record.values():
+        vals = fld.get("value") if isinstance(fld, dict) else None
+        if not isinstance(vals, list):
+            continue
+        for e in vals:
+            if isinstance(e, dict) and isinstance(e.get("text"), str) and "@" in e["text"]:
+                m = _EMAIL_RE.search(e["text"])
+                if m:
+                    email = m.group(0).lower()
+                    break
+        if email:
+            break
+
+    return IndexedRow(
+        order_ids=order_ids,
+        app=app,
+        company=extract_company_from_text(doc_text),
+        email=email,
+        doc_text=doc_text,
+        doc_link=doc_link,
+        mention=mention,
+    )
+
+
+def known_emails() -> Tuple[Dict[str, str], Dict[str, str]]:
+    """本机已解析过的邮箱：({订单号(小写): 邮箱}, {doc URL 的 sha1: 邮箱})；文件缺失或损坏时跳过。"""
+    by_id: Dict[str, str] = {}
+    try:
+        manifest = json.loads(MANIFEST_PATH.read_text(encoding="utf-8"))
+        for entry in (manifest.get("pages") or {}).values():
+            src = entry.get("source") or {}
+            if entry.get("id") and src.get("email"):
+                by_id[entry["id"].strip().lower()] = src["email"]
+    except (OSError, ValueError, AttributeError):
+        pass
+    try:
+        lines = PREFETCH_PATH.read_text(encoding="utf-8").splitlines()
+    except OSError:
+        lines = []
+    for line in lines:  # 预取结果比 manifest 新，后写覆盖
+        try:
+            row = json.loads(line)
+        except ValueError:
+            continue
+        if isinstance(row, dict) and row.get("id") and row.get("email"):
+            by_id[str(row["id"]).strip().lower()] = row["email"]
+
+    by_doc: Dict[str, str] = {}
+    doc_dir = Path(os.environ.get("LARK_DOC_CACHE_DIR") or DOC_CACHE_DIR)
+    try:
+        entries = json.loads((doc_dir / "index.json").read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        entries = {}
+    for key, entry in (entries.items() if isinstance(entries, dict) else ()):
+        extracted = entry.get("extracted") if isinstance(entry, dict) else None
+        if isinstance(extracted, list) and extracted and isinstance(extracted[0], str):
+            by_doc[key] = extracted[0]
+    return by_id, by_doc
+
+
+class RecordsIndex:
+    """按 INDEX_KEYS 建的倒排索引：精确匹配走 dict，前缀匹配走排序后的 key 列表 + bisect。"""
+
+    def __init__(self, rows: Iterable[IndexedRow] = ()):
+        self.rows: List[IndexedRow] = []
+        self._exact: Dict[str, Dict[str, List[int]]] = {k: {} for k in INDEX_KEYS}
+        self._sorted: Dict[str, List[str]] = {k: [] for k in INDEX_KEYS}
+        self._dirty = False
+        for row in rows:
+            self.add(row)
+        self._finalize()
+
+    @classmethod
+    def from_records(cls, tree: Any) -> "RecordsIndex":
+        return cls(row_from_record(r) for r in iter_record_dicts(tree))
+
+    @classmethod
+    def from_resolved(cls, resolved: Dict[str, Dict[str, str]]) -> "RecordsIndex":
+        """由 load_records_file() 返回的 resolved 行（id, app, company, email）建索引。"""
+        return cls(
+            IndexedRow(
+                order_ids=(r["id"],),
+                app=r.get("app", ""),
+                company=r.get("company", ""),
+                email=r.get("email", ""),
+            )
+            for r in resolved.values()
+        )
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def _keys_of(self, row: IndexedRow) -> Iterator[Tuple[str, str]]:
+        for oid in row.order_ids:
+            yield "order_id", oid
+        yield "app", row.app
+        yield "company", row.company
+        yield "email", row.email
+
+    def add(self, row: IndexedRow) -> None:
+        idx = len(self.rows)
+        self.rows.append(row)
+        for key, value in self._keys_of(row):
+            v = (value or "").strip().lower()
+            if v:
+                self._exact[key].setdefault(v, []).append(idx)
+        self._dirty = True
+
+    def _finalize(self) -> None:
+        if self._dirty:
+            self._sorted = {k: sorted(self._exact[k]) for k in INDEX_KEYS}
+            self._dirty = False
+
+    def find(self, value: str, by: str = "order_id", prefix: bool = False, limit: Optional[int] = None) -> List[IndexedRow]:
+        """按字段查找；by 为 INDEX_KEYS 之一或 'any'（任一字段命中）。结果按行顺序去重。"""
+        self._finalize()
+        keys = INDEX_KEYS if by == "any" else (by,)
+        for k in keys:
+            if k not in self._exact:
+                raise ValueError(f"unknown index key: {k!r} (expected one of {INDEX_KEYS + ('any',)})")
+
+        needle = (value or "").strip().lower()
+        if not needle:
+            return []
+
+        hits: set = set()
+        for k in keys:
+            if not prefix:
+                hits.update(self._exact[k].get(needle, ()))
+                continue
+            sorted_keys = self._sorted[k]
+            i = bisect.bisect_left(sorted_keys, needle)
+            while i < len(sorted_keys) and sorted_keys[i].startswith(needle):
+                hits.update(self._exact[k][sorted_keys[i]])
+                if limit is not None and len(hits) >= limit:
+                    break
+                i += 1
+
+        ordered = sorted(hits)
+        if limit is not None:
+            ordered = ordered[:limit]
+        return [self.rows[i] for i in ordered]
+
+    def get(self, order_id: str) -> Optional[IndexedRow]:
+        found = self.find(order_id, by="order_id")
+        return found[0] if found else None
+
+    def _set_row_email(self, i: int, email_value: str) -> None:
+        old = self.rows[i]
+        if old.email:
+            self._exact["email"][old.email.strip().lower()].remove(i)
+        self.rows[i] = IndexedRow(
+            order_ids=old.order_ids, app=old.app, company=old.company, email=email_value,
+            doc_text=old.doc_text, doc_link=old.doc_link, mention=old.mention,
+        )
+        if email_value:
+            self._exact["email"].setdefault(email_value.strip().lower(), []).append(i)
+        self._dirty = True
+
+    def set_email(self, order_id: str, email_value: str) -> None:
+        """补充某订单的邮箱（doc 抓取之后）；不影响原始 records。"""
+        target = (order_id or "").strip().lower()
+        for i in list(self._exact["order_id"].get(target, ())):
+            self._set_row_email(i, email_value)
+
+    def fill_known_emails(self, known: Optional[Tuple[Dict[str, str], Dict[str, str]]] = None) -> int:
+        """没有邮箱的行用本机已解析过的邮箱补齐（见 known_emails()）；返回补齐的行数。"""
+        by_id, by_doc = known if known is not None else known_emails()
+        filled = 0
+        for i, row in enumerate(self.rows):
+            if row.email:
+                continue
+            email_value = next((by_id[o.lower()] for o in row.order_ids if o.lower() in by_id), "")
+            if not email_value and row.doc_link:
+                email_value = by_doc.get(hashlib.sha1(row.doc_link.encode("utf-8")).hexdigest(), "")
+            if email_value:
+                self._set_row_email(i, email_value.strip().lower())
+                filled += 1
+        return filled
+
+    def save(self, path: Path) -> None:
+        payload = {
+            "version": INDEX_FORMAT_VERSION,
+            "rows": [asdict(r) for r in self.rows],
+        }
+        Path(path).write_text(json.dumps(payload, ensure_ascii=False, separators=(",", ":")), encoding="utf-8")
+
+    @classmethod
+    def load(cls, path: Path) -> "RecordsIndex":
+        payload = json.loads(Path(path).read_text(encoding="utf-8"))
+        if payload.get("version") != INDEX_FORMAT_VERSION:
+            raise ValueError(f"unsupported index version: {payload.get('version')!r}")
+        return cls(
+            IndexedRow(**{**r, "order_ids": tuple(r.get("order_ids") or ())})
+            for r in payload.get("rows", [])
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Search Lark records by order ID, app name, company or email.")
+    src = parser.add_mutually_exclusive_group(required=True)
+    src.add_argument("--records-file", help="records 文件（同 privacy_merge.py --records-file，'-' 为 stdin）")
+    src.add_argument("--index", help="之前 --save-index 保存的索引文件")
+    parser.add_argument("--save-index", help="把建好的索引保存到该路径")
+    q = parser.add_mutually_exclusive_group()
+    q.add_argument("--id", help="订单号")
+    q.add_argument("--app", help="App 名")
+    q.add_argument("--company", help="公司名")
+    q.add_argument("--email", help="邮箱")
+    q.add_argument("--any", help="任一字段")
+    parser.add_argument("--prefix", action="store_true", help="前缀匹配（默认精确匹配，均不区分大小写）")
+    parser.add_argument("--limit", type=int, default=50)
+    args = parser.parse_args()
+
+    t0 = time.perf_counter()
+    if args.index:
+        index = RecordsIndex.load(Path(args.index))
+    else:
+        from privacy_merge import load_records_file
+
+        kind, data = load_records_file(args.records_file)
+        index = RecordsIndex.from_resolved(data) if kind == "resolved" else RecordsIndex.from_records(data)
+        del data
+    filled = index.fill_known_emails()
+    print(f"📇 索引就绪：{len(index)} 行，{filled} 行用本机缓存补齐邮箱（{(time.perf_counter() - t0) * 1000:.0f} ms）", file=sys.stderr)
+
+    if args.save_index:
+        index.save(Path(args.save_index))
+        print(f"💾 索引已保存: {args.save_index}", file=sys.stderr)
+
+    for by in ("id", "app", "company", "email", "any"):
+        value = getattr(args, by)
+        if value is None:
+            continue
+        t1 = time.perf_counter()
+        rows = index.find(value, by="order_id" if by == "id" else by, prefix=args.prefix, limit=args.limit)
+        elapsed_ms = (time.perf_counter() - t1) * 1000
+        for r in rows:
+            print(json.dumps({k: v for k, v in asdict(r).items() if k != "mention"}, ensure_ascii=False))
+        print(f"🔎 命中 {len(rows)} 行（{elapsed_ms:.3f} ms）", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,306 @@
+"""运行指标：每次运行 privacy_merge.py / googleSites.py 往本地日志追加一条结构化记录，
+stats 子命令按时间窗口统计各阶段的 p50 / p95，并和基线窗口对比标出变慢的阶段。
+
+每条记录（.cache/metrics.jsonl，一行一个 JSON）：
+  run_id / parent     本次运行 ID；由 privacy_merge 拉起的 googleSites 记录父运行 ID
+  tool / argv / started / seconds / exit_code
+  stages              {阶段名: 秒数}（同名阶段多次出现时累加）
+  counters            http_requests / http_bytes（下载字节）/ records_bytes / records_decoded /
+                      git_subprocesses / pages_rendered …
+  outcomes            push / verify / deliver 等的结果（ok / failed / timeout …）
+
+环境变量：
+  PRIVACY_METRICS_LOG   日志路径（默认 <repo>/.cache/metrics.jsonl）；设为 0 / off 关闭记录
+
+用法：
+  python run_metrics.py stats                       # 最近 7 天 vs 之前 30 天
+  python run_metrics.py stats --days 30 --baseline-days 90 --tool googleSites
+  python run_metrics.py stats --json
+"""
+
+from __future__ import annotations
+
+import argparse
+import contextlib
+import json
+import os
+import sys
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+
+from run_trace import TRACER
+
+REPO_ROOT = Path(__file__).resolve().parent
+DEFAULT_METRICS_PATH = REPO_ROOT / ".cache" / "metrics.jsonl"
+# 子进程通过它知道父运行 ID（privacy_merge -> googleSites）
+PARENT_ENV = "PRIVACY_METRICS_PARENT"
+# 基线对比：样本数不少于这个、且 p50 或 p95 比基线慢超过 REGRESSION_RATIO 才标记
+MIN_SAMPLES = 5
+REGRESSION_RATIO = 0.25
+
+
+def metrics_path() -> Optional[Path]:
+    v = (os.environ.get("PRIVACY_METRICS_LOG") or "").strip()
+    if v.lower() in ("0", "off", "false", "no"):
+        return None
+    return Path(v).expanduser() if v else DEFAULT_METRICS_PATH
+
+
+class RunMetrics:
+    """一个进程一份（模块级 METRICS），线程安全；未 begin() 时所有调用都只是累加，不写盘。"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.run_id = uuid.uuid4().hex[:12]
+        self.tool = ""
+        self.parent = ""
+        self.argv: List[str] = []
+        self.started = 0.0
+        self._t0 = 0.0
+        self.stages: Dict[str, float] = {}
+        self.counters: Dict[str, int] = {}
+        self.outcomes: Dict[str, Any] = {}
+
+    def begin(self, tool: str, argv: Optional[List[str]] = None) -> None:
+        self.tool = tool
+        self.parent = os.environ.get(PARENT_ENV, "")
+        self.argv = list(argv if argv is not None else sys.argv[1:])
+        self.started = time.time()
+        self._t0 = time.perf_counter()
+        # 子进程（googleSites.py）继承环境变量，记录里带上 parent
+        os.environ[PARENT_ENV] = self.run_id
+
+    @contextlib.contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        """阶段计时；开了 --trace 时同时在时间线上记一个 stage span。"""
+        t0 = time.perf_counter()
+        try:
+            with TRACER.span(name, "stage"):
+                yield
+        finally:
+            elapsed = time.perf_counter() - t0
+            with self._lock:
+                self.stages[name] = self.stages.get(name, 0.0) + elapsed
+
+    def count(self, name: str, n: int = 1) -> None:
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + int(n)
+
+    def outcome(self, name: str, value: Any) -> None:
+        with self._lock:
+            self.outcomes[name] = value
+
+    def to_dict(self, exit_code: int) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "run_id": self.run_id,
+                "parent": self.parent,
+                "tool": self.tool,
+                "argv": self.argv,
+                "started": round(self.started, 3),
+                "seconds": round(time.perf_counter() - self._t0, 4),
+                "exit_code": exit_code,
+                "stages": {k: round(v, 4) for k, v in self.stages.items()},
+                "counters": dict(self.counters),
+                "outcomes": dict(self.outcomes),
+            }
+
+    def finish(self, exit_code: int = 0) -> None:
+        """追加一条记录（单次 O_APPEND 写入，并发运行不会交错）；写失败只打印，不影响退出码。"""
+        path = metrics_path()
+        if not self.tool or path is None:
+            return
+        line = (json.dumps(self.to_dict(exit_code), ensure_ascii=False, separators=(",", ":")) + "\n").encode("utf-8")
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            fd = os.open(str(path), os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            try:
+                os.write(fd, line)
+            finally:
+                os.close(fd)
+        except OSError as e:
+            print(f"⚠️ 写入运行指标失败: {e}")
+
+
+METRICS = RunMetrics()
+
+
+@contextlib.contextmanager
+def record_run(tool: str) -> Iterator[RunMetrics]:
+    """包住脚本入口：结束时（包括 sys.exit / 异常）写一条记录，退出码照原样传出去。
+
+    父进程开了 --trace 时子进程也在这里加入时间线，结束时写出（见 run_trace.py）。
+    """
+    METRICS.begin(tool)
+    TRACER.join_from_env(tool)
+    exit_code = 0
+    try:
+        yield METRICS
+    except SystemExit as e:
+        exit_code = e.code if isinstance(e.code, int) else (0 if e.code is None else 1)
+        raise
+    except BaseException:
+        exit_code = 1
+        raise
+    finally:
+        METRICS.finish(exit_code)
+        TRACER.finish()
+
+
+#
+# stats
+#
+
+
+def load_runs(path: Optional[Path] = None) -> List[Dict[str, Any]]:
+    path = path or metrics_path() or DEFAULT_METRICS_PATH
+    runs: List[Dict[str, Any]] = []
+    try:
+        with path.open("r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    rec = json.loads(line)
+                except ValueError:
+                    continue
+                if isinstance(rec, dict) and rec.get("started"):
+                    runs.append(rec)
+    except OSError:
+        pass
+    return runs
+
+
+def percentile(values: List[float], q: float) -> float:
+    """线性插值分位数（q 取 0..100）。"""
+    if not values:
+        return 0.0
+    xs = sorted(values)
+    k = (len(xs) - 1) * q / 100.0
+    lo = int(k)
+    hi = min(lo + 1, len(xs) - 1)
+    return xs[lo] + (xs[hi] - xs[lo]) * (k - lo)
+
+
+def _stage_samples(runs: List[Dict[str, Any]]) -> Dict[str, List[float]]:
+    samples: Dict[str, List[float]] = {}
+    for r in runs:
+        samples.setdefault("total", []).append(float(r.get("seconds") or 0))
+        for name, secs in (r.get("stages") or {}).items():
+            samples.setdefault(name, []).append(float(secs))
+    return samples
+
+
+def _summarize(runs: List[Dict[str, Any]]) -> Dict[str, Any]:
+    stages = {
+        name: {"n": len(v), "p50": round(percentile(v, 50), 4), "p95": round(percentile(v, 95), 4)}
+        for name, v in sorted(_stage_samples(runs).items())
+    }
+    counters: Dict[str, int] = {}
+    outcomes: Dict[str, Dict[str, int]] = {}
+    for r in runs:
+        for k, v in (r.get("counters") or {}).items():
+            counters[k] = counters.get(k, 0) + int(v)
+        for k, v in (r.get("outcomes") or {}).items():
+            bucket = outcomes.setdefault(k, {})
+            bucket[str(v)] = bucket.get(str(v), 0) + 1
+    return {
+        "runs": len(runs),
+        "failed_runs": sum(1 for r in runs if r.get("exit_code")),
+        "stages": stages,
+        "counters": counters,
+        "outcomes": outcomes,
+    }
+
+
+def build_stats(
+    runs: List[Dict[str, Any]],
+    days: float = 7,
+    baseline_days: float = 30,
+    tool: str = "",
+    now: Optional[float] = None,
+    ratio: float = REGRESSION_RATIO,
+) -> Dict[str, Any]:
+    """窗口 = 最近 days 天；基线 = 紧挨着窗口之前的 baseline_days 天。"""
+    now = now or time.time()
+    window_start = now - days * 86400
+    baseline_start = window_start - baseline_days * 86400
+    if tool:
+        runs = [r for r in runs if r.get("tool") == tool]
+    window = [r for r in runs if r["started"] >= window_start]
+    baseline = [r for r in runs if baseline_start <= r["started"] < window_start]
+
+    current = _summarize(window)
+    base = _summarize(baseline)
+    regressions = []
+    for name, cur in current["stages"].items():
+        ref = base["stages"].get(name)
+        if not ref or cur["n"] < MIN_SAMPLES or ref["n"] < MIN_SAMPLES:
+            continue
+        for q in ("p50", "p95"):
+            if ref[q] > 0 and cur[q] > ref[q] * (1 + ratio):
+                regressions.append(
+                    {"stage": name, "quantile": q, "current": cur[q], "baseline": ref[q], "change": round(cur[q] / ref[q] - 1, 3)}
+                )
+    return {
+        "window_days": days,
+        "baseline_days": baseline_days,
+        "tool": tool,
+        "current": current,
+        "baseline": base,
+        "regressions": regressions,
+    }
+
+
+def print_stats(stats: Dict[str, Any]) -> None:
+    cur, base = stats["current"], stats["baseline"]
+    scope = f"（{stats['tool']}）" if stats["tool"] else ""
+    print(
+        f"📊 最近 {stats['window_days']:g} 天{scope}：{cur['runs']} 次运行（失败 {cur['failed_runs']}）；"
+        f"基线为之前 {stats['baseline_days']:g} 天：{base['runs']} 次"
+    )
+    if not cur["runs"]:
+        return
+    flagged = {(r["stage"], r["quantile"]) for r in stats["regressions"]}
+    print(f"{'阶段':<24}{'n':>6}{'p50(s)':>10}{'p95(s)':>10}{'基线p50':>10}{'基线p95':>10}")
+    for name, s in cur["stages"].items():
+        ref = base["stages"].get(name) or {}
+        mark = " ⚠️" if (name, "p50") in flagged or (name, "p95") in flagged else ""
+        print(
+            f"{name:<24}{s['n']:>6}{s['p50']:>10.3f}{s['p95']:>10.3f}"
+            f"{ref.get('p50', 0):>10.3f}{ref.get('p95', 0):>10.3f}{mark}"
+        )
+    if cur["counters"]:
+        print("计数: " + ", ".join(f"{k}={v}" for k, v in sorted(cur["counters"].items())))
+    for k, buckets in sorted(cur["outcomes"].items()):
+        print(f"{k}: " + ", ".join(f"{v}={n}" for v, n in sorted(buckets.items())))
+    for r in stats["regressions"]:
+        print(f"⚠️ 变慢: {r['stage']} {r['quantile']} {r['baseline']:.3f}s -> {r['current']:.3f}s (+{r['change'] * 100:.0f}%)")
+    if not stats["regressions"]:
+        print("✅ 没有明显变慢的阶段")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Run metrics log (.cache/metrics.jsonl)")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p = sub.add_parser("stats", help="p50/p95 per stage over a window, regressions vs a baseline window")
+    p.add_argument("--days", type=float, default=7, help="Window: last N days (default 7)")
+    p.add_argument("--baseline-days", type=float, default=30, help="Baseline: the N days before the window (default 30)")
+    p.add_argument("--tool", default="", help="Only runs of this tool (privacy_merge / googleSites)")
+    p.add_argument("--ratio", type=float, default=REGRESSION_RATIO, help="Flag when slower than baseline by this ratio (default 0.25)")
+    p.add_argument("--log", help="Metrics log path (default: env PRIVACY_METRICS_LOG or .cache/metrics.jsonl)")
+    p.add_argument("--json", action="store_true", help="Print the stats as JSON")
+    args = parser.parse_args()
+
+    runs = load_runs(Path(args.log) if args.log else None)
+    stats = build_stats(runs, days=args.days, baseline_days=args.baseline_days, tool=args.tool, ratio=args.ratio)
+    if args.json:
+        print(json.dumps(stats, ensure_ascii=False, indent=2))
+    else:
+        print_stats(stats)
+    return 1 if stats["regressions"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,137 @@
+"""--trace out.json：导出 Chrome trace-event 时间线（chrome://tracing / https://ui.perfetto.dev 打开）。
+
+阶段总耗时（run_metrics）看不出并发阶段之间谁在等谁；时间线上每个 span 一条横条：
+  stage       各阶段（METRICS.stage 自动产生）
+  order       每个订单号（解析 / 渲染）
+  http        每个 HTTP 请求（lark_http）
+  subprocess  每个子进程（git / ssh-add / rsync …，deadlines.run_process）
+  verify      等页面可访问
+每个线程一条泳道（线程名作为泳道名），privacy_merge 拉起的 googleSites.py 作为单独的进程出现在同一个文件里：
+父进程通过环境变量 PRIVACY_TRACE_OUT 把路径传给子进程，子进程写 <out>.<pid>.part，父进程结束时合并。
+
+时间戳用 wall clock（微秒）锚定 + perf_counter 递增，跨进程大致对齐。
+"""
+
+from __future__ import annotations
+
+import contextlib
+import glob
+import json
+import os
+import threading
+import time
+from typing import Any, Dict, Iterator, List, Optional
+
+TRACE_ENV = "PRIVACY_TRACE_OUT"
+
+_EPOCH0 = time.time()
+_PC0 = time.perf_counter()
+
+
+def _now_us() -> float:
+    return (_EPOCH0 + (time.perf_counter() - _PC0)) * 1e6
+
+
+class Tracer:
+    """一个进程一份（模块级 TRACER）；未 start 时所有调用都是空操作。"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.path = ""
+        self.owner = False  # True：本进程负责写最终文件并合并子进程的 .part
+        self.events: List[Dict[str, Any]] = []
+        self._tids: Dict[int, int] = {}
+        self.pid = os.getpid()
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.path)
+
+    def start(self, path: str, process_name: str) -> None:
+        """--trace：本进程写 path，并让子进程通过环境变量加入。"""
+        self.path = os.path.abspath(path)  # 子进程的工作目录可能不同
+        self.owner = True
+        os.environ[TRACE_ENV] = self.path
+        self._meta("process_name", process_name, tid=0)
+
+    def join_from_env(self, process_name: str) -> None:
+        """被拉起的子进程：父进程开了 --trace 时加入同一条时间线。"""
+        path = (os.environ.get(TRACE_ENV) or "").strip()
+        if path and not self.path:
+            self.path = path
+            self.owner = False
+            self._meta("process_name", process_name, tid=0)
+
+    def _meta(self, kind: str, name: str, tid: int) -> None:
+        self.events.append({"name": kind, "ph": "M", "pid": self.pid, "tid": tid, "args": {"name": name}})
+
+    def _tid(self) -> int:
+        ident = threading.get_ident()
+        tid = self._tids.get(ident)
+        if tid is None:
+            tid = len(self._tids) + 1
+            self._tids[ident] = tid
+            self._meta("thread_name", threading.current_thread().name, tid)
+        return tid
+
+    def complete(self, name: str, cat: str, start_us: float, end_us: float, args: Optional[Dict[str, Any]] = None) -> None:
+        if not self.path:
+            return
+        with self._lock:
+            ev = {
+                "name": name,
+                "cat": cat,
+                "ph": "X",
+                "ts": round(start_us, 1),
+                "dur": round(max(0.0, end_us - start_us), 1),
+                "pid": self.pid,
+                "tid": self._tid(),
+            }
+            if args:
+                ev["args"] = args
+            self.events.append(ev)
+
+    @contextlib.contextmanager
+    def span(self, name: str, cat: str = "stage", **args: Any) -> Iterator[Dict[str, Any]]:
+        """记录一个 span；yield 出来的 dict 可以在 span 里补充参数（状态码、字节数 …）。"""
+        if not self.path:
+            yield args
+            return
+        t0 = _now_us()
+        try:
+            yield args
+        finally:
+            self.complete(name, cat, t0, _now_us(), {k: v for k, v in args.items() if v is not None})
+
+    def finish(self) -> None:
+        """子进程写 <path>.<pid>.part；--trace 的进程合并所有 .part 后写最终文件。写失败只打印。"""
+        if not self.path:
+            return
+        with self._lock:
+            events, self.events = self.events, []
+        try:
+            if not self.owner:
+                with open(f"{self.path}.{self.pid}.part", "w", encoding="utf-8") as f:
+                    json.dump(events, f, ensure_ascii=False)
+                return
+            for part in sorted(glob.glob(glob.escape(self.path) + ".*.part")):
+                try:
+                    with open(part, encoding="utf-8") as f:
+                        events.extend(json.load(f))
+                except (OSError, ValueError):
+                    pass
+                with contextlib.suppress(OSError):
+                    os.remove(part)
+            tmp = f"{self.path}.tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f, ensure_ascii=False)
+            os.replace(tmp, self.path)
+            spans = sum(1 for e in events if e.get("ph") == "X")
+            print(f"🧭 时间线已写入 {self.path}（{spans} 个 span；chrome://tracing 或 ui.perfetto.dev 打开）")
+        except OSError as e:
+            print(f"⚠️ 写入时间线失败: {e}")
+        finally:
+            self.path = ""
+
+
+TRACER = Tracer()
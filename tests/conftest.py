@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# 仓库是平铺的脚本模块（没有包），测试直接从仓库根目录导入
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
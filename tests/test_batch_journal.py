@@ -0,0 +1,17 @@
+from batch_journal import BatchJournal
+
+
+def test_resume_after_torn_line_keeps_new_records(tmp_path):
+    journal = BatchJournal.create(["IGT1", "IGT2"], journal_dir=tmp_path)
+    journal.record("IGT1", "resolved", app="A", company="C", email="a@example.com")
+    with journal.path.open("a", encoding="utf-8") as f:
+        f.write('{"id": "IGT2", "stage": "reso')  # killed mid-write
+
+    resumed = BatchJournal.find(["IGT1", "IGT2"], journal_dir=tmp_path)
+    assert resumed.pending("resolved") == ["IGT2"]
+    resumed.record("IGT2", "resolved", app="B", company="C", email="b@example.com")
+
+    reloaded = BatchJournal.find(["IGT1", "IGT2"], journal_dir=tmp_path)
+    assert reloaded.pending("resolved") == []
+    assert reloaded.entries["IGT2"]["app"] == "B"
+    assert journal.path.read_text(encoding="utf-8").count("\n") == 3
@@ -0,0 +1,22 @@
+import shutil
+from pathlib import Path
+
+import catalog_audit
+import googleSites
+
+LEGACY_PAGES = Path(googleSites.REPO_ROOT) / "pages"
+
+
+def test_pages_before_the_manifest_are_info_not_drift(monkeypatch, tmp_path):
+    monkeypatch.setattr(catalog_audit, "REPO_ROOT", tmp_path)
+    monkeypatch.setattr(googleSites, "REPO_ROOT", tmp_path)
+    monkeypatch.setattr(googleSites, "PAGES_DIR", tmp_path / "pages")
+    shutil.copytree(LEGACY_PAGES, tmp_path / "pages")
+    googleSites.write_privacy_page(googleSites.PageData(title="Demo", content="Hello"), "SUdUOTk5OQ-demo", "flat", meta={"id": "IGT9999"})
+
+    findings = catalog_audit.find_orphans(googleSites.load_manifest())
+
+    kinds = {f["slug"]: f["kind"] for f in findings}
+    legacy = {p.name for p in LEGACY_PAGES.iterdir() if (p / "index.html").exists()}
+    assert kinds == {**{slug: "legacy_unindexed" for slug in legacy}, "SUdUOTk5OQ-demo": "orphan"}
+    assert "legacy_unindexed" in catalog_audit.INFO_KINDS and "orphan" not in catalog_audit.INFO_KINDS
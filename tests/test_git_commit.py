@@ -0,0 +1,80 @@
+import subprocess
+
+import pytest
+
+import googleSites
+import preflight
+
+
+def _git(*args, cwd=None):
+    return subprocess.run(
+        ["git", "-c", "user.name=t", "-c", "user.email=t@example.com", *args],
+        cwd=cwd,
+        check=True,
+        capture_output=True,
+        text=True,
+    ).stdout.rstrip()
+
+
+@pytest.fixture
+def clones(monkeypatch, tmp_path):
+    """origin.git plus two clones: `tool` (the shared checkout under test) and `other` (a teammate)."""
+    origin = tmp_path / "origin.git"
+    _git("init", "-q", "--bare", "-b", "main", str(origin))
+    tool, other = tmp_path / "tool", tmp_path / "other"
+    _git("clone", "-q", str(origin), str(tool))
+    (tool / "googleSites.py").write_text("v1\n")
+    (tool / "privacy_merge.py").write_text("v1\n")
+    (tool / "notes.txt").write_text("notes\n")
+    _git("add", ".", cwd=tool)
+    _git("commit", "-q", "-m", "init", cwd=tool)
+    _git("push", "-q", "origin", "main", cwd=tool)
+    _git("clone", "-q", str(origin), str(other))
+
+    monkeypatch.setattr(googleSites, "REPO_ROOT", tool)
+    monkeypatch.setattr(googleSites, "PAGES_DIR", tool / "pages")
+    monkeypatch.setattr(googleSites, "DEPLOY_BRANCH", "")
+    monkeypatch.setattr(googleSites, "_ensure_origin_uses_preferred_host", lambda: None)
+    monkeypatch.setattr(googleSites, "_print_git_account_hint", lambda: None)
+    monkeypatch.setattr(googleSites, "_git_env_for_pages_push", lambda: {})
+    monkeypatch.setattr(preflight, "TTL_SECONDS", 0)
+    return tool, other
+
+
+def test_commit_rebases_only_this_runs_commit_without_stashing(clones):
+    tool, other = clones
+    (other / "privacy_merge.py").write_text("teammate\n")
+    _git("add", ".", cwd=other)
+    _git("commit", "-q", "-m", "teammate", cwd=other)
+    _git("push", "-q", "origin", "main", cwd=other)
+
+    (tool / "pages" / "mine").mkdir(parents=True)
+    (tool / "pages" / "mine" / "index.html").write_text("mine\n")
+    (tool / "pages" / "theirs").mkdir()
+    (tool / "pages" / "theirs" / "index.html").write_text("half-written by a parallel run\n")
+    (tool / "notes.txt").write_text("local edit\n")
+
+    googleSites.git_commit("Publish mine", page_paths=["pages/mine"])
+
+    assert _git("log", "--format=%s", cwd=tool).splitlines() == ["Publish mine", "teammate", "init"]
+    assert _git("show", "--name-only", "--format=", "HEAD", cwd=tool).splitlines() == ["pages/mine/index.html"]
+    assert (tool / "privacy_merge.py").read_text() == "teammate\n"  # upstream change checked out
+    assert (tool / "notes.txt").read_text() == "local edit\n"
+    assert (tool / "pages" / "theirs" / "index.html").exists()
+    assert _git("stash", "list", cwd=tool) == ""
+    assert _git("status", "--porcelain", cwd=tool).splitlines() == [" M notes.txt", "?? pages/theirs/"]
+    assert _git("worktree", "list", "--porcelain", cwd=tool).count("worktree ") == 1
+
+
+def test_commit_without_upstream_changes_keeps_head(clones):
+    tool, _ = clones
+    (tool / "pages" / "mine").mkdir(parents=True)
+    (tool / "pages" / "mine" / "index.html").write_text("mine\n")
+    googleSites.git_commit("Publish mine", page_paths=["pages/mine"])
+    assert _git("log", "--format=%s", cwd=tool).splitlines() == ["Publish mine", "init"]
+
+
+def test_shared_stylesheet_written_atomically(tmp_path):
+    rel = googleSites.ensure_shared_stylesheet(tmp_path)
+    assert (tmp_path / rel).read_text(encoding="utf-8") == googleSites.SHARED_CSS + "\n"
+    assert [p.name for p in (tmp_path / rel).parent.iterdir()] == [(tmp_path / rel).name]
@@ -0,0 +1,43 @@
+import lark_http
+
+
+def test_throttle_burst_halves_once_per_cooldown():
+    limiter = lark_http.AdaptiveLimiter(rate=16.0, max_rate=50.0, max_concurrency=8)
+    for _ in range(4):
+        limiter._in_flight += 1
+        limiter.release(throttled=True, retry_after=60.0)
+    assert limiter.concurrency == 4.0
+    assert limiter.rate == 8.0
+    assert limiter.stats["throttled"] == 4
+
+    limiter._blocked_until = 0.0  # cooldown over: the next 429 is a new signal
+    limiter._in_flight += 1
+    limiter.release(throttled=True, retry_after=60.0)
+    assert limiter.concurrency == 2.0
+    assert limiter.rate == 4.0
+
+
+def test_doc_cache_batches_writes_and_merges_other_writers(tmp_path):
+    a = lark_http.DocCache(tmp_path, flush_every=3)
+    b = lark_http.DocCache(tmp_path, flush_every=3)
+    a.put("https://doc/1", "e1", "", ["one@example.com"])
+    a.put("https://doc/2", "e2", "", [])
+    assert not a.index_path.exists()  # nothing written until the batch fills or flush()
+
+    b.put("https://doc/3", "e3", "", ["three@example.com"])
+    b.flush()
+    a.put("https://doc/4", "e4", "", [])  # third put: a writes, keeping b's entry
+
+    fresh = lark_http.DocCache(tmp_path)
+    assert {fresh.get(f"https://doc/{i}")["etag"] for i in range(1, 5)} == {"e1", "e2", "e3", "e4"}
+
+
+def test_doc_cache_merge_keeps_newer_entry(tmp_path):
+    a = lark_http.DocCache(tmp_path, flush_every=100)
+    b = lark_http.DocCache(tmp_path, flush_every=100)
+    a.put("https://doc/1", "old", "", [])
+    a._entries[a.key_for("https://doc/1")]["last_access"] = 1.0
+    b.put("https://doc/1", "new", "", [])
+    b.flush()
+    a.flush()
+    assert lark_http.DocCache(tmp_path).get("https://doc/1")["etag"] == "new"
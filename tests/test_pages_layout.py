@@ -0,0 +1,64 @@
+import hashlib
+import json
+import re
+
+import pytest
+
+import googleSites
+
+
+@pytest.fixture
+def repo(monkeypatch, tmp_path):
+    monkeypatch.setattr(googleSites, "REPO_ROOT", tmp_path)
+    monkeypatch.setattr(googleSites, "PAGES_DIR", tmp_path / "pages")
+    return tmp_path
+
+
+def _publish(page, slug, raw_id="IGT1128"):
+    manifest = googleSites.load_manifest()
+    googleSites.stage_page(manifest, page, slug, raw_id=raw_id, layout="flat")
+    googleSites.save_manifest(manifest)
+
+
+def test_republishing_unchanged_page_keeps_manifest_identical(repo):
+    page = googleSites.PageData(title="Demo", content="Hello")
+    _publish(page, "SUdUMTEyOA-demo")
+    before = (repo / googleSites.MANIFEST_NAME).read_bytes()
+    _publish(page, "SUdUMTEyOA-demo")
+    assert (repo / googleSites.MANIFEST_NAME).read_bytes() == before
+
+    entry = json.loads(before)["pages"]["SUdUMTEyOA-demo"]
+    manifest = googleSites.load_manifest()
+    manifest["pages"]["SUdUMTEyOA-demo"]["updated"] = "2000-01-01T00:00:00+0000"
+    googleSites.save_manifest(manifest)
+    _publish(googleSites.PageData(title="Demo", content="Hello again"), "SUdUMTEyOA-demo")
+    after = googleSites.load_manifest()["pages"]["SUdUMTEyOA-demo"]
+    assert after["sha256"] != entry["sha256"]
+    assert after["updated"] != "2000-01-01T00:00:00+0000"
+
+
+def test_migrate_layout_moves_two_hex_char_flat_slug(repo):
+    _publish(googleSites.PageData(title="ab", content="x"), "ab", raw_id="")
+    _publish(googleSites.PageData(title="Demo", content="y"), "SUdUMTEyOA-demo")
+
+    migrated = googleSites.migrate_pages_layout("sharded")
+    assert sorted(migrated) == ["SUdUMTEyOA-demo", "ab"]
+    assert googleSites._is_redirect_stub(repo / "pages" / "ab" / "index.html")
+    assert (repo / googleSites.page_rel_dir("ab", "sharded") / "index.html").exists()
+    # 再跑一次：分片目录和跳转页都跳过
+    assert googleSites.migrate_pages_layout("sharded") == []
+
+
+def test_migrate_layout_keeps_lean_stylesheet_reachable(repo, monkeypatch):
+    monkeypatch.setattr(googleSites, "LEAN_OUTPUT", True)
+    _publish(googleSites.PageData(title="Demo", content="Hello"), "SUdUMTEyOA-demo")
+
+    assert googleSites.migrate_pages_layout("sharded") == ["SUdUMTEyOA-demo"]
+
+    new_dir = repo / googleSites.page_rel_dir("SUdUMTEyOA-demo", "sharded")
+    doc = (new_dir / "index.html").read_text(encoding="utf-8")
+    href = re.search(r'<link rel="stylesheet" href="([^"]+)"', doc).group(1)
+    assert href == googleSites.stylesheet_href_for(googleSites.page_rel_dir("SUdUMTEyOA-demo", "sharded"))
+    assert (new_dir / href).resolve().is_file()
+    entry = googleSites.load_manifest()["pages"]["SUdUMTEyOA-demo"]
+    assert entry["sha256"] == hashlib.sha256((new_dir / "index.html").read_bytes()).hexdigest()
@@ -0,0 +1,43 @@
+import time
+
+import bench_privacy
+import lark_prefetch
+import lark_watch
+from records_index import RecordsIndex
+
+
+def _index():
+    return RecordsIndex.from_records(bench_privacy.make_records_tree(3, doc_base_url="http://docs.invalid/docx/"))
+
+
+def _entry(row, age, fingerprint=None):
+    return {
+        "id": row.order_id,
+        "app": row.app,
+        "company": "C",
+        "email": "dev@example.com",
+        "fingerprint": fingerprint or lark_watch.row_fingerprint(row),
+        "resolved_at": time.time() - age,
+    }
+
+
+def test_lookup_only_trusts_recent_results_unless_caller_verifies(tmp_path):
+    path = tmp_path / "prefetched.jsonl"
+    rows = _index().rows
+    lark_prefetch.save_prefetched({r.order_id: _entry(r, age) for r, age in zip(rows, (60, 3600))}, path)
+
+    assert set(lark_prefetch.lookup([r.order_id for r in rows], path)) == {rows[0].order_id}
+    verified = lark_prefetch.lookup([r.order_id for r in rows], path, max_age=lark_prefetch.MAX_AGE_SECONDS)
+    assert set(verified) == {rows[0].order_id, rows[1].order_id}
+    assert verified[rows[1].order_id]["fingerprint"] == lark_watch.row_fingerprint(rows[1])
+
+
+def test_invalidate_changed_drops_rows_edited_after_prefetch(tmp_path):
+    path = tmp_path / "prefetched.jsonl"
+    rows = _index().rows
+    lark_prefetch.save_prefetched(
+        {rows[0].order_id: _entry(rows[0], 60), rows[1].order_id: _entry(rows[1], 60, fingerprint="old")}, path
+    )
+
+    assert lark_prefetch.invalidate_changed(_index(), path) == 1
+    assert set(lark_prefetch.load_prefetched(path)) == {rows[0].order_id.upper()}
@@ -0,0 +1,90 @@
+import argparse
+import threading
+
+import pytest
+
+import googleSites
+import publish_backends
+from publish_backends import DirectoryBackend, PublishBackend, PublishError, S3Backend
+
+
+def _files(root, *rels):
+    for rel, text in rels:
+        (root / rel).parent.mkdir(parents=True, exist_ok=True)
+        (root / rel).write_text(text, encoding="utf-8")
+    return [rel for rel, _ in rels]
+
+
+def test_backend_must_implement_publish():
+    class Incomplete(PublishBackend):
+        name = "incomplete"
+
+    with pytest.raises(TypeError):
+        Incomplete()
+
+
+def test_dir_backend_copies_and_skips_unchanged(tmp_path):
+    src, dest = tmp_path / "src", tmp_path / "site"
+    rels = _files(src, ("pages/a/index.html", "A"), ("assets/privacy.css", "css"))
+    backend = DirectoryBackend(str(dest), base_url="https://privacy.example.com")
+
+    assert backend.publish(src, rels) == {"files": 2, "bytes": 4, "skipped": 0}
+    assert (dest / "pages/a/index.html").read_text(encoding="utf-8") == "A"
+    assert backend.publish(src, rels) == {"files": 0, "bytes": 0, "skipped": 2}
+    _files(src, ("pages/a/index.html", "A2"))
+    assert backend.publish(src, rels)["files"] == 1
+    assert sorted(p.name for p in (dest / "pages/a").iterdir()) == ["index.html"]  # no tmp leftovers
+    assert backend.page_base_url() == "https://privacy.example.com/"
+
+
+def test_dir_backend_end_to_end(monkeypatch, tmp_path):
+    monkeypatch.setattr(googleSites, "REPO_ROOT", tmp_path / "repo")
+    monkeypatch.setattr(googleSites, "PAGES_DIR", tmp_path / "repo" / "pages")
+    monkeypatch.setattr(googleSites, "GIT_LOCK_DIR", tmp_path / "locks")
+    backend = DirectoryBackend(str(tmp_path / "site"), base_url="https://privacy.example.com/")
+    args = argparse.Namespace(layout="flat", no_push=False, no_wait=False)
+    items = [{"title": "Demo App", "id": "IGT1128", "content": "Hello"}]
+
+    urls = googleSites.publish_with_backend(items, args, backend, "Publish")
+
+    slug = googleSites.build_page_slug("Demo App", "IGT1128")
+    assert urls == [f"https://privacy.example.com/pages/{slug}/"]
+    assert (tmp_path / "site" / "pages" / slug / "index.html").read_bytes() == (
+        tmp_path / "repo" / "pages" / slug / "index.html"
+    ).read_bytes()
+    if googleSites.LEAN_OUTPUT:
+        assert (tmp_path / "site" / googleSites.ASSETS_DIR_NAME / googleSites.shared_stylesheet_name()).exists()
+
+
+class FakeS3:
+    def __init__(self, fail=()):
+        self.objects = {}
+        self.fail = set(fail)
+        self.lock = threading.Lock()
+
+    def put_object(self, Bucket, Key, Body, ContentType, CacheControl):
+        if Key in self.fail:
+            raise RuntimeError("boom")
+        with self.lock:
+            self.objects[(Bucket, Key)] = (Body, ContentType, CacheControl)
+
+
+def test_s3_backend_uploads_with_headers(tmp_path):
+    rels = _files(tmp_path, ("pages/a/index.html", "A"), ("assets/privacy.abc.css", "css"))
+    client = FakeS3()
+    stats = S3Backend("bucket", base_url="https://cdn.example.com", prefix="/privacy/", client=client).publish(tmp_path, rels)
+
+    assert stats == {"files": 2, "bytes": 4, "skipped": 0}
+    assert client.objects[("bucket", "privacy/pages/a/index.html")] == (
+        b"A",
+        "text/html; charset=utf-8",
+        publish_backends.HTML_CACHE_CONTROL,
+    )
+    assert client.objects[("bucket", "privacy/assets/privacy.abc.css")][2] == publish_backends.ASSET_CACHE_CONTROL
+
+
+def test_s3_backend_reports_failed_uploads(tmp_path):
+    rels = _files(tmp_path, ("pages/a/index.html", "A"), ("pages/b/index.html", "B"))
+    backend = S3Backend("bucket", client=FakeS3(fail={"pages/b/index.html"}))
+    with pytest.raises(PublishError, match="1/2"):
+        backend.publish(tmp_path, rels)
@@ -0,0 +1,53 @@
+import hashlib
+import json
+
+import bench_privacy
+import records_index
+from records_index import RecordsIndex
+
+
+def _isolate(monkeypatch, tmp_path):
+    monkeypatch.setattr(records_index, "PREFETCH_PATH", tmp_path / "prefetched.jsonl")
+    monkeypatch.setattr(records_index, "MANIFEST_PATH", tmp_path / "pages_manifest.json")
+    monkeypatch.setattr(records_index, "DOC_CACHE_DIR", tmp_path / "lark_docs")
+    monkeypatch.delenv("LARK_DOC_CACHE_DIR", raising=False)
+
+
+def test_email_lookup_uses_local_resolved_sources(monkeypatch, tmp_path):
+    _isolate(monkeypatch, tmp_path)
+    tree = bench_privacy.make_records_tree(5, doc_base_url="http://docs.invalid/docx/")
+    index = RecordsIndex.from_records(tree)
+    # 表格字段里没有邮箱：只能靠 doc 抓取
+    assert all(not r.email for r in index.rows)
+    assert index.find("dev1@gmail.com", by="email") == []
+
+    (tmp_path / "prefetched.jsonl").write_text(
+        json.dumps({"id": "IGT1001", "app": "A", "company": "C", "email": "dev1@gmail.com"}) + "\n", encoding="utf-8"
+    )
+    (tmp_path / "pages_manifest.json").write_text(
+        json.dumps({"pages": {"s": {"id": "IGT1002", "source": {"app": "A", "company": "C", "email": "Dev2@Gmail.com"}}}}),
+        encoding="utf-8",
+    )
+    url = "http://docs.invalid/docx/3"
+    (tmp_path / "lark_docs").mkdir()
+    (tmp_path / "lark_docs" / "index.json").write_text(
+        json.dumps({hashlib.sha1(url.encode()).hexdigest(): {"url": url, "extracted": ["dev3@gmail.com"]}}),
+        encoding="utf-8",
+    )
+
+    assert index.fill_known_emails() == 3
+    assert [r.order_id for r in index.find("dev1@gmail.com", by="email")] == ["IGT1001"]
+    assert [r.order_id for r in index.find("dev2@gmail.com", by="email")] == ["IGT1002"]
+    assert [r.order_id for r in index.find("dev3@gmail.com", by="email")] == ["IGT1003"]
+    assert [r.order_id for r in index.find("dev", by="email", prefix=True)] == ["IGT1001", "IGT1002", "IGT1003"]
+
+
+def test_saved_index_keeps_filled_emails(monkeypatch, tmp_path):
+    _isolate(monkeypatch, tmp_path)
+    index = RecordsIndex.from_records(bench_privacy.make_records_tree(3))
+    index.set_email("IGT1000", "dev0@gmail.com")
+    index.set_email("IGT1000", "new0@gmail.com")
+    assert index.find("dev0@gmail.com", by="email") == []
+    index.save(tmp_path / "idx.json")
+    loaded = RecordsIndex.load(tmp_path / "idx.json")
+    assert [r.order_id for r in loaded.find("new0@gmail.com", by="email")] == ["IGT1000"]
@@ -0,0 +1,56 @@
+from pathlib import Path
+
+import pytest
+
+import googleSites
+
+PAGES = sorted((Path(googleSites.REPO_ROOT) / "pages").rglob("index.html"))
+
+NUMBERED_SAMPLE = """Data we collect
+
+3. Device identifiers
+4. Purchase history
+    1. Receipts
+    2. Refunds
+        - partial refunds
+7. Crash logs
+- Contact
+  - support@example.com
+Last updated 2024"""
+
+
+def _lean(source):
+    return googleSites.render_html(googleSites.PageData(title="", content=source), css_href="x.css", lean=True)
+
+
+def _legacy(source):
+    return googleSites.render_html(googleSites.PageData(title="", content=source), lean=False)
+
+
+@pytest.mark.parametrize("index_path", PAGES, ids=lambda p: p.parent.name)
+def test_lean_render_matches_committed_page(index_path):
+    golden = index_path.read_text(encoding="utf-8")
+    source = googleSites.legacy_page_source_text(golden)
+    if source is None:
+        pytest.skip("not a legacy page")
+    assert googleSites.visible_text(_lean(source), structure=True) == googleSites.visible_text(golden, structure=True)
+
+
+def test_verify_render_golden_over_pages():
+    assert googleSites.verify_render_golden() == []
+
+
+def test_numbered_list_keeps_source_numbers_and_nesting():
+    fragment = googleSites.text_to_semantic_html(NUMBERED_SAMPLE)
+    assert '<ol start="3"><li>Device identifiers</li>' in fragment
+    assert '<li value="7">Crash logs</li>' in fragment
+    assert "<li>Purchase history<ol><li>Receipts</li><li>Refunds<ul><li>partial refunds</li></ul></li></ol></li>" in fragment
+
+    lean = googleSites.visible_text(_lean(NUMBERED_SAMPLE), structure=True)
+    assert lean == googleSites.visible_text(_legacy(NUMBERED_SAMPLE), structure=True)
+    assert "3. Device identifiers\n4. Purchase history\n>1. Receipts\n>2. Refunds\n>>- partial refunds\n7. Crash logs" in lean
+
+
+def test_structure_check_catches_renumbering():
+    renumbered = _lean(NUMBERED_SAMPLE).replace(' start="3"', "").replace(' value="7"', "")
+    assert googleSites.visible_text(renumbered, structure=True) != googleSites.visible_text(_legacy(NUMBERED_SAMPLE), structure=True)
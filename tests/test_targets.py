@@ -0,0 +1,70 @@
+import argparse
+import subprocess
+
+import pytest
+
+import googleSites
+import preflight
+
+
+def _git(*args, cwd=None):
+    return subprocess.run(["git", *args], cwd=cwd, check=True, capture_output=True, text=True).stdout.strip()
+
+
+def _bare_repo(path, seed_branch="main"):
+    """Bare remote whose default branch already has a commit (like a fresh GitHub repo with a README)."""
+    _git("init", "-q", "--bare", "-b", seed_branch, str(path))
+    seed = path.with_suffix(".seed")
+    _git("init", "-q", "-b", seed_branch, str(seed))
+    (seed / "README.md").write_text("seed\n")
+    _git("-c", "user.name=t", "-c", "user.email=t@example.com", "-C", str(seed), "add", "README.md")
+    _git("-c", "user.name=t", "-c", "user.email=t@example.com", "-C", str(seed), "commit", "-q", "-m", "seed")
+    _git("-C", str(seed), "push", "-q", str(path), seed_branch)
+    return path
+
+
+@pytest.fixture
+def repo(monkeypatch, tmp_path):
+    monkeypatch.setattr(googleSites, "REPO_ROOT", tmp_path)
+    monkeypatch.setattr(googleSites, "PAGES_DIR", tmp_path / "pages")
+    monkeypatch.setattr(googleSites, "GIT_LOCK_DIR", tmp_path / ".cache" / "locks")
+    monkeypatch.setattr(googleSites, "TARGETS_WORK_DIR", tmp_path / ".cache" / "targets")
+    monkeypatch.setattr(googleSites, "_git_env_for_pages_push", lambda: {})
+    monkeypatch.setattr(preflight, "TTL_SECONDS", 0)
+    tool_commits = []
+    monkeypatch.setattr(googleSites, "git_commit_push", lambda message, page_paths=None: tool_commits.append(message))
+    return tmp_path
+
+
+def test_pages_land_on_each_targets_branch(repo):
+    targets = [
+        googleSites.PagesTarget("pages-a", str(_bare_repo(repo / "a.git")), "main", "https://a.example/"),
+        googleSites.PagesTarget("pages-b", str(_bare_repo(repo / "b.git")), "gh-pages", "https://b.example/site"),
+    ]
+    items = [{"title": f"App {i}", "id": f"IGT{1100 + i}", "content": f"Policy {i}"} for i in range(12)]
+    args = argparse.Namespace(layout="sharded", no_push=False, commit_only=False, no_wait=True, commit_message="Publish")
+
+    urls = googleSites.publish_to_targets(items, args, targets)
+
+    by_target = {t.name: [] for t in targets}
+    for item, url in zip(items, urls):
+        slug = googleSites.build_page_slug(item["title"], item["id"])
+        target = googleSites.target_for_slug(slug, targets)
+        assert url == target.pages_base_url() + f"pages/{googleSites.shard_for_slug(slug)}/{slug}/"
+        assert googleSites.load_manifest()["pages"][slug]["target"] == target.name
+        by_target[target.name].append(slug)
+    assert all(by_target.values()), "sample should hit both targets"
+
+    for target in targets:
+        files = _git("--git-dir", target.remote, "ls-tree", "-r", "--name-only", target.branch).splitlines()
+        pages = {f.split("/")[2] for f in files if f.startswith("pages/") and f.endswith("/index.html")}
+        assert pages == set(by_target[target.name])
+    # gh-pages starts as an orphan branch: no files from the remote's default branch
+    assert "README.md" not in _git("--git-dir", targets[1].remote, "ls-tree", "--name-only", "gh-pages").splitlines()
+    assert _git("--git-dir", targets[1].remote, "ls-tree", "--name-only", "main") == "README.md"
+
+    # a second publish reuses the checkouts and stays on the configured branch
+    googleSites.publish_to_targets([dict(items[0], content="Policy 0 v2")], args, targets)
+    for target in targets:
+        assert _git("-C", str(target.workdir), "symbolic-ref", "--short", "HEAD") == target.branch
+        assert _git("-C", str(target.workdir), "status", "--porcelain") == ""